@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+from fastapi import Request
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.infrastructure.database import engine_options, PoolMetrics, replica_set, read_replica, logger
+from app.infrastructure.instrumentation import instrument_engine
+from app.infrastructure.settings import settings, asyncpg_url
+
+# made on first use, like the engines of app.infrastructure.database
+AsyncEngines = namedtuple("AsyncEngines", "async_engine async_pool_metrics async_replica_engines AsyncReplicaSessions")
+_engines = None
+_engines_lock = threading.Lock()
+
+
+def async_engines() -> AsyncEngines:
+    global _engines
+    with _engines_lock:
+        if _engines is None:
+            primary = create_async_engine(settings.async_database_url, **engine_options(is_async=True))
+            metrics = PoolMetrics(primary.sync_engine)
+            instrument_engine(primary.sync_engine)
+            replica_engines = [create_async_engine(asyncpg_url(url), **engine_options(is_async=True))
+                               for url in settings.replica_urls]
+            for index, replica_engine in enumerate(replica_engines):
+                instrument_engine(replica_engine.sync_engine)
+                replica_set.watch(index, replica_engine.sync_engine)
+            _engines = AsyncEngines(primary, metrics, replica_engines,
+                                    [async_sessionmaker(autoflush=False, expire_on_commit=False, bind=replica_engine)
+                                     for replica_engine in replica_engines])
+        return _engines
+
+
+def __getattr__(name):
+    # async_engine, async_pool_metrics, async_replica_engines and AsyncReplicaSessions, for code importing them
+    if name in AsyncEngines._fields:
+        return getattr(async_engines(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class AsyncPrimarySessionmaker(async_sessionmaker):
+    """async_sessionmaker bound to the primary's engine, which it makes when the first session is opened"""
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", async_engines().async_engine)
+        return super().__call__(**local_kw)
+
+
+AsyncSessionLocal = AsyncPrimarySessionmaker(autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def read_session(request: Request):
+    index = read_replica(request)
+    if index is not None:
+        db = async_engines().AsyncReplicaSessions[index]()
+        try:
+            # connect now, while the primary can still take over from a replica that went down since its last check
+            await db.connection()
+            return db
+        except (exc.DBAPIError, OSError):  # asyncpg raises OSError when it cannot reach the server at all
+            await db.close()
+    return AsyncSessionLocal()
+
+
+async def get_async_read_db(request: Request):
+    """Session for routes that only read: on a replica when one is configured and healthy, else the primary"""
+    async with await read_session(request) as db:
+        yield db
+
+
+async def warm_up_pool(count: int):
+    """Opens up to `count` of the primary's pooled connections, as database.warm_up_pool does for the sync engine"""
+    if settings.pgbouncer_mode or count <= 0:
+        return
+    primary = async_engines().async_engine
+    results = await asyncio.gather(*(primary.connect().start() for _ in range(min(count, settings.pool_size))),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            if not isinstance(result, (exc.DBAPIError, OSError)):
+                raise result
+            logger.warning("pool warmup: %s", result)
+        else:
+            await result.close()
+
+
+async def dispose_engines():
+    """Closes the pooled connections of the engines made so far"""
+    if _engines is not None:
+        for target in [_engines.async_engine, *_engines.async_replica_engines]:
+            await target.dispose()
@@ -0,0 +1,110 @@
+"""Compression of response bodies: gzip always, brotli when the optional brotli package is installed"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.infrastructure.settings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses are then compressed with gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/xml", "text/")
+
+
+def negotiate(accept_encoding: str | None):
+    """Picks the smallest encoding the client accepts, skipping the ones it refuses with q=0"""
+    accepted = set()
+    for token in (accept_encoding or "").split(","):
+        name, _, parameters = token.partition(";")
+        if parameters.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+class Compressor:
+    """Incremental compressor of one response body"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.brotli_quality)
+            self._compress, self._finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self._compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "identity":
+        return body
+    compressor = Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+
+def compressible(headers: Headers):
+    return "content-encoding" not in headers and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compresses responses of at least minimum_size bytes with the best encoding the client accepts. Streamed
+    responses are compressed chunk by chunk; responses that already carry a Content-Encoding, like language
+    bundles and cached responses, are passed through"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding == "identity":
+            return await self.app(scope, receive, send)
+
+        start, compressor, passthrough = None, None, False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if start["status"] < 200 or start["status"] in (204, 304) or not compressible(headers) or \
+                        (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body})
+                await send(start)
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
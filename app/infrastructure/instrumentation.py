@@ -0,0 +1,178 @@
+"""Per request performance counters: latency, SQL statement count and database time per route, exposed in the
+Prometheus text format and optionally as Server-Timing headers"""
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class RequestStats:
+    """SQL statements run on behalf of the current request and the time spent in them"""
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# set by MetricsMiddleware; threadpool and background work started by the request inherit the same object
+request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    """Counts the statements an engine (the sync_engine of an async one) runs towards the current request"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """Counters and histograms per (method, route template); routes are templates, not raw paths, so that the
+    number of series stays bounded"""
+
+    def __init__(self):
+        self.requests = {}  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> Histogram of seconds
+        self.queries = {}  # (method, route) -> Histogram of statements per request
+        self.db_seconds = {}  # (method, route) -> total seconds
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            key = (method, route)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+                self.db_seconds[key] = 0.0
+            self.latency[key].observe(seconds)
+            self.queries[key].observe(stats.queries)
+            self.db_seconds[key] += stats.db_seconds
+
+    def render(self, gauges: dict | None = None) -> str:
+        """The metrics in the Prometheus text exposition format, followed by `gauges` as mlingo_<name> gauges"""
+        lines = ["# HELP mlingo_http_requests_total Requests handled, by route and status code",
+                 "# TYPE mlingo_http_requests_total counter"]
+        with self._lock:
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'mlingo_http_requests_total{{method="{method}",route="{label_value(route)}",'
+                             f'status="{status}"}} {count}')
+            for name, kind, help_text, series in (
+                    ("mlingo_http_request_duration_seconds", "histogram", "Request latency", self.latency),
+                    ("mlingo_http_request_queries", "histogram", "SQL statements run per request", self.queries),
+                    ("mlingo_http_request_db_seconds_total", "counter", "Time spent in SQL statements",
+                     self.db_seconds)):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (method, route), value in sorted(series.items()):
+                    labels = f'method="{method}",route="{label_value(route)}"'
+                    if isinstance(value, Histogram):
+                        lines.extend(value.samples(name, labels))
+                    else:
+                        lines.append(f"{name}{{{labels}}} {value:.6f}")
+        for name, value in (gauges or {}).items():
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE mlingo_{name} gauge", f"mlingo_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def route_template(scope):
+    """Path template of the route that handled a request; requests answered before routing, like response cache
+    hits, are matched against the routes here"""
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        route = next((candidate for candidate in scope["app"].router.routes
+                      if candidate.matches(scope)[0] == Match.FULL), None)
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """Times each request and counts the SQL it runs, recording both under its route; with server_timing the
+    response also carries them as a Server-Timing header, for the browser's network panel"""
+
+    def __init__(self, app, metrics: RequestMetrics = None, server_timing: bool = False):
+        self.app = app
+        self.metrics = metrics or request_metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing",
+                                   f'app;dur={(time.perf_counter() - start) * 1000:.1f}, '
+                                   f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            self.metrics.record(scope["method"], route_template(scope), status, time.perf_counter() - start, stats)
+            request_stats.reset(token)
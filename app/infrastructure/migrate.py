@@ -0,0 +1,23 @@
+"""Applies the Alembic migrations in app/infrastructure/migrations. Run with `python -m app.infrastructure.migrate`"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def alembic_config():
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "app" / "infrastructure" / "migrations"))
+    # leave the application's logging setup alone when migrating from inside the app
+    config.attributes["configure_logging"] = False
+    return config
+
+
+def upgrade_database(revision: str = "head"):
+    command.upgrade(alembic_config(), revision)
+
+
+if __name__ == "__main__":
+    upgrade_database()
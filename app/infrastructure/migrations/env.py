@@ -0,0 +1,48 @@
+"""Alembic environment: migrations run against the engine configured in app.infrastructure.settings"""
+import re
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.infrastructure.database import engine
+from app.v1.domain import models
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+# partitions of translations are created by the migrations and have no model of their own
+TRANSLATION_PARTITION = re.compile(r"translations_p\d+")
+
+
+def include_name(name, type_, parent_names):
+    return not (type_ == "table" and TRANSLATION_PARTITION.fullmatch(name))
+
+
+def run_migrations_offline():
+    context.configure(url=engine.url.render_as_string(hide_password=False), target_metadata=target_metadata,
+                      literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
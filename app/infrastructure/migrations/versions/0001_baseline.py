@@ -0,0 +1,139 @@
+"""Baseline: the schema that Base.metadata.create_all used to build at startup
+
+Tables that already exist are left alone, so databases created by create_all adopt this revision as-is.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+activity_status = postgresql.ENUM('INACTIVE', 'ACTIVE', name='activitystatus', create_type=False)
+roles_enum = postgresql.ENUM('ADMIN', 'DEVELOPER', 'TRANSLATOR', name='rolesenum', create_type=False)
+key_status = postgresql.ENUM('DRAFT', 'PUBLISHED', name='keystatus', create_type=False)
+
+
+def upgrade():
+    bind = op.get_bind()
+    for enum in (activity_status, roles_enum, key_status):
+        enum.create(bind, checkfirst=True)
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if 'users_auth' not in existing:
+        op.create_table(
+            'users_auth',
+            sa.Column('user_id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('password', sa.String(), nullable=True),
+            sa.Column('user_email', sa.String(), nullable=False),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('modified_on', sa.TIMESTAMP(timezone=True), nullable=True),
+            sa.Column('invited_by', sa.String(), nullable=True),
+            sa.Column('modified_by', sa.Integer(), nullable=True),
+            sa.Column('change_password_token', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('user_id'),
+            sa.UniqueConstraint('user_email'))
+
+    if 'projects' not in existing:
+        op.create_table(
+            'projects',
+            sa.Column('project_id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('project_name', sa.String(), nullable=False),
+            sa.Column('project_logo', sa.String(), nullable=True),
+            sa.Column('owner', sa.Integer(), sa.ForeignKey('users_auth.user_id'), nullable=False),
+            sa.Column('activity_status', activity_status, nullable=False),
+            sa.Column('onboarding_date', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'),
+                      nullable=False),
+            sa.Column('modified_on', sa.TIMESTAMP(timezone=True), nullable=True),
+            sa.Column('modified_by', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('project_id'))
+
+    if 'environments' not in existing:
+        op.create_table(
+            'environments',
+            sa.Column('environment_id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.project_id'), nullable=False),
+            sa.Column('environment_name', sa.String(), nullable=False),
+            sa.Column('is_main', sa.Boolean(), nullable=True),
+            sa.Column('activity_status', activity_status, nullable=False),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('modified_on', sa.TIMESTAMP(timezone=True), nullable=True),
+            sa.Column('modified_by', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('environment_id'))
+
+    if 'user_project_env' not in existing:
+        op.create_table(
+            'user_project_env',
+            sa.Column('upe_id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users_auth.user_id'), nullable=False),
+            sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.project_id'), nullable=True),
+            sa.Column('environment_id', sa.Integer(), sa.ForeignKey('environments.environment_id'), nullable=True),
+            sa.Column('roles', postgresql.ARRAY(roles_enum), nullable=True),
+            sa.PrimaryKeyConstraint('upe_id'))
+
+    if 'user_details' not in existing:
+        op.create_table(
+            'user_details',
+            sa.Column('details_id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users_auth.user_id'), nullable=False),
+            sa.Column('user_name', sa.String(), nullable=True),
+            sa.Column('user_contact', sa.BIGINT(), nullable=True),
+            sa.Column('user_image', sa.String(), nullable=True),
+            sa.Column('activity_status', activity_status, nullable=True),
+            sa.Column('modified_on', sa.TIMESTAMP(timezone=True), nullable=True),
+            sa.Column('modified_by', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('details_id'),
+            sa.UniqueConstraint('user_contact'))
+
+    if 'languages' not in existing:
+        op.create_table(
+            'languages',
+            sa.Column('language_id', sa.BIGINT(), nullable=False),
+            sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.project_id'), nullable=True),
+            sa.Column('environment_id', sa.Integer(), sa.ForeignKey('environments.environment_id'), nullable=True),
+            sa.Column('language', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('language_id'))
+        op.create_index('ix_languages_language_id', 'languages', ['language_id'])
+        op.create_index('ix_languages_language', 'languages', ['language'], unique=True)
+
+    if 'keys' not in existing:
+        op.create_table(
+            'keys',
+            sa.Column('key_id', sa.BIGINT(), nullable=False),
+            sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.project_id'), nullable=True),
+            sa.Column('environment_id', sa.Integer(), sa.ForeignKey('environments.environment_id'), nullable=True),
+            sa.Column('key', sa.String(), nullable=False),
+            sa.Column('status', key_status, nullable=False),
+            sa.PrimaryKeyConstraint('key_id'),
+            sa.UniqueConstraint('key'))
+        op.create_index('ix_keys_key_id', 'keys', ['key_id'])
+
+    if 'translations' not in existing:
+        op.create_table(
+            'translations',
+            sa.Column('translation_id', sa.BIGINT(), nullable=False),
+            sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.project_id'), nullable=True),
+            sa.Column('environment_id', sa.Integer(), sa.ForeignKey('environments.environment_id'), nullable=True),
+            sa.Column('key_id', sa.BIGINT(), sa.ForeignKey('keys.key_id'), nullable=True),
+            sa.Column('language_id', sa.BIGINT(), sa.ForeignKey('languages.language_id'), nullable=True),
+            sa.Column('translation', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('translation_id'))
+        op.create_index('ix_translations_translation_id', 'translations', ['translation_id'])
+        op.create_index('ix_translations_key_id', 'translations', ['key_id'])
+        op.create_index('ix_translations_language_id', 'translations', ['language_id'])
+
+
+def downgrade():
+    for table in ('translations', 'keys', 'languages', 'user_details', 'user_project_env', 'environments',
+                  'projects', 'users_auth'):
+        op.drop_table(table)
+    bind = op.get_bind()
+    for enum in (key_status, roles_enum, activity_status):
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,25 @@
+"""Revision and modification time of translation rows, used by the delta sync endpoint
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE translations "
+               "ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint, "
+               "ADD COLUMN IF NOT EXISTS modified_on TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()")
+    op.create_index('ix_translations_revision', 'translations', ['revision'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_translations_revision', 'translations')
+    op.drop_column('translations', 'modified_on')
+    op.drop_column('translations', 'revision')
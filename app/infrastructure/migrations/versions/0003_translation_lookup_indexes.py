@@ -0,0 +1,55 @@
+"""Unique scoped (key, language) index and covering indexes for the translation lookup path
+
+Requires PostgreSQL 15 for NULLS NOT DISTINCT: rows outside any project or environment must still collide.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # without a uniqueness guarantee duplicates may have piled up; keep the most recent row of each pair
+    op.execute("""
+        DELETE FROM translations older
+        USING translations newer
+        WHERE older.project_id IS NOT DISTINCT FROM newer.project_id
+          AND older.environment_id IS NOT DISTINCT FROM newer.environment_id
+          AND older.key_id = newer.key_id
+          AND older.language_id = newer.language_id
+          AND older.translation_id < newer.translation_id
+    """)
+    op.execute("ALTER TABLE translations DROP CONSTRAINT IF EXISTS uq_translations_key_language")
+
+    op.create_index('ux_translations_scope_key_language', 'translations',
+                    ['project_id', 'environment_id', 'key_id', 'language_id'], unique=True,
+                    postgresql_nulls_not_distinct=True)
+    # (key_id, language_id) serves the getAllTranslations join and every point lookup,
+    # (language_id, key_id) the per-language listings; both can be answered from the index alone
+    op.create_index('ix_translations_key_language', 'translations', ['key_id', 'language_id'],
+                    postgresql_include=['translation'])
+    op.create_index('ix_translations_language_key', 'translations', ['language_id', 'key_id'],
+                    postgresql_include=['translation'])
+    # superseded by the composite indexes above and, for translation_id, by the primary key
+    for index in ('ix_translations_key_id', 'ix_translations_language_id', 'ix_translations_translation_id'):
+        op.drop_index(index, 'translations', if_exists=True)
+
+    op.create_index('ix_user_project_env_user_id', 'user_project_env', ['user_id'], if_not_exists=True)
+    op.create_index('ix_environments_project_id', 'environments', ['project_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_environments_project_id', 'environments')
+    op.drop_index('ix_user_project_env_user_id', 'user_project_env')
+    op.create_index('ix_translations_translation_id', 'translations', ['translation_id'])
+    op.create_index('ix_translations_language_id', 'translations', ['language_id'])
+    op.create_index('ix_translations_key_id', 'translations', ['key_id'])
+    op.drop_index('ix_translations_language_key', 'translations')
+    op.drop_index('ix_translations_key_language', 'translations')
+    op.drop_index('ux_translations_scope_key_language', 'translations')
@@ -0,0 +1,94 @@
+"""Project/environment scoped keys and languages, translations hash-partitioned by project
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# partitions of translations; a project's rows all hash to one of them. Changing the count means
+# re-partitioning, so it is fixed here rather than configurable
+TRANSLATION_PARTITIONS = 16
+
+TRANSLATION_COLUMNS = "translation_id, project_id, environment_id, key_id, language_id, translation, revision, " \
+                      "modified_on"
+
+
+def create_translations_table(partition_by: str = ""):
+    op.execute(f"""
+        CREATE TABLE translations (
+            translation_id BIGINT NOT NULL DEFAULT nextval('translations_translation_id_seq'),
+            project_id INTEGER REFERENCES projects (project_id),
+            environment_id INTEGER REFERENCES environments (environment_id),
+            key_id BIGINT REFERENCES keys (key_id),
+            language_id BIGINT REFERENCES languages (language_id),
+            translation VARCHAR,
+            revision BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint,
+            modified_on TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        ) {partition_by}
+    """)
+
+
+def move_translations(partition_by: str = ""):
+    """Rebuilds translations (partitioned or not), keeping its rows, ids and revisions"""
+    op.execute("ALTER TABLE translations RENAME TO translations_previous")
+    for index in ('ux_translations_scope_key_language', 'ix_translations_key_language',
+                  'ix_translations_language_key', 'ix_translations_revision', 'ix_translations_translation_id',
+                  'ix_translations_scope_language_key', 'ix_translations_scope_revision'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    # free the constraint names for the new table
+    for column in ('project_id', 'environment_id', 'key_id', 'language_id'):
+        op.execute(f"ALTER TABLE translations_previous DROP CONSTRAINT IF EXISTS translations_{column}_fkey")
+
+    create_translations_table(partition_by)
+    if partition_by:
+        for remainder in range(TRANSLATION_PARTITIONS):
+            op.execute(f"CREATE TABLE translations_p{remainder} PARTITION OF translations "
+                       f"FOR VALUES WITH (MODULUS {TRANSLATION_PARTITIONS}, REMAINDER {remainder})")
+
+    op.execute(f"INSERT INTO translations ({TRANSLATION_COLUMNS}) "
+               f"SELECT {TRANSLATION_COLUMNS} FROM translations_previous")
+    op.execute("ALTER SEQUENCE translations_translation_id_seq OWNED BY translations.translation_id")
+    op.execute("DROP TABLE translations_previous")
+
+
+def upgrade():
+    op.execute("ALTER TABLE keys DROP CONSTRAINT IF EXISTS keys_key_key")
+    op.create_index('ux_keys_scope_key', 'keys', ['project_id', 'environment_id', 'key'], unique=True,
+                    postgresql_nulls_not_distinct=True)
+    op.drop_index('ix_languages_language', 'languages', if_exists=True)
+    op.create_index('ux_languages_scope_language', 'languages', ['project_id', 'environment_id', 'language'],
+                    unique=True, postgresql_nulls_not_distinct=True)
+
+    move_translations("PARTITION BY HASH (project_id)")
+    # indexes are created after the copy and cascade to every partition
+    op.create_index('ux_translations_scope_key_language', 'translations',
+                    ['project_id', 'environment_id', 'key_id', 'language_id'], unique=True,
+                    postgresql_nulls_not_distinct=True, postgresql_include=['translation'])
+    op.create_index('ix_translations_scope_language_key', 'translations',
+                    ['project_id', 'environment_id', 'language_id', 'key_id'], postgresql_include=['translation'])
+    op.create_index('ix_translations_scope_revision', 'translations', ['project_id', 'environment_id', 'revision'])
+    op.create_index('ix_translations_translation_id', 'translations', ['translation_id'])
+
+
+def downgrade():
+    move_translations()
+    op.execute("ALTER TABLE translations ADD PRIMARY KEY (translation_id)")
+    op.create_index('ux_translations_scope_key_language', 'translations',
+                    ['project_id', 'environment_id', 'key_id', 'language_id'], unique=True,
+                    postgresql_nulls_not_distinct=True)
+    op.create_index('ix_translations_key_language', 'translations', ['key_id', 'language_id'],
+                    postgresql_include=['translation'])
+    op.create_index('ix_translations_language_key', 'translations', ['language_id', 'key_id'],
+                    postgresql_include=['translation'])
+    op.create_index('ix_translations_revision', 'translations', ['revision'])
+
+    op.drop_index('ux_languages_scope_language', 'languages')
+    op.create_index('ix_languages_language', 'languages', ['language'], unique=True)
+    op.drop_index('ux_keys_scope_key', 'keys')
+    op.create_unique_constraint('keys_key_key', 'keys', ['key'])
@@ -0,0 +1,25 @@
+"""Indexes for keyset pagination and prefix filtering of the translation listings
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_keys_scope_key_id', 'keys', ['project_id', 'environment_id', 'key_id'])
+    op.create_index('ix_keys_scope_key_pattern', 'keys', ['project_id', 'environment_id', 'key'],
+                    postgresql_ops={'key': 'text_pattern_ops'})
+    op.create_index('ix_languages_scope_language_id', 'languages', ['project_id', 'environment_id', 'language_id'])
+
+
+def downgrade():
+    op.drop_index('ix_languages_scope_language_id', 'languages')
+    op.drop_index('ix_keys_scope_key_pattern', 'keys')
+    op.drop_index('ix_keys_scope_key_id', 'keys')
@@ -0,0 +1,31 @@
+"""Trigram and full-text indexes for searchTranslations
+
+pg_trgm ships with PostgreSQL's contrib modules; creating the extension needs the CREATE privilege on the database.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_keys_key_trgm', 'keys', ['key'], postgresql_using='gin',
+                    postgresql_ops={'key': 'gin_trgm_ops'})
+    op.create_index('ix_translations_translation_trgm', 'translations', ['translation'], postgresql_using='gin',
+                    postgresql_ops={'translation': 'gin_trgm_ops'})
+    op.create_index('ix_translations_translation_fts', 'translations',
+                    [sa.text("to_tsvector('simple'::regconfig, coalesce(translation, ''))")], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_translations_translation_fts', 'translations')
+    op.drop_index('ix_translations_translation_trgm', 'translations')
+    op.drop_index('ix_keys_key_trgm', 'keys')
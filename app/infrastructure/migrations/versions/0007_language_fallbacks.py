@@ -0,0 +1,24 @@
+"""Per-language fallback for missing translations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('languages', sa.Column('fallback_language_id', sa.BIGINT(), nullable=True))
+    op.create_foreign_key('languages_fallback_language_id_fkey', 'languages', 'languages',
+                          ['fallback_language_id'], ['language_id'])
+
+
+def downgrade():
+    op.drop_constraint('languages_fallback_language_id_fkey', 'languages', type_='foreignkey')
+    op.drop_column('languages', 'fallback_language_id')
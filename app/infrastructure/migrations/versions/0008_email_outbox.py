@@ -0,0 +1,42 @@
+"""Outbox of emails waiting for the background sender
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+outbox_status = postgresql.ENUM('PENDING', 'SENT', 'FAILED', name='outboxstatus', create_type=False)
+
+
+def upgrade():
+    outbox_status.create(op.get_bind(), checkfirst=True)
+    op.create_table(
+        'email_outbox',
+        sa.Column('email_id', sa.BIGINT(), primary_key=True),
+        sa.Column('recipient', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('body', sa.String(), nullable=False),
+        sa.Column('status', outbox_status, nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('next_attempt_at', postgresql.TIMESTAMP(timezone=True), nullable=False,
+                  server_default=sa.text('now()')),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), nullable=False,
+                  server_default=sa.text('now()')),
+        sa.Column('sent_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index('ix_email_outbox_due', 'email_outbox', ['next_attempt_at'],
+                    postgresql_where=sa.text("status = 'PENDING'"))
+
+
+def downgrade():
+    op.drop_index('ix_email_outbox_due', 'email_outbox')
+    op.drop_table('email_outbox')
+    outbox_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,129 @@
+"""Routing of read only requests to streaming replicas of the primary. Replicas take turns, and a background
+thread checks each one every few seconds, taking it out of the rotation while it is down or more than max_lag
+seconds behind. Reads that have to see a recent write go to the primary: those of a client for max_lag seconds
+after its own writes (tracked with a cookie), and those of a catalog written that recently"""
+import itertools
+import math
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool
+from starlette.datastructures import MutableHeaders
+
+# seconds the replica's replay is behind its primary; 0 when it has replayed everything it received, since an
+# idle primary sends nothing and the age of the last replayed transaction keeps growing. After a restart the
+# replica streams again from the start of a WAL segment it has already replayed, hence >= rather than =
+LAG_QUERY = text("SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= pg_last_wal_receive_lsn() "
+                 "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END")
+WRITE_COOKIE = "mlingo_wrote_at"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class Replica:
+    __slots__ = ("probe", "healthy", "lag")
+
+    def __init__(self, url: str, connect_timeout: int):
+        # health checks use a connection of their own, so that they neither wait for nor take a pooled one
+        self.probe = create_engine(url, poolclass=NullPool, connect_args={"connect_timeout": connect_timeout})
+        self.healthy = False
+        self.lag = None
+
+    def check(self, max_lag: float):
+        try:
+            with self.probe.connect() as connection:
+                self.lag = float(connection.scalar(LAG_QUERY) or 0)
+            self.healthy = self.lag <= max_lag
+        except Exception:
+            self.lag, self.healthy = None, False
+
+
+class ReplicaSet:
+    """The replicas reads can go to, in turn; empty when no replica is configured"""
+
+    def __init__(self, urls, max_lag: float = 5, check_interval: float = 2, connect_timeout: int = 2):
+        self.replicas = [Replica(url, connect_timeout) for url in urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def start(self):
+        """Starts the health checks, once; replicas only join the rotation after their first one passes"""
+        with self._lock:
+            if self._thread is None and self.replicas:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.check()
+            self._stopped.wait(self.check_interval)
+
+    def pick(self):
+        """Index of the next healthy replica, None when there is none and the primary has to serve the read"""
+        self.start()
+        healthy = [index for index, replica in enumerate(self.replicas) if replica.healthy]
+        return healthy[next(self._turn) % len(healthy)] if healthy else None
+
+    def watch(self, index: int, engine):
+        """Takes a replica out of the rotation as soon as one of its connections is lost, without waiting for the
+        next check; `engine` serves the replica's reads (the sync_engine of an async one)"""
+        def on_error(context):
+            if context.is_disconnect:
+                self.replicas[index].healthy = False
+        event.listen(engine, "handle_error", on_error)
+
+    def status(self):
+        return [{"url": replica.probe.url.render_as_string(hide_password=True), "healthy": replica.healthy,
+                 "lag_seconds": replica.lag} for replica in self.replicas]
+
+
+def reads_primary(request, max_lag: float):
+    """Whether a request has to read from the primary: its client wrote less than max_lag seconds ago, or the
+    response cache found a write to its catalog that recent"""
+    if request.scope.get("state", {}).get("read_primary"):
+        return True
+    try:
+        return time.time() - float(request.cookies.get(WRITE_COOKIE, 0)) < max_lag
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Marks the clients of successful writes with a cookie holding the time of the write, which expires after
+    max_lag seconds, so that their next reads go to the primary and see the write"""
+
+    def __init__(self, app, max_lag: float):
+        self.app = app
+        self.max_lag = max_lag
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie", f"{WRITE_COOKIE}={time.time():.3f}; Max-Age={max(1, math.ceil(self.max_lag))}; "
+                                  f"Path=/; HttpOnly; SameSite=Lax")
+            await send(message)
+
+        await self.app(scope, receive, send_marked)
@@ -0,0 +1,223 @@
+"""Shared cache of catalog read responses, served with ETags. Entries are keyed by the catalog's generation, the
+time of its last write, which the write services move on, so a write makes every cached read of its catalog
+unreachable at once instead of looking them up one by one. The cache lives in process, or in Redis (or any client
+with the same get/set methods) when redis_url is set, which also shares the generations between worker
+processes"""
+import hashlib
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from anyio.to_thread import run_sync
+from starlette.datastructures import Headers
+
+from app.infrastructure.compression import negotiate, compress
+from app.infrastructure.lru_cache import LRUCache
+from app.infrastructure.settings import settings
+
+try:
+    import redis
+except ImportError:  # redis is optional, only needed to share the cache between processes
+    redis = None
+
+# headers recomputed for every response served from the cache
+RESPONSE_HEADERS = {b"content-length", b"content-encoding", b"etag", b"cache-control", b"vary"}
+
+
+class CachedResponse:
+    """The identity body of a response with its headers, plus the compressed bodies made so far"""
+    __slots__ = ("headers", "body", "digest", "bodies")
+
+    def __init__(self, headers: list, body: bytes, digest: str | None = None):
+        self.headers = [(name, value) for name, value in headers if name.lower() not in RESPONSE_HEADERS]
+        self.body = body
+        self.digest = digest or hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {"identity": body}
+
+    def etag(self, encoding: str):
+        # each encoding is a distinct representation, so each gets its own strong validator
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+    def matches(self, if_none_match: str | None):
+        if not if_none_match:
+            return False
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or any(self.etag(encoding) in candidates for encoding in ("identity", "gzip", "br"))
+
+    def encoded(self, encoding: str):
+        body = self.bodies.get(encoding)
+        if body is None:
+            body = self.bodies[encoding] = compress(self.body, encoding)
+        return body
+
+    def dumps(self):
+        head = orjson.dumps({"digest": self.digest, "headers": [[name.decode("latin-1"), value.decode("latin-1")]
+                                                                for name, value in self.headers]})
+        return head + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, blob: bytes):
+        head, _, body = blob.partition(b"\n")
+        head = orjson.loads(head)
+        return cls([(name.encode("latin-1"), value.encode("latin-1")) for name, value in head["headers"]], body,
+                   head["digest"])
+
+
+class LocalBackend:
+    """Entries in an in-process LRU. Generations are per process too, so with several workers a write only
+    reaches the other workers' entries once they expire after ttl seconds"""
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float | None):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, catalog: str):
+        return self.generations.get(catalog, 0)
+
+    def bump(self, catalog: str):
+        with self._lock:
+            # strictly increasing, even for writes within the clock's resolution
+            self.generations[catalog] = max(time.time(), self.generations.get(catalog, 0) + 1e-6)
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def set(self, key: str, entry: CachedResponse):
+        self.entries.set(key, entry)
+
+    def stats(self):
+        return {"backend": "local", **self.entries.stats()}
+
+
+class RedisBackend:
+    """Entries and generations in Redis, shared by every worker; entries expire after ttl seconds. Takes a
+    client, so that anything with get and set(ex=) will do"""
+    blocking = True
+
+    def __init__(self, client, ttl: float | None, prefix: str = "mlingo:responses:"):
+        self.client = client
+        self.ttl = int(ttl) if ttl else None
+        self.prefix = prefix
+
+    def generation(self, catalog: str):
+        return float(self.client.get(f"{self.prefix}generation:{catalog}") or 0)
+
+    def bump(self, catalog: str):
+        self.client.set(f"{self.prefix}generation:{catalog}", f"{time.time():.6f}")
+
+    def get(self, key: str):
+        blob = self.client.get(self.prefix + key)
+        return CachedResponse.loads(blob) if blob is not None else None
+
+    def set(self, key: str, entry: CachedResponse):
+        self.client.set(self.prefix + key, entry.dumps(), ex=self.ttl)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def catalog_name(project_id, environment_id):
+    return f"{project_id if project_id is not None else ''}:{environment_id if environment_id is not None else ''}"
+
+
+class ResponseCache:
+    def __init__(self, backend, max_body: int = 8 * 1024 * 1024):
+        self.backend = backend
+        self.max_body = max_body
+
+    def invalidate(self, scope):
+        """Makes the cached reads of a catalog (a schema.Scope) unreachable; call it after committing a write"""
+        self.backend.bump(catalog_name(scope.projectId, scope.environmentId))
+
+    async def call(self, method, *args):
+        return await run_sync(method, *args) if self.backend.blocking else method(*args)
+
+
+def response_cache_from_settings():
+    if settings.redis_url:
+        if redis is None:
+            raise RuntimeError("A shared response cache needs redis, install it with `pip install redis`")
+        backend = RedisBackend(redis.Redis.from_url(settings.redis_url), settings.response_cache_ttl)
+    else:
+        backend = LocalBackend(settings.response_cache_size, settings.response_cache_ttl)
+    return ResponseCache(backend, settings.response_cache_max_body)
+
+
+response_cache = response_cache_from_settings()
+
+
+def request_catalog(query: list):
+    """Catalog name of a request from its projectId and environmentId parameters, normalized the way the route
+    parses them; None when they are not integers and the route is going to reject the request anyway"""
+    parameters = dict(query)
+    try:
+        return catalog_name(*(int(parameters[name]) if parameters.get(name) else None
+                              for name in ("projectId", "environmentId")))
+    except ValueError:
+        return None
+
+
+class ResponseCacheMiddleware:
+    """Serves GET requests to `paths` from the response cache, answering 304 when the client's ETag is current.
+    Only successful responses are stored; the ResponseDTO status in the body tells them apart from errors.
+    Misses on a catalog written less than primary_window seconds ago are read from the primary (see replicas),
+    so that a lagging replica cannot fill the cache with the catalog as it was before the write"""
+
+    def __init__(self, app, paths, cache: ResponseCache = None, minimum_size: int = 1024, max_age: int = 0,
+                 primary_window: float = 0):
+        self.app = app
+        self.paths = set(paths)
+        self.cache = cache or response_cache
+        self.minimum_size = minimum_size
+        self.cache_control = f"public, max-age={max_age}".encode() if max_age else b"no-cache"
+        self.primary_window = primary_window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        query = sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        catalog = request_catalog(query)
+        if catalog is None:
+            return await self.app(scope, receive, send)
+
+        generation = await self.cache.call(self.cache.backend.generation, catalog)
+        key = f"{catalog}:{generation}:{scope['path']}?{urlencode(query)}"
+        entry = await self.cache.call(self.cache.backend.get, key)
+        if entry is None:
+            if time.time() - generation < self.primary_window:
+                scope.setdefault("state", {})["read_primary"] = True
+            messages = []
+
+            async def capture(message):
+                messages.append(message)
+
+            await self.app(scope, receive, capture)
+            body = b"".join(message.get("body", b"") for message in messages[1:])
+            if messages[0]["status"] != 200 or not body.startswith(b'{"status":200,'):
+                for message in messages:
+                    await send(message)
+                return
+            entry = CachedResponse(messages[0]["headers"], body)
+            if len(body) <= self.cache.max_body:
+                await self.cache.call(self.cache.backend.set, key, entry)
+        await self.serve(entry, scope, send)
+
+    async def serve(self, entry: CachedResponse, scope, send):
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding")) \
+            if len(entry.body) >= self.minimum_size else "identity"
+        headers = [(b"etag", entry.etag(encoding).encode()), (b"cache-control", self.cache_control),
+                   (b"vary", b"Accept-Encoding")]
+        if entry.matches(request_headers.get("if-none-match")):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            return await send({"type": "http.response.body", "body": b""})
+
+        body = entry.encoded(encoding)
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": entry.headers + headers})
+        await send({"type": "http.response.body", "body": body})
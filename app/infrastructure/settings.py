@@ -0,0 +1,112 @@
+"""Runtime configuration, read from MLINGO_* environment variables or a .env file"""
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+def asyncpg_url(url: str):
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+class Settings(BaseSettings):
+    """Every field can be overridden with an environment variable, e.g. MLINGO_POOL_SIZE=20"""
+    model_config = SettingsConfigDict(env_prefix="MLINGO_", env_file=".env", extra="ignore")
+
+    # a local development database; deployments set MLINGO_DATABASE_URL in the environment or .env
+    database_url: str = "postgresql://postgres@localhost/mlingo"
+
+    # "sync" serves the routes from the threadpool, "async" mounts the asyncpg backed router instead
+    db_mode: Literal["sync", "async"] = "sync"
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int | None = None
+    # connections each worker opens to the primary at startup (at most pool_size), so that its first requests do
+    # not each wait for a new one; 0 opens them as requests need them
+    pool_warmup: int = 0
+
+    # read only routes take turns on these streaming replicas (a JSON list of URLs), skipping the ones that are
+    # down or more than replica_max_lag seconds behind; reads by a client that wrote in the last replica_max_lag
+    # seconds, and reads of a catalog written that recently, go to the primary
+    replica_urls: list[str] = []
+    replica_max_lag: float = 5
+    replica_check_interval: float = 2
+
+    # Behind PgBouncer in transaction mode: no client side pool, no prepared statements and no
+    # startup options, so statement_timeout has to be set on the database role instead
+    pgbouncer_mode: bool = False
+
+    # bcrypt cost factor; hashes made with another cost are upgraded on the next successful login
+    bcrypt_rounds: int = 12
+    # processes in the hashing pool, None for one per core, 0 to hash in the calling thread, or in the threadpool
+    # when the caller is a coroutine
+    password_hash_workers: int | None = None
+    password_hash_max_pending: int = 64
+
+    id_cache_size: int = 100_000
+    id_cache_ttl: float | None = None
+
+    # seconds after which a compiled language bundle is rebuilt, picking up writes made by other workers
+    bundle_ttl: float | None = 300
+
+    # apply pending Alembic migrations at startup; turn off when migrations run as a separate deploy step
+    auto_migrate: bool = True
+
+    # catalog exports go to this directory, or to this prefix of export_bucket when one is set (any S3 compatible
+    # service, e.g. MinIO through export_endpoint_url)
+    export_dir: str = "exports"
+    export_bucket: str | None = None
+    export_endpoint_url: str | None = None
+    # language whose text is the source of XLIFF units and PO comments
+    export_source_language: str | None = "en"
+
+    # responses of at least compress_min_size bytes are compressed with brotli (when installed) or gzip
+    compress_min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 5
+
+    # catalog reads are cached until a write to their catalog, in process or in Redis when redis_url is set;
+    # in process, writes handled by another worker only show up once the entries are response_cache_ttl old
+    response_cache_size: int = 1_000
+    response_cache_ttl: float | None = 60
+    response_cache_max_body: int = 8 * 1024 * 1024
+    redis_url: str | None = None
+    # max-age of cached catalog reads for browsers and CDNs; 0 makes them revalidate with the ETag every time
+    http_max_age: int = 0
+
+    # adds Server-Timing headers (total and SQL time, statement count) to every response
+    server_timing: bool = False
+
+    # Outgoing mail (password reset codes) is queued in the email_outbox table and sent by a background sender in
+    # each worker, or only by `python -m app.v1.application.mail` when outbox_sender is off. Credentials come
+    # from the environment (MLINGO_SMTP_USERNAME, MLINGO_SMTP_PASSWORD); without a username there is no login
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_username: str | None = None
+    smtp_password: str | None = None
+    # From address, smtp_username when unset
+    smtp_sender: str | None = None
+    smtp_timeout: float = 10
+    # open connections kept between messages, which is also how many messages go out at once
+    smtp_pool_size: int = 2
+    smtp_idle_timeout: float = 60
+    outbox_sender: bool = True
+    outbox_batch_size: int = 50
+    outbox_poll_interval: float = 5
+    # a message that failed is retried after outbox_retry_delay seconds, doubling up to outbox_retry_max_delay,
+    # until outbox_max_attempts; sent and failed messages are deleted outbox_retention_days after being queued
+    outbox_max_attempts: int = 8
+    outbox_retry_delay: float = 30
+    outbox_retry_max_delay: float = 3600
+    outbox_retention_days: float = 7
+
+    @property
+    def async_database_url(self):
+        return asyncpg_url(self.database_url)
+
+
+settings = Settings()
@@ -1,13 +1,63 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+from app.infrastructure.compression import CompressionMiddleware
+from app.infrastructure import database
+from app.infrastructure.database import DB_MODE, replica_set
+from app.infrastructure.instrumentation import MetricsMiddleware
+from app.infrastructure.replicas import ReadYourWritesMiddleware
+from app.infrastructure.response_cache import ResponseCacheMiddleware
+from app.infrastructure.settings import settings
+from app.v1.application.mail.outbox import outbox_sender
+from app.v1.application.password_handler.pwd_encrypt_decrypt import shutdown_executor
+
+if DB_MODE == "async":
+    from app.infrastructure import async_database
+    from app.v1.application import async_api_interceptor as api_interceptor
+else:
+    from app.v1.application import api_interceptor
+
+# catalog reads whose responses are cached until the next write to their catalog
+CACHED_PATHS = ["/v1/getAllTranslations", "/v1/getLanguageKeys", "/v1/searchTranslations", "/v1/getLanguageCoverage",
+                "/v1/getAllLanguage"]
+
 
-from app.infrastructure.database import engine
-from app.v1.application import api_interceptor
-from app.v1.domain import models
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown of each worker. Importing the app connects to nothing: the engines are made on first
+    use, and migrations, pool warmup, replica health checks and the email outbox sender only start here"""
+    if settings.auto_migrate:
+        # Alembic is only imported by the workers that migrate
+        from app.infrastructure.migrate import upgrade_database
+        await run_in_threadpool(upgrade_database)
+    if DB_MODE == "async":
+        await async_database.warm_up_pool(settings.pool_warmup)
+    else:
+        await run_in_threadpool(database.warm_up_pool, settings.pool_warmup)
+    replica_set.start()
+    if settings.outbox_sender:
+        outbox_sender.start()
+    yield
+    outbox_sender.stop()
+    replica_set.stop()
+    shutdown_executor()
+    if DB_MODE == "async":
+        await async_database.dispose_engines()
+    database.dispose_engines()
 
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+# the middleware added last runs first: metrics, CORS, read-your-writes, compression, then the response cache
+app.add_middleware(ResponseCacheMiddleware, paths=CACHED_PATHS, minimum_size=settings.compress_min_size,
+                   max_age=settings.http_max_age,
+                   primary_window=settings.replica_max_lag if settings.replica_urls else 0)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compress_min_size)
+if settings.replica_urls:
+    app.add_middleware(ReadYourWritesMiddleware, max_lag=settings.replica_max_lag)
 origins = ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -15,5 +65,6 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"])
+app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
 
 app.include_router(api_interceptor.router)
@@ -1,55 +1,172 @@
 """Apis are intercepted in this file"""
-from typing import Annotated
+from typing import Annotated, Literal, List
 
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, UploadFile, Query, BackgroundTasks
 from fastapi import Depends
+from pydantic import TypeAdapter, ValidationError
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
 
-from app.infrastructure.database import engine, get_db
+from app.infrastructure.database import get_db, get_read_db, engines, replica_set
+from app.infrastructure.instrumentation import request_metrics
 from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.export.pipeline import start_export, fetch_export_status
+from app.v1.application.importer.pipeline import start_import, fetch_import_status
+from app.v1.application.mail.outbox import outbox_sender
+from app.v1.application.service.bundle_service import bundle_response_parts
 from app.v1.application.service.language_service import add_translation, fetch_language_keys, \
-    fetch_all_translation, update_translation
+    fetch_all_translation, update_translation, stream_all_translation, stream_language_keys, STREAM_MEDIA_TYPES, \
+    bulk_import_translations, id_cache_stats, fetch_language_bundle, fetch_translation_changes, fetch_all_language, \
+    set_language_fallback, fetch_language_coverage
+from app.v1.application.service.environment_service import fetch_environment_diff, promote_environment
 from app.v1.application.service.project_services import add_project
-from app.v1.application.service.user_services import auth_function, add_user, initiate_pwd_reset, check_token, \
-    change_password, get_projects
-from app.v1.domain import models, schema
+from app.v1.application.service.search_service import search_translations
+from app.v1.application.service.user_services import auth_function_async, add_user_async, initiate_pwd_reset, \
+    check_token_async, change_password_async, get_projects
+from app.v1.domain import schema
 
 router = APIRouter()
-models.Base.metadata.create_all(bind=engine)
 
 """----------------------------------------------Language Related APIs-------------------------------------------------------------------"""
 
 
 @router.post("/v1/addTranslation")
-def new_translation(addTranslation: schema.Translate, db=Depends(get_db)):
-    return add_translation(addTranslation, db)
+def new_translation(addTranslation: schema.Translate, scope: schema.Scope = Depends(), db=Depends(get_db)):
+    return add_translation(addTranslation, db, scope)
 
 
 @router.put("/v1/updateTranslation")
-def edit_translation(editTranslation: schema.Translate, db=Depends(get_db)):
-    return update_translation(editTranslation, db)
+def edit_translation(editTranslation: schema.Translate, scope: schema.Scope = Depends(), db=Depends(get_db)):
+    return update_translation(editTranslation, db, scope)
+
+
+@router.post("/v1/bulkImportTranslations")
+def bulk_import(translations: List[schema.Translate], scope: schema.Scope = Depends(), db=Depends(get_db)):
+    return bulk_import_translations(translations, db, scope=scope)
+
+
+@router.post("/v1/bulkImportTranslationsFile")
+def bulk_import_file(file: UploadFile, scope: schema.Scope = Depends(), db=Depends(get_db)):
+    """Imports a JSON file holding a list of translations in the addTranslation format"""
+    try:
+        translations = TypeAdapter(List[schema.Translate]).validate_json(file.file.read())
+    except ValidationError as e:
+        return ResponseDTO(204, f"{str(e)}", {})
+    return bulk_import_translations(translations, db, scope=scope)
+
+
+@router.post("/v1/importCatalogFile")
+def import_catalog_file(file: UploadFile, background_tasks: BackgroundTasks,
+                        options: schema.ImportOptions = Depends(), scope: schema.Scope = Depends()):
+    """Imports a PO, XLIFF, ARB or JSON catalog in the background; poll getImportStatus with the returned job_id"""
+    return start_import(file, background_tasks, options, scope)
+
+
+@router.get("/v1/getImportStatus")
+def get_import_status(jobId: str):
+    return fetch_import_status(jobId)
 
 
 @router.get("/v1/getAllTranslations")
-def get_all_translations(db=Depends(get_db)):
+def get_all_translations(scope: schema.Scope = Depends(), page: schema.KeyPage = Depends(),
+                         filters: schema.KeyFilter = Depends(),
+                         languageIds: Annotated[List[int] | None, Query()] = None, db=Depends(get_read_db)):
+    """A keyset page of keys with their translations, optionally filtered and limited to some languages"""
     try:
-        return fetch_all_translation(db)
+        return fetch_all_translation(db, scope, page, filters, languageIds)
     except Exception as e:
         return ResponseDTO(204, f"{str(e)}", [])
 
 
 @router.get("/v1/getLanguageKeys")
-def get_language_keys(languageId: int, db=Depends(get_db)):
+def get_language_keys(languageId: int, scope: schema.Scope = Depends(), page: schema.KeyPage = Depends(),
+                      filters: schema.KeyFilter = Depends(), db=Depends(get_read_db)):
     try:
-        return fetch_language_keys(languageId, db)
+        return fetch_language_keys(languageId, db, scope, page, filters)
     except Exception as e:
         return ResponseDTO(204, f"{str(e)}", [])
 
 
+@router.get("/v1/searchTranslations")
+def search(search: schema.SearchQuery = Depends(), scope: schema.Scope = Depends(), db=Depends(get_read_db)):
+    """Ranked substring, fuzzy and full-text matches on key names and translation values"""
+    try:
+        return search_translations(search, db, scope)
+    except Exception as e:
+        return ResponseDTO(204, f"{str(e)}", [])
+
+
+@router.get("/v1/getLanguageBundle")
+def get_language_bundle(languageId: int, if_none_match: Annotated[str | None, Header()] = None,
+                        accept_encoding: Annotated[str | None, Header()] = None,
+                        scope: schema.Scope = Depends(), db=Depends(get_db)):
+    """Serves the precompiled key -> value map of a language, answering 304 when the client's ETag is current"""
+    try:
+        bundle = fetch_language_bundle(languageId, db, scope)
+    except Exception as e:
+        return ResponseDTO(204, f"{str(e)}", {})
+    status_code, body, headers = bundle_response_parts(bundle, if_none_match, accept_encoding)
+    return Response(body, status_code=status_code, headers=headers,
+                    media_type="application/json" if status_code == 200 else None)
+
+
+@router.get("/v1/translations/changes")
+def get_translation_changes(since: int = 0, languageId: int | None = None, scope: schema.Scope = Depends(),
+                            db=Depends(get_db)):
+    """Delta sync: translations written since the `since` revision and the revision to ask for next"""
+    try:
+        return fetch_translation_changes(since, languageId, db, scope)
+    except Exception as e:
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+@router.get("/v1/streamAllTranslations")
+def stream_all_translations(format: Literal["ndjson", "json"] = "ndjson", scope: schema.Scope = Depends()):
+    """Streams the getAllTranslations payload row by row instead of building it in memory"""
+    return StreamingResponse(stream_all_translation(format, scope=scope), media_type=STREAM_MEDIA_TYPES[format])
+
+
+@router.get("/v1/streamLanguageKeys")
+def stream_keys_of_language(languageId: int, format: Literal["ndjson", "json"] = "ndjson",
+                            scope: schema.Scope = Depends()):
+    """Streams the getLanguageKeys payload row by row instead of building it in memory"""
+    return StreamingResponse(stream_language_keys(languageId, format, scope=scope),
+                             media_type=STREAM_MEDIA_TYPES[format])
+
+
+@router.put("/v1/setLanguageFallback")
+def set_fallback(languageId: int, fallbackLanguageId: int | None = None, scope: schema.Scope = Depends(),
+                 db=Depends(get_db)):
+    """Missing translations of languageId resolve to fallbackLanguageId and on down its chain; omit it to clear"""
+    return set_language_fallback(languageId, fallbackLanguageId, db, scope)
+
+
+@router.get("/v1/getLanguageCoverage")
+def get_language_coverage(scope: schema.Scope = Depends(),
+                          languageIds: Annotated[List[int] | None, Query()] = None, db=Depends(get_read_db)):
+    """Keys translated, filled by a fallback and missing, per language"""
+    try:
+        return fetch_language_coverage(db, scope, languageIds)
+    except Exception as e:
+        return ResponseDTO(204, f"{str(e)}", [])
+
+
+@router.post("/v1/exportCatalog")
+def start_catalog_export(background_tasks: BackgroundTasks, scope: schema.Scope = Depends(),
+                         formats: Annotated[List[schema.ExportFormat] | None, Query()] = None,
+                         force: bool = False):
+    """Starts a background export of the catalog to static files; poll getExportStatus with the returned job_id"""
+    return start_export(background_tasks, scope, formats, force)
+
+
+@router.get("/v1/getExportStatus")
+def get_export_status(jobId: str):
+    return fetch_export_status(jobId)
+
+
 @router.get("/v1/getAllLanguage")
-def get_all_language(db=Depends(get_db)):
+def get_all_language(scope: schema.Scope = Depends(), page: schema.KeyPage = Depends(), db=Depends(get_read_db)):
     try:
-        languages = db.query(models.Language).all()
-        return ResponseDTO(200, "Languages fetched successfully", languages)
+        return fetch_all_language(db, scope, page)
     except Exception as e:
         return ResponseDTO(204, f"{str(e)}", [])
 
@@ -58,15 +175,16 @@ def get_all_language(db=Depends(get_db)):
 
 
 @router.post("/v1/authenticateUser")
-def login(credentials: schema.Credentials, db=Depends(get_db)):
-    """User Login"""
-    return auth_function(credentials, db)
+async def login(credentials: schema.Credentials, db=Depends(get_db)):
+    """User Login. The routes that hash passwords are async: bcrypt is awaited from the event loop and only their
+    queries take threadpool threads, so that a burst of logins does not starve the other routes of threads"""
+    return await auth_function_async(credentials, db)
 
 
 @router.post("/v1/registerUser")
-def register_user(user: schema.AddUser, db=Depends(get_db)):
+async def register_user(user: schema.AddUser, db=Depends(get_db)):
     """User Registration"""
-    return add_user(user, db)
+    return await add_user_async(user, db)
 
 
 @router.post("/v1/forgotPassword")
@@ -76,15 +194,15 @@ def forgot_password(email: schema.JsonObject, db=Depends(get_db)):
 
 
 @router.post("/v1/sendVerificationLink")
-def verify_token(obj: schema.Credentials, db=Depends(get_db)):
+async def verify_token(obj: schema.Credentials, db=Depends(get_db)):
     """Calls the service layer to verify the token received by an individual"""
-    return check_token(obj, db)
+    return await check_token_async(obj, db)
 
 
 @router.put("/v1/updatePassword")
-def update_password(obj: schema.Credentials, db=Depends(get_db)):
+async def update_password(obj: schema.Credentials, db=Depends(get_db)):
     """Calls the service layer to update the password of an individual"""
-    return change_password(obj, db)
+    return await change_password_async(obj, db)
 
 
 """----------------------------------------------Company related APIs-------------------------------------------------------------------"""
@@ -95,14 +213,52 @@ def create_company(project: schema.AddProject, user_id: int, db=Depends(get_db))
     return add_project(project, user_id, db)
 
 
+@router.get("/v2.0/{project_id}/diffEnvironments")
+def diff_environments(project_id: int, pair: schema.EnvironmentPair = Depends(),
+                      limit: Annotated[int, Query(ge=0, le=5000)] = 100, db=Depends(get_db)):
+    """Translations that promoting the source environment would add, change or remove in the target"""
+    return fetch_environment_diff(project_id, pair, db, limit)
+
+
+@router.post("/v2.0/{project_id}/promoteEnvironment")
+def promote(project_id: int, promotion: schema.Promotion = Depends(),
+            limit: Annotated[int, Query(ge=0, le=5000)] = 100, db=Depends(get_db)):
+    """Copies the source environment's catalog onto the target in one transaction; dryRun only returns the diff"""
+    return promote_environment(project_id, promotion, db, limit)
+
+
 @router.get("/v2.0/getProjects")
 def get_company(user_id: Annotated[str | None, Header(convert_underscores=False)] = None,
-                db=Depends(get_db)):
-    print(user_id)
-    user_projects = db.query(models.UserProjectEnv).filter(models.UserProjectEnv.user_id == user_id).all()
-    return ResponseDTO(200, "", get_projects(user_projects, db))
+                db=Depends(get_read_db)):
+    return ResponseDTO(200, "", get_projects(user_id, db))
 
 # @router.put("/v2.0/{company_id}/{branch_id}/{user_id}/updateCompany/{comp_id}")
 # def update_company(company: schema.UpdateProject, user_id: int, company_id: int, branch_id: int, comp_id: int,
 #                    db=Depends(get_db)):
 #     return modify_company(company, user_id, company_id, branch_id, comp_id, db)
+
+
+"""----------------------------------------------Monitoring APIs-------------------------------------------------------------------"""
+
+
+@router.get("/v1/getIdCacheStats")
+def get_id_cache_stats():
+    """Hit/miss counters of the language and key id caches"""
+    return ResponseDTO(200, "Cache stats fetched successfully", id_cache_stats())
+
+
+@router.get("/v1/getPoolStatus")
+def get_pool_status():
+    """Connection pool gauges and checkout counters of the database engine, and the health of its replicas"""
+    return ResponseDTO(200, "Pool status fetched successfully",
+                       {**engines().pool_metrics.status(), "replicas": replica_set.status()})
+
+
+@router.get("/metrics")
+def get_metrics():
+    """Request latency, SQL statement count and SQL time per route, the pool gauges and the email outbox counters,
+    for Prometheus"""
+    gauges = {f"db_pool_{name}": value for name, value in engines().pool_metrics.status().items()}
+    gauges["db_replicas_healthy"] = sum(replica["healthy"] for replica in replica_set.status())
+    gauges.update({f"email_outbox_{name}": value for name, value in outbox_sender.status().items()})
+    return PlainTextResponse(request_metrics.render(gauges), media_type="text/plain; version=0.0.4")
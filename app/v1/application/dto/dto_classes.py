@@ -1,10 +1,63 @@
 """Contains DTO classes"""
+from decimal import Decimal
 
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
 
-class ResponseDTO:
-    """Response DTO"""
 
-    def __init__(self, status, message, data):
+def encode_value(value):
+    """orjson default hook for what it cannot serialize natively. Rows are encoded as objects keyed by column and
+    ORM instances by their loaded attributes, as jsonable_encoder did"""
+    if isinstance(value, ResponseDTO):
+        return value.content()
+    if isinstance(value, Row):
+        return value._asdict()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if hasattr(value, "_sa_instance_state"):
+        return {key: item for key, item in vars(value).items() if not key.startswith("_sa")}
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def rows_as_objects(data):
+    """A list of rows as objects keyed by column, zipping the column names once for the whole list; anything
+    else as it is"""
+    if isinstance(data, list) and data and isinstance(data[0], Row):
+        fields = data[0]._fields
+        return [dict(zip(fields, row)) for row in data]
+    return data
+
+
+class ResponseDTO(ORJSONResponse):
+    """Response DTO. It is the response itself: FastAPI returns it as is instead of running jsonable_encoder over
+    it, and the envelope is rendered by orjson once. The HTTP status stays 200, the status field carries the
+    outcome"""
+
+    def __init__(self, status, message, data, status_code: int = 200, headers=None):
         self.status = status
         self.message = message
         self.data = data
+        super().__init__(self.content(), status_code=status_code, headers=headers)
+
+    def content(self):
+        return {"status": self.status, "message": self.message, "data": rows_as_objects(self.data)}
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=encode_value, option=orjson.OPT_NON_STR_KEYS)
+
+
+class PageDTO(ResponseDTO):
+    """Response DTO for one page of a keyset paginated listing; next_cursor is None on the last page"""
+
+    def __init__(self, status, message, data, next_cursor=None, status_code: int = 200, headers=None):
+        self.next_cursor = next_cursor
+        super().__init__(status, message, data, status_code, headers)
+
+    def content(self):
+        return {**super().content(), "next_cursor": self.next_cursor}
@@ -0,0 +1 @@
+"""Export of translation catalogs to static files (JSON, gettext PO/MO, XLIFF, Android, iOS and ARB)"""
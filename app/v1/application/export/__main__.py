@@ -0,0 +1,39 @@
+"""Exports catalogs from the command line, e.g. from a release pipeline or a cron job:
+
+    python -m app.v1.application.export --project-id 3 --format po --format mo --dir build/l10n
+"""
+import argparse
+import sys
+import typing
+
+import orjson
+
+from app.infrastructure.database import SessionLocal
+from app.v1.application.export.pipeline import export_catalog
+from app.v1.application.export.storage import LocalStorage
+from app.v1.application.export.writers import IdentifierCollisionError
+from app.v1.domain import schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports the catalogs whose translations changed since the last run")
+    parser.add_argument("--project-id", type=int, default=None)
+    parser.add_argument("--environment-id", type=int, default=None)
+    parser.add_argument("--format", dest="formats", action="append", choices=typing.get_args(schema.ExportFormat),
+                        help="may be repeated; every format when omitted")
+    parser.add_argument("--dir", default=None, help="write to this directory instead of the configured storage")
+    parser.add_argument("--force", action="store_true", help="rewrite every language, changed or not")
+    args = parser.parse_args()
+
+    storage = LocalStorage(args.dir) if args.dir else None
+    with SessionLocal() as db:
+        try:
+            report = export_catalog(db, schema.Scope(projectId=args.project_id, environmentId=args.environment_id),
+                                    storage, args.formats, args.force)
+        except IdentifierCollisionError as e:
+            sys.exit(f"export failed: {e}")
+    sys.stdout.buffer.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Renders the catalog of a project and environment to static files, one directory per language, and keeps a
+manifest of what each file holds so that the next run only rewrites files whose languages changed. A language
+changed when a translation of it was written since its file, or when it has a different number of translations
+than when the file was written: deletions leave no revision behind"""
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+import orjson
+from sqlalchemy import select, func, null
+from sqlalchemy.orm import aliased
+
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.lru_cache import LRUCache
+from app.infrastructure.settings import settings
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.export.storage import storage_from_settings
+from app.v1.application.export.writers import WRITERS
+from app.v1.application.service.fallback_service import resolved_keys_query, MAX_FALLBACK_DEPTH
+from app.v1.domain import models, schema
+
+MANIFEST = "manifest.json"
+# formats that carry the source language text, so they go stale when it changes
+SOURCE_FORMATS = {"po", "xliff"}
+PATH_UNSAFE = re.compile(r"[^0-9A-Za-z_.@-]")
+
+
+def scope_path(scope: schema.Scope):
+    return f"{scope.projectId or 'global'}/{scope.environmentId or 'default'}"
+
+
+def path_segment(name: str):
+    return PATH_UNSAFE.sub("_", name).lstrip(".") or "_"
+
+
+def fallback_chains(languages):
+    """{language_id: [language_id, fallback, ...]} from (language_id, language, fallback_language_id) rows, the
+    same chains fallback_service follows in SQL"""
+    fallbacks = {language_id: fallback for language_id, _, fallback in languages}
+    chains = {}
+    for language_id in fallbacks:
+        chain = [language_id]
+        while fallbacks.get(chain[-1]) is not None and fallbacks[chain[-1]] not in chain \
+                and len(chain) <= MAX_FALLBACK_DEPTH:
+            chain.append(fallbacks[chain[-1]])
+        chains[language_id] = chain
+    return chains
+
+
+def last_changes_query(since: int, high_water: int, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """(language_id, latest revision) of the languages with translations written in [since, high_water)"""
+    return select(models.Translation.language_id, func.max(models.Translation.revision)).where(
+        scope.filter(models.Translation), models.Translation.revision >= since,
+        models.Translation.revision < high_water).group_by(models.Translation.language_id)
+
+
+def row_counts_query(scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """(language_id, translation count) of the languages of a catalog"""
+    return select(models.Translation.language_id, func.count()).where(scope.filter(models.Translation)) \
+        .group_by(models.Translation.language_id)
+
+
+def export_query(language_id: int, source_language_id: int | None, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """(key, value, source text) of every key the language or its fallbacks translate, ordered by key"""
+    keys = select(models.Key.key_id, models.Key.key).where(scope.filter(models.Key)).subquery()
+    resolved = resolved_keys_query(language_id, keys, scope).subquery()
+    if source_language_id is None:
+        return select(resolved.c.key, resolved.c.translation, null()).where(
+            resolved.c.translation.is_not(None)).order_by(resolved.c.key)
+    source = aliased(models.Translation)
+    return select(resolved.c.key, resolved.c.translation, source.translation).select_from(resolved).outerjoin(
+        source, (source.key_id == resolved.c.key_id) & (source.language_id == source_language_id) &
+                scope.filter(source)).where(resolved.c.translation.is_not(None)).order_by(resolved.c.key)
+
+
+def file_sources(output_format: str, chain: list, source_language_id: int | None):
+    """The languages whose translations end up in a file of the format"""
+    if output_format in SOURCE_FORMATS and source_language_id is not None:
+        return chain + [source_language_id]
+    return chain
+
+
+def file_rows(sources: list, row_counts: dict):
+    """{language_id: translation count} of a file's languages, keyed by strings for the JSON manifest"""
+    return {str(language_id): row_counts.get(language_id, 0) for language_id in sources}
+
+
+def stale_formats(entry, chain: list, formats, last_changed: dict, row_counts: dict, source_language_id: int | None):
+    """The formats of a language whose file is missing, older than a change to a language of its chain, or was
+    written when one of those languages had another number of translations"""
+    if entry is None or entry["chain"] != chain:
+        return list(formats)
+    stale = []
+    for output_format in formats:
+        written = entry["files"].get(output_format)
+        sources = file_sources(output_format, chain, source_language_id)
+        if written is None or written.get("rows") != file_rows(sources, row_counts) or \
+                any(last_changed.get(language_id, -1) >= written["revision"] for language_id in sources):
+            stale.append(output_format)
+    return stale
+
+
+def write_language(db, storage, base: str, language_id: int, language: str, formats, source_language: str | None,
+                   source_language_id: int | None, scope: schema.Scope, chunk_rows: int = 1000):
+    """Streams the resolved catalog of one language into a file per format in a single pass over the rows"""
+    directory = f"{base}/{path_segment(language)}"
+    paths = {output_format: f"{directory}/{WRITERS[output_format].filename.format(language=path_segment(language))}"
+             for output_format in formats}
+    keys = 0
+    with ExitStack() as files:
+        writers = [WRITERS[output_format](files.enter_context(storage.open(path)), language, source_language)
+                   for output_format, path in paths.items()]
+        for writer in writers:
+            writer.begin()
+        rows = db.execute(export_query(language_id, source_language_id, scope).execution_options(
+            yield_per=chunk_rows))
+        for key, value, source in rows:
+            keys += 1
+            for writer in writers:
+                writer.entry(key, value, source)
+        for writer in writers:
+            writer.end()
+    return paths, keys
+
+
+def export_catalog(db, scope: schema.Scope = schema.GLOBAL_SCOPE, storage=None, formats=None, force: bool = False):
+    """Exports the languages of a catalog whose files are missing or stale (all of them with force) and returns
+    what was written"""
+    start = time.perf_counter()
+    storage = storage or storage_from_settings()
+    formats = list(formats or WRITERS)
+    base = scope_path(scope)
+    manifest = orjson.loads(storage.read(f"{base}/{MANIFEST}") or b"{}")
+    exported = manifest.setdefault("languages", {})
+
+    high_water = db.scalar(select(models.SAFE_REVISION))
+    languages = db.execute(select(models.Language.language_id, models.Language.language,
+                                  models.Language.fallback_language_id).where(
+        scope.filter(models.Language)).order_by(models.Language.language_id)).all()
+    chains = fallback_chains(languages)
+    since = min((written["revision"] for entry in exported.values() for written in entry["files"].values()),
+                default=0)
+    last_changed = dict(db.execute(last_changes_query(since, high_water, scope)).all())
+    # counted before the rows are read: a deletion in between is then seen as a change by the next run
+    row_counts = dict(db.execute(row_counts_query(scope)).all())
+    source_language_id = next((language_id for language_id, language, _ in languages
+                               if language == settings.export_source_language), None)
+    source_language = settings.export_source_language if source_language_id is not None else None
+
+    report = {"revision": high_water, "exported": {}, "unchanged": []}
+    for language_id, language, _ in languages:
+        entry = None if force else exported.get(language)
+        stale = stale_formats(entry, chains[language_id], formats, last_changed, row_counts, source_language_id)
+        if not stale:
+            report["unchanged"].append(language)
+            continue
+
+        paths, keys = write_language(db, storage, base, language_id, language, stale, source_language,
+                                     source_language_id, scope)
+        previous = exported.get(language)
+        files = previous["files"] if previous and previous["chain"] == chains[language_id] else {}
+        files.update({output_format: {"path": path, "revision": high_water, "rows": file_rows(
+            file_sources(output_format, chains[language_id], source_language_id), row_counts)}
+            for output_format, path in paths.items()})
+        exported[language] = {"language_id": language_id, "chain": chains[language_id], "keys": keys,
+                              "files": files}
+        # saved after every language, so an interrupted run picks up where it stopped
+        with storage.open(f"{base}/{MANIFEST}") as stream:
+            stream.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+        report["exported"][language] = stale
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+"""----------------------------------------------Background jobs-------------------------------------------------------------------"""
+
+# job id -> {"status": "running" | "done" | "failed", ...} of recent jobs
+export_jobs = LRUCache(maxsize=1_000)
+running_exports = set()
+running_exports_lock = threading.Lock()
+
+
+def claim_export(scope: schema.Scope):
+    """Registers an export of a catalog, returning its job id, or None when one is already running"""
+    with running_exports_lock:
+        if scope in running_exports:
+            return None
+        running_exports.add(scope)
+    job_id = uuid.uuid4().hex
+    export_jobs.set(job_id, {"status": "running", "project_id": scope.projectId,
+                             "environment_id": scope.environmentId})
+    return job_id
+
+
+def run_export_job(job_id: str, scope: schema.Scope, formats=None, force: bool = False):
+    """Runs a claimed export with its own session; meant for BackgroundTasks, which run it after the response"""
+    status = export_jobs.get(job_id)
+    try:
+        with SessionLocal() as db:
+            status.update(export_catalog(db, scope, formats=formats, force=force), status="done")
+    except Exception as e:
+        status.update(status="failed", error=str(e))
+    finally:
+        with running_exports_lock:
+            running_exports.discard(scope)
+
+
+def start_export(background_tasks, scope: schema.Scope = schema.GLOBAL_SCOPE, formats=None, force: bool = False):
+    job_id = claim_export(scope)
+    if job_id is None:
+        return ResponseDTO(409, "An export of this catalog is already running", {})
+    background_tasks.add_task(run_export_job, job_id, scope, formats, force)
+    return ResponseDTO(200, "Export started", {"job_id": job_id})
+
+
+def fetch_export_status(jobId: str):
+    status = export_jobs.get(jobId)
+    if status is None:
+        return ResponseDTO(404, "Export job not found", {})
+    return ResponseDTO(200, "Export status fetched successfully", status)
@@ -0,0 +1,72 @@
+"""Where exported catalogs are written: a local directory or an S3-compatible bucket"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.infrastructure.settings import settings
+
+try:
+    import boto3
+except ImportError:  # boto3 is optional, only needed to export to a bucket
+    boto3 = None
+
+
+class LocalStorage:
+    """Files under a root directory. Each file is written to a temporary file next to it and renamed into place,
+    so readers never see a half written catalog"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    @contextmanager
+    def open(self, path: str):
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                yield stream
+            os.replace(temporary, target)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def read(self, path: str):
+        try:
+            return (self.root / path).read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+class S3Storage:
+    """Objects under a prefix of a bucket. Files are spooled (in memory up to 8 MB) and uploaded when complete"""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None):
+        if boto3 is None:
+            raise RuntimeError("Exporting to a bucket needs boto3, install it with `pip install boto3`")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def key(self, path: str):
+        return f"{self.prefix}/{path}" if self.prefix else path
+
+    @contextmanager
+    def open(self, path: str):
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as stream:
+            yield stream
+            stream.seek(0)
+            self.client.upload_fileobj(stream, self.bucket, self.key(path))
+
+    def read(self, path: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(path))["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+
+def storage_from_settings():
+    if settings.export_bucket:
+        return S3Storage(settings.export_bucket, settings.export_dir, settings.export_endpoint_url)
+    return LocalStorage(settings.export_dir)
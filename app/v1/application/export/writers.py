@@ -0,0 +1,194 @@
+"""Catalog file formats. Each writer gets the (key, value, source) entries of one language one at a time and
+writes them to a binary stream as they come; only the MO writer has to hold the catalog, as its string tables
+are sorted and prefixed with their offsets"""
+import re
+import struct
+from xml.sax.saxutils import escape, quoteattr
+
+import orjson
+
+# Android resource names and ARB message ids must be identifiers
+IDENTIFIER_UNSAFE = re.compile(r"[^0-9A-Za-z_]")
+
+
+class IdentifierCollisionError(ValueError):
+    pass
+
+
+def identifier(key: str):
+    name = IDENTIFIER_UNSAFE.sub("_", key)
+    return "_" + name if name[:1].isdigit() else name
+
+
+def unique_identifier(names: dict, key: str, format_name: str):
+    """identifier(key), refusing a name that an earlier key of the file already took (e.g. a.b and a_b)"""
+    name = identifier(key)
+    taken_by = names.setdefault(name, key)
+    if taken_by != key:
+        raise IdentifierCollisionError(f"keys {taken_by!r} and {key!r} both become the {format_name} name {name!r}, "
+                                       f"rename one of them")
+    return name
+
+
+class CatalogWriter:
+    filename = None
+
+    def __init__(self, stream, language: str, source_language: str | None = None):
+        self.stream = stream
+        self.language = language
+        self.source_language = source_language
+
+    def begin(self):
+        pass
+
+    def entry(self, key: str, value: str, source: str | None):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+
+class JsonWriter(CatalogWriter):
+    """Flat {"key": "value"} object, the same document as the language bundle"""
+    filename = "{language}.json"
+
+    def begin(self):
+        self.stream.write(b"{")
+        self.first = True
+
+    def entry(self, key, value, source):
+        self.stream.write((b"" if self.first else b",") + orjson.dumps(key) + b":" + orjson.dumps(value))
+        self.first = False
+
+    def end(self):
+        self.stream.write(b"}")
+
+
+def po_string(text: str):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\t", "\\t") + '"'
+
+
+def po_header(language: str):
+    return f"Language: {language}\nMIME-Version: 1.0\nContent-Type: text/plain; charset=UTF-8\n" \
+           f"Content-Transfer-Encoding: 8bit\n"
+
+
+class PoWriter(CatalogWriter):
+    """gettext catalog keyed by translation key, with the source language text as a comment"""
+    filename = "messages.po"
+
+    def begin(self):
+        self.stream.write(f'msgid ""\nmsgstr {po_string(po_header(self.language))}\n'.encode())
+
+    def entry(self, key, value, source):
+        comment = "".join(f"#. {line}\n" for line in source.splitlines()) if source else ""
+        self.stream.write(f"\n{comment}msgid {po_string(key)}\nmsgstr {po_string(value)}\n".encode())
+
+
+class MoWriter(CatalogWriter):
+    """Compiled gettext catalog (GNU MO, little endian, without the optional hash table)"""
+    filename = "messages.mo"
+
+    def begin(self):
+        self.messages = {"": po_header(self.language)}
+
+    def entry(self, key, value, source):
+        self.messages[key] = value
+
+    def end(self):
+        originals = sorted((key.encode(), value.encode()) for key, value in self.messages.items())
+        count = len(originals)
+        originals_offset = 7 * 4
+        translations_offset = originals_offset + count * 8
+        offset = translations_offset + count * 8
+
+        tables, strings = [[], []], []
+        for column in (0, 1):
+            for pair in originals:
+                text = pair[column]
+                tables[column].append((len(text), offset))
+                strings.append(text + b"\0")
+                offset += len(text) + 1
+
+        self.stream.write(struct.pack("<7I", 0x950412de, 0, count, originals_offset, translations_offset, 0,
+                                      offset))
+        for table in tables:
+            for length, start in table:
+                self.stream.write(struct.pack("<2I", length, start))
+        for text in strings:
+            self.stream.write(text)
+
+
+class XliffWriter(CatalogWriter):
+    """XLIFF 1.2 with one trans-unit per key; the source is the source language text, or the key without one"""
+    filename = "messages.xlf"
+
+    def begin(self):
+        source_language = quoteattr(self.source_language or "x-key")
+        self.stream.write(f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                          f'<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">\n'
+                          f'<file original="mlingo" datatype="plaintext" source-language={source_language} '
+                          f'target-language={quoteattr(self.language)}>\n<body>\n'.encode())
+
+    def entry(self, key, value, source):
+        self.stream.write(f'<trans-unit id={quoteattr(key)} resname={quoteattr(key)}>'
+                          f'<source>{escape(source if source is not None else key)}</source>'
+                          f'<target state="translated">{escape(value)}</target></trans-unit>\n'.encode())
+
+    def end(self):
+        self.stream.write(b"</body>\n</file>\n</xliff>\n")
+
+
+def android_string(text: str):
+    text = escape(text.replace("\\", "\\\\")).replace("'", "\\'").replace('"', '\\"').replace("\n", "\\n")
+    return "\\" + text if text[:1] in ("@", "?") else text
+
+
+class AndroidWriter(CatalogWriter):
+    """res/values-<language>/strings.xml; keys become resource names with other characters replaced by _, and two
+    keys that become the same name fail the export"""
+    filename = "strings.xml"
+
+    def begin(self):
+        self.names = {}
+        self.stream.write(b'<?xml version="1.0" encoding="utf-8"?>\n<resources>\n')
+
+    def entry(self, key, value, source):
+        name = unique_identifier(self.names, key, "Android resource")
+        self.stream.write(f'    <string name="{name}">{android_string(value)}</string>\n'.encode())
+
+    def end(self):
+        self.stream.write(b"</resources>\n")
+
+
+def strings_literal(text: str):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class IosWriter(CatalogWriter):
+    """<language>.lproj/Localizable.strings, UTF-8"""
+    filename = "Localizable.strings"
+
+    def entry(self, key, value, source):
+        self.stream.write(f"{strings_literal(key)} = {strings_literal(value)};\n".encode())
+
+
+class ArbWriter(CatalogWriter):
+    """Flutter Application Resource Bundle; keys become message ids with other characters replaced by _, and two
+    keys that become the same id fail the export"""
+    filename = "app_{language}.arb"
+
+    def begin(self):
+        self.names = {}
+        self.stream.write(b'{"@@locale":' + orjson.dumps(self.language.replace("-", "_")))
+
+    def entry(self, key, value, source):
+        name = unique_identifier(self.names, key, "ARB message")
+        self.stream.write(b"," + orjson.dumps(name) + b":" + orjson.dumps(value))
+
+    def end(self):
+        self.stream.write(b"}")
+
+
+WRITERS = {"json": JsonWriter, "po": PoWriter, "mo": MoWriter, "xliff": XliffWriter, "android": AndroidWriter,
+           "ios": IosWriter, "arb": ArbWriter}
@@ -0,0 +1 @@
+"""Streaming import of catalog files (gettext PO, XLIFF, ARB and nested JSON)"""
@@ -0,0 +1,49 @@
+"""Imports a catalog file from the command line, printing progress to stderr and the report to stdout:
+
+    python -m app.v1.application.importer messages.po --project-id 3 --dry-run
+"""
+import argparse
+import sys
+import typing
+
+import orjson
+
+from app.infrastructure.database import SessionLocal
+from app.v1.application.importer.pipeline import import_file, file_format
+from app.v1.domain import schema
+from app.v1.domain.models import KeyStatus
+
+
+def print_progress(report):
+    print(f"\r{report['entries']:>10} entries  {report['percent']:5.1f}%", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imports a PO, XLIFF, ARB or JSON catalog file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=typing.get_args(schema.ImportFormat), default=None,
+                        help="taken from the file extension when omitted")
+    parser.add_argument("--language", default=None, help="taken from the file when omitted, required for JSON")
+    parser.add_argument("--project-id", type=int, default=None)
+    parser.add_argument("--environment-id", type=int, default=None)
+    parser.add_argument("--draft", action="store_true", help="create new keys as drafts instead of published")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    options = file_format(args.path, schema.ImportOptions(
+        format=args.format, language=args.language, dryRun=args.dry_run,
+        status=KeyStatus.DRAFT if args.draft else KeyStatus.PUBLISHED))
+    if options is None:
+        parser.error("cannot tell the format from the file extension, pass --format")
+
+    with SessionLocal() as db:
+        report = import_file(db, args.path, options,
+                             schema.Scope(projectId=args.project_id, environmentId=args.environment_id),
+                             args.batch_size, print_progress)
+    print(file=sys.stderr)
+    sys.stdout.buffer.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+
+
+if __name__ == "__main__":
+    main()
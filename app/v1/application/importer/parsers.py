@@ -0,0 +1,237 @@
+"""Incremental parsers for catalog files. Each one reads a binary stream a chunk at a time and yields
+(language, key, value) entries as it goes, so memory stays flat however large the file is"""
+import codecs
+import json
+import re
+from json.decoder import scanstring
+from xml.etree.ElementTree import iterparse
+
+CHUNK_SIZE = 64 * 1024
+
+
+class CatalogFormatError(ValueError):
+    pass
+
+
+"""----------------------------------------------gettext PO-------------------------------------------------------------------"""
+
+PO_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\", "a": "\a", "b": "\b", "f": "\f", "v": "\v"}
+PO_ESCAPE = re.compile(r"\\(.)")
+PO_KEYWORD = re.compile(r'^(msgctxt|msgid_plural|msgid|msgstr(?:\[(\d+)])?)\s+(".*")\s*$')
+
+
+def utf8_lines(stream):
+    """Lines of a UTF-8 stream, split on newlines only (a PO string may hold other line separators)"""
+    pending, first = b"", True
+    while chunk := stream.read(CHUNK_SIZE):
+        if first and chunk.startswith(codecs.BOM_UTF8):
+            chunk = chunk[len(codecs.BOM_UTF8):]
+        first = False
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+
+def po_unquote(text: str):
+    return PO_ESCAPE.sub(lambda match: PO_ESCAPES.get(match.group(1), match.group(1)), text.strip()[1:-1])
+
+
+def po_messages(stream):
+    """(fields, flags) of each message of a PO file, fields mapping msgid/msgstr/msgstr[0]... to their text"""
+    fields, flags, current = {}, set(), None
+    for number, line in enumerate(utf8_lines(stream), start=1):
+        line = line.strip()
+        if not line or line.startswith("#~"):
+            if fields:
+                yield fields, flags
+            fields, flags, current = {}, set(), None
+        elif line.startswith("#"):
+            if "msgstr" in fields:
+                # the comments of a message that was not followed by a blank line
+                yield fields, flags
+                fields, flags, current = {}, set(), None
+            if line.startswith("#,"):
+                flags.update(flag.strip() for flag in line[2:].split(","))
+        elif line.startswith('"'):
+            if current is None:
+                raise CatalogFormatError(f"line {number}: continuation without a keyword")
+            fields[current] += po_unquote(line)
+        else:
+            match = PO_KEYWORD.match(line)
+            if match is None:
+                raise CatalogFormatError(f"line {number}: cannot parse {line[:40]!r}")
+            keyword = "msgstr" if match.group(2) == "0" else match.group(1)
+            if keyword in ("msgctxt", "msgid") and "msgid" in fields and "msgstr" in fields:
+                # a message that was not followed by a blank line
+                yield fields, flags
+                fields, flags = {}, set()
+            current = keyword
+            fields[current] = po_unquote(match.group(3))
+    if fields:
+        yield fields, flags
+
+
+def parse_po(stream, language: str | None = None):
+    """Entries keyed by msgid (msgctxt is ignored); the language comes from the header unless given. Untranslated
+    and fuzzy messages are yielded with a None value, so that the importer can count them as skipped. Plural
+    messages import their first form"""
+    for fields, flags in po_messages(stream):
+        key = fields.get("msgid")
+        if key == "":
+            header = dict(line.split(":", 1) for line in fields.get("msgstr", "").splitlines() if ":" in line)
+            language = language or header.get("Language", "").strip() or None
+            continue
+        if language is None:
+            raise CatalogFormatError("the PO header has no Language, pass the language explicitly")
+        value = fields.get("msgstr")
+        yield language, key, value if value and "fuzzy" not in flags else None
+
+
+"""----------------------------------------------XLIFF-------------------------------------------------------------------"""
+
+
+def local_name(tag: str):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_xliff(stream, language: str | None = None):
+    """Entries of XLIFF 1.2 trans-units (keyed by resname, else id) and XLIFF 2 units (keyed by name, else id),
+    valued by their target. Elements are dropped as soon as they are read"""
+    target_language = language
+    stack = []
+    for event, element in iterparse(stream, events=("start", "end")):
+        name = local_name(element.tag)
+        if event == "start":
+            stack.append(element)
+            if language is None and name == "file" and element.get("target-language"):
+                target_language = element.get("target-language")
+            elif language is None and name == "xliff" and element.get("trgLang"):
+                target_language = element.get("trgLang")
+            continue
+
+        stack.pop()
+        if name in ("trans-unit", "unit"):
+            key = element.get("resname") or element.get("name") or element.get("id")
+            # XLIFF 1.2 targets are children of the unit, XLIFF 2 ones children of its segments; targets of
+            # alt-trans suggestions are neither
+            targets = [target for child in element for target in
+                       ([child] if local_name(child.tag) == "target" else
+                        [grandchild for grandchild in child if local_name(grandchild.tag) == "target"]
+                        if local_name(child.tag) == "segment" else [])]
+            if target_language is None:
+                raise CatalogFormatError("the XLIFF file has no target language, pass the language explicitly")
+            value = "".join("".join(target.itertext()) for target in targets) if targets else None
+            yield target_language, key, value or None
+            if stack:
+                stack[-1].remove(element)
+
+
+"""----------------------------------------------JSON and ARB-------------------------------------------------------------------"""
+
+JSON_WHITESPACE = re.compile(r"[\s,:]*")
+# a number, true, false or null runs up to the next delimiter
+JSON_SCALAR = re.compile(r"[^\s,:\]}]+")
+
+
+def json_leaves(stream):
+    """(path, value) of every string, number, boolean or null of a JSON document, read incrementally. Paths are
+    tuples of object keys and array indexes"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, position, done = "", 0, False
+    path, containers = [], []  # containers: "{" or "[" per open level, path: key or index per open level
+    expecting_key = False
+
+    def fill():
+        nonlocal buffer, position, done
+        chunk = stream.read(CHUNK_SIZE)
+        buffer = buffer[position:] + decoder.decode(chunk or b"", final=not chunk)
+        position = 0
+        done = not chunk
+
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()
+        if position >= len(buffer):
+            if done:
+                break
+            fill()
+            continue
+
+        char = buffer[position]
+        if char in "{[":
+            containers.append(char)
+            path.append(None if char == "{" else 0)
+            expecting_key = char == "{"
+            position += 1
+            continue
+        if char in "}]":
+            if not containers:
+                raise CatalogFormatError(f"unbalanced {char!r}")
+            containers.pop()
+            path.pop()
+            position += 1
+            if containers and containers[-1] == "[":
+                path[-1] += 1
+            expecting_key = bool(containers) and containers[-1] == "{"
+            continue
+
+        if char == '"':
+            end = buffer.find('"', position + 1)
+            while end != -1 and (end - position - 1 - len(buffer[position + 1:end].rstrip("\\"))) % 2:
+                end = buffer.find('"', end + 1)  # the quote is escaped
+            if end == -1:
+                if done:
+                    raise CatalogFormatError("unterminated string")
+                fill()
+                continue
+            value, position = scanstring(buffer, position + 1)
+        else:
+            match = JSON_SCALAR.match(buffer, position)
+            if match is None or (match.end() == len(buffer) and not done):
+                if done:
+                    raise CatalogFormatError(f"unexpected {buffer[position:position + 20]!r}")
+                fill()
+                continue
+            try:
+                value = json.loads(match.group())
+            except ValueError:
+                raise CatalogFormatError(f"unexpected {match.group()[:20]!r}") from None
+            position = match.end()
+
+        if not containers:
+            yield (), value
+        elif expecting_key:
+            path[-1] = value
+            expecting_key = False
+        else:
+            yield tuple(path), value
+            if containers[-1] == "[":
+                path[-1] += 1
+            else:
+                expecting_key = True
+
+
+def parse_json(stream, language: str | None = None):
+    """Entries of a (possibly nested) JSON object of strings; nested keys are joined with dots"""
+    if language is None:
+        raise CatalogFormatError("JSON catalogs do not name their language, pass it explicitly")
+    for path, value in json_leaves(stream):
+        if path and isinstance(value, str):
+            yield language, ".".join(str(part) for part in path), value or None
+
+
+def parse_arb(stream, language: str | None = None):
+    """Entries of a Flutter ARB file; @-prefixed metadata is skipped and @@locale names the language"""
+    for path, value in json_leaves(stream):
+        if path == ("@@locale",):
+            language = language or value.replace("_", "-")
+        elif len(path) == 1 and not path[0].startswith("@") and isinstance(value, str):
+            if language is None:
+                raise CatalogFormatError("the ARB file has no @@locale before its messages, pass the language")
+            yield language, path[0], value or None
+
+
+PARSERS = {"po": parse_po, "xliff": parse_xliff, "json": parse_json, "arb": parse_arb}
+EXTENSIONS = {".po": "po", ".pot": "po", ".xlf": "xliff", ".xliff": "xliff", ".json": "json", ".arb": "arb"}
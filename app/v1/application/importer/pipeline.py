@@ -0,0 +1,181 @@
+"""Maps parsed catalog entries onto keys, languages and translations a batch at a time, or only diffs them against
+the catalog in a dry run"""
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.lru_cache import LRUCache
+from app.infrastructure.response_cache import response_cache
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.importer.parsers import PARSERS, EXTENSIONS
+from app.v1.application.service.bundle_service import bundle_store
+from app.v1.application.service.language_service import batched, resolve_key_ids, resolve_language_ids, \
+    translation_upsert, cache_ids
+from app.v1.domain import models, schema
+from app.v1.domain.models import KeyStatus
+
+# changes listed in a report, the rest are only counted
+SAMPLE_SIZE = 20
+
+
+class CountingReader:
+    """Binary stream wrapper counting the bytes read, for progress reports"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size: int = -1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def existing_values(db, languages, keys, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """The names of the keys that exist and {(language, key): translation} of the existing translations. Names
+    are resolved to ids first, so that translations are looked up by (key_id, language_id) in the unique index
+    even while the table statistics predate a large import"""
+    key_names = {key_id: key for key, key_id in db.execute(select(models.Key.key, models.Key.key_id).where(
+        scope.filter(models.Key), models.Key.key.in_(keys)))}
+    language_names = {language_id: language for language, language_id in db.execute(
+        select(models.Language.language, models.Language.language_id).where(
+            scope.filter(models.Language), models.Language.language.in_(languages)))}
+    if not key_names or not language_names:
+        return set(key_names.values()), {}
+    rows = db.execute(select(models.Translation.key_id, models.Translation.language_id,
+                             models.Translation.translation).where(
+        scope.filter(models.Translation), models.Translation.key_id.in_(key_names),
+        models.Translation.language_id.in_(language_names)))
+    return set(key_names.values()), {(language_names[language_id], key_names[key_id]): value
+                                     for key_id, language_id, value in rows}
+
+
+def import_entries(db, entries, scope: schema.Scope = schema.GLOBAL_SCOPE, status: KeyStatus = KeyStatus.PUBLISHED,
+                   dry_run: bool = False, batch_size: int = 1000, on_progress=None):
+    """Compares each batch of (language, key, value) entries with the catalog and upserts the added and changed
+    values, committing per batch so that memory and lock time stay bounded; a failure keeps the batches before
+    it, and re-running the import is harmless. Entries without a value are skipped"""
+    report = {"entries": 0, "skipped": 0, "new_keys": 0, "added": 0, "changed": 0, "unchanged": 0,
+              "languages": [], "changes": []}
+    languages = set()
+
+    for batch in batched(entries, batch_size):
+        values = {}
+        for language, key, value in batch:
+            if key and value is not None:
+                values[(language, key)] = value
+        report["entries"] += len(batch)
+        report["skipped"] += len(batch) - len(values)
+        if not values:
+            continue
+
+        batch_languages = {language for language, _ in values}
+        batch_keys = {key for _, key in values}
+        languages |= batch_languages
+        existing_keys, existing = existing_values(db, batch_languages, batch_keys, scope)
+        report["new_keys"] += len(batch_keys - existing_keys)
+
+        pending = {}
+        for (language, key), value in values.items():
+            previous = existing.get((language, key))
+            if previous == value:
+                report["unchanged"] += 1
+                continue
+            report["added" if previous is None else "changed"] += 1
+            pending[(language, key)] = value
+            if len(report["changes"]) < SAMPLE_SIZE:
+                report["changes"].append({"language": language, "key": key, "previous": previous, "value": value})
+
+        if pending and not dry_run:
+            try:
+                language_ids = resolve_language_ids({language for language, _ in pending}, db, batch_size, scope)
+                key_ids = resolve_key_ids({key: status for _, key in pending}, db, batch_size, scope)
+                db.execute(translation_upsert(), [
+                    {"key_id": key_ids[key], "language_id": language_ids[language], "translation": value,
+                     **scope.columns()} for (language, key), value in pending.items()])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            cache_ids(key_ids, language_ids, scope)
+            # right away, so that the committed batches show up even when a later one fails
+            bundle_store.invalidate(*language_ids.values())
+            response_cache.invalidate(scope)
+        if on_progress is not None:
+            on_progress(report)
+
+    report["languages"] = sorted(languages)
+    report["dry_run"] = dry_run
+    return report
+
+
+def import_file(db, path: str, options: schema.ImportOptions, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                batch_size: int = 1000, on_progress=None):
+    """Imports a catalog file; on_progress receives the running report with bytes_read, total_bytes and percent"""
+    total_bytes = os.path.getsize(path)
+    with open(path, "rb") as file:
+        reader = CountingReader(file)
+
+        def progress(report):
+            if on_progress is not None:
+                on_progress({**report, "bytes_read": reader.bytes_read, "total_bytes": total_bytes,
+                             "percent": round(100 * reader.bytes_read / total_bytes, 1) if total_bytes else 100.0})
+
+        entries = PARSERS[options.format](reader, options.language)
+        report = import_entries(db, entries, scope, options.status, options.dryRun, batch_size, progress)
+    return {**report, "bytes_read": total_bytes, "total_bytes": total_bytes, "percent": 100.0}
+
+
+def file_format(filename: str | None, options: schema.ImportOptions):
+    """The options with the format filled in from the file extension, or None when it cannot be told"""
+    import_format = options.format or EXTENSIONS.get(Path(filename or "").suffix.lower())
+    return options.model_copy(update={"format": import_format}) if import_format else None
+
+
+"""----------------------------------------------Background jobs-------------------------------------------------------------------"""
+
+# job id -> {"status": "running" | "done" | "failed", progress counters...} of recent jobs
+import_jobs = LRUCache(maxsize=1_000)
+
+
+def stage_upload(upload, suffix: str):
+    """Copies an uploaded file to a temporary file that outlives the request, returning its path"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as staged:
+        shutil.copyfileobj(upload, staged, 1024 * 1024)
+    return staged.name
+
+
+def run_import_job(job_id: str, path: str, options: schema.ImportOptions, scope: schema.Scope):
+    """Imports a staged file with its own session and removes it; meant for BackgroundTasks"""
+    job = import_jobs.get(job_id)
+    try:
+        with SessionLocal() as db:
+            job.update(import_file(db, path, options, scope, on_progress=job.update), status="done")
+    except Exception as e:
+        job.update(status="failed", error=str(e))
+    finally:
+        os.unlink(path)
+
+
+def start_import(file, background_tasks, options: schema.ImportOptions, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Stages an uploaded catalog file and imports it in the background; poll getImportStatus with the job_id"""
+    options = file_format(file.filename, options)
+    if options is None:
+        return ResponseDTO(400, "Unknown catalog format, pass format=po|xliff|arb|json", {})
+    path = stage_upload(file.file, Path(file.filename or "").suffix)
+    job_id = uuid.uuid4().hex
+    import_jobs.set(job_id, {"status": "running", "file": file.filename, "format": options.format})
+    background_tasks.add_task(run_import_job, job_id, path, options, scope)
+    return ResponseDTO(200, "Import started", {"job_id": job_id})
+
+
+def fetch_import_status(jobId: str):
+    job = import_jobs.get(jobId)
+    if job is None:
+        return ResponseDTO(404, "Import job not found", {})
+    return ResponseDTO(200, "Import status fetched successfully", job)
@@ -0,0 +1,2 @@
+"""Outgoing email: messages are queued in the email_outbox table within the transaction that calls for them, and
+a background sender delivers them over pooled SMTP connections, retrying with backoff"""
@@ -0,0 +1,18 @@
+"""Runs the outbox sender on its own, for deployments whose web workers do not send (MLINGO_OUTBOX_SENDER=false):
+
+    python -m app.v1.application.mail
+"""
+from app.v1.application.mail.outbox import outbox_sender
+
+
+def main():
+    try:
+        outbox_sender.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        outbox_sender.smtp_pool.close_idle()
+
+
+if __name__ == "__main__":
+    main()
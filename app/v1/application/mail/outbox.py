@@ -0,0 +1,189 @@
+"""The email outbox: requests queue messages in their own transaction and return, and a background thread sends
+them. Several senders (one per worker) can share the table: each claims a batch of due messages with FOR UPDATE
+SKIP LOCKED and leases it, pushing its next attempt into the future, so that no other sender takes it up while
+the SMTP calls run outside of any transaction. A sender that dies mid-batch leaves its messages to be retried
+once the lease runs out, so delivery is at least once."""
+import datetime
+import logging
+import random
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from sqlalchemy import select, update, delete, func
+
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.settings import settings
+from app.v1.application.mail.smtp_pool import SMTPPool
+from app.v1.domain import models
+
+logger = logging.getLogger(__name__)
+
+# longer than sending a batch can take
+LEASE = datetime.timedelta(minutes=10)
+# pruning of old sent and failed messages runs this often, in seconds
+PRUNE_INTERVAL = 3600
+
+Outbox = models.EmailOutbox
+
+
+def queue_email(db, recipient: str, subject: str, body: str):
+    """Adds an email to the outbox in the caller's transaction, so that it goes out if and only if that commits;
+    works with sync and async sessions alike. Call outbox_sender.wake() after the commit to send it right away"""
+    db.add(Outbox(recipient=recipient, subject=subject, body=body))
+
+
+def is_permanent(error: Exception):
+    """Whether retrying cannot help: the server refused the recipient or the message itself for good (5xx)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPDataError) and error.smtp_code >= 500
+
+
+class OutboxSender:
+    """Sends the due messages of the outbox in batches, over a pool of SMTP connections"""
+
+    def __init__(self, session_factory, smtp_pool: SMTPPool, sender: str, batch_size: int = 50,
+                 poll_interval: float = 5, max_attempts: int = 8, retry_delay: float = 30,
+                 retry_max_delay: float = 3600, retention_days: float = 7, concurrency: int = 2):
+        self.session_factory = session_factory
+        self.smtp_pool = smtp_pool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.retention = datetime.timedelta(days=retention_days)
+        self.concurrency = concurrency
+        self.sent = self.retried = self.failed = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pruned_at = None
+
+    def start(self):
+        """Starts the sending thread, once"""
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self.run, name="email-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            thread.join()
+        self.smtp_pool.close_idle()
+
+    def wake(self):
+        """Has the thread look for due messages now rather than at its next poll"""
+        self._wakeup.set()
+
+    def run(self):
+        """Sends until stopped; a full batch is followed by the next one right away"""
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="email-outbox-smtp") as executor:
+            while not self._stopped.is_set():
+                self._wakeup.clear()
+                try:
+                    claimed = self.send_due(executor)
+                    self.prune()
+                except Exception as e:
+                    # the database is unreachable: try again at the next poll
+                    logger.warning("email outbox: %s", e)
+                    claimed = 0
+                self.smtp_pool.close_idle(self.smtp_pool.idle_timeout)
+                if claimed < self.batch_size:
+                    self._wakeup.wait(self.poll_interval)
+
+    def claim(self, db):
+        """Leases up to batch_size due messages to this sender, oldest due first"""
+        due = select(Outbox.email_id) \
+            .where(Outbox.status == models.OutboxStatus.PENDING, Outbox.next_attempt_at <= func.now()) \
+            .order_by(Outbox.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True)
+        claimed = db.execute(update(Outbox).where(Outbox.email_id.in_(due.scalar_subquery()))
+                             .values(attempts=Outbox.attempts + 1, next_attempt_at=func.now() + LEASE)
+                             .returning(Outbox.email_id, Outbox.recipient, Outbox.subject, Outbox.body,
+                                        Outbox.attempts)).all()
+        db.commit()
+        return claimed
+
+    def message(self, recipient: str, subject: str, body: str):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    def deliver(self, row):
+        """None once sent, else the error"""
+        try:
+            self.smtp_pool.send(self.message(row.recipient, row.subject, row.body))
+            return None
+        except (smtplib.SMTPException, OSError) as e:
+            return e
+
+    def backoff(self, attempts: int):
+        """Seconds before the next attempt of a message tried `attempts` times, with some jitter so that the
+        messages of an outage do not all come back at once"""
+        return min(self.retry_max_delay, self.retry_delay * 2 ** (attempts - 1)) * random.uniform(1, 1.25)
+
+    def send_due(self, executor=None):
+        """Sends one batch of due messages and records the outcomes; returns how many were claimed"""
+        with self.session_factory() as db:
+            claimed = self.claim(db)
+            if not claimed:
+                return 0
+            errors = list((executor.map if executor else map)(self.deliver, claimed))
+            sent = [row.email_id for row, error in zip(claimed, errors) if error is None]
+            if sent:
+                db.execute(update(Outbox).where(Outbox.email_id.in_(sent))
+                           .values(status=models.OutboxStatus.SENT, sent_at=func.now(), last_error=None))
+            for row, error in zip(claimed, errors):
+                if error is None:
+                    continue
+                if is_permanent(error) or row.attempts >= self.max_attempts:
+                    values = {"status": models.OutboxStatus.FAILED}
+                    self.failed += 1
+                else:
+                    values = {"next_attempt_at": func.now() + datetime.timedelta(seconds=self.backoff(row.attempts))}
+                    self.retried += 1
+                db.execute(update(Outbox).where(Outbox.email_id == row.email_id)
+                           .values(last_error=str(error)[:1000], **values))
+            db.commit()
+            self.sent += len(sent)
+            return len(claimed)
+
+    def prune(self):
+        """Deletes sent and failed messages older than the retention, at most once every PRUNE_INTERVAL"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self._pruned_at is not None and (now - self._pruned_at).total_seconds() < PRUNE_INTERVAL:
+            return
+        with self.session_factory() as db:
+            db.execute(delete(Outbox).where(Outbox.status != models.OutboxStatus.PENDING,
+                                            Outbox.created_at < func.now() - self.retention))
+            db.commit()
+        self._pruned_at = now
+
+    def status(self):
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed,
+                "smtp_connects": self.smtp_pool.connects}
+
+
+def outbox_sender_from_settings():
+    pool = SMTPPool(settings.smtp_host, settings.smtp_port, settings.smtp_username, settings.smtp_password,
+                    settings.smtp_starttls, settings.smtp_timeout, settings.smtp_pool_size, settings.smtp_idle_timeout)
+    # the sender uses the sync engine in both DB modes: it runs in a thread of its own
+    return OutboxSender(SessionLocal, pool, settings.smtp_sender or settings.smtp_username or "mlingo@localhost",
+                        settings.outbox_batch_size, settings.outbox_poll_interval, settings.outbox_max_attempts,
+                        settings.outbox_retry_delay, settings.outbox_retry_max_delay, settings.outbox_retention_days,
+                        settings.smtp_pool_size)
+
+
+outbox_sender = outbox_sender_from_settings()
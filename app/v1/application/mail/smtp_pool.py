@@ -0,0 +1,111 @@
+"""SMTP connections kept open between messages: connecting, STARTTLS and logging in take several round trips,
+which a burst of messages would otherwise pay for each one"""
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+
+# a connection idle for longer is checked with a NOOP before it is reused, as servers drop idle clients
+CHECK_AFTER = 5
+
+
+class SMTPPool:
+    """At most `size` connections to one server, each used by one sender at a time"""
+
+    def __init__(self, host: str, port: int, username: str | None = None, password: str | None = None,
+                 starttls: bool = True, timeout: float = 10, size: int = 2, idle_timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._idle = []  # (connection, time it was last used), most recent last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls(context=ssl.create_default_context())
+            if self.username:
+                connection.login(self.username, self.password or "")
+        except BaseException:
+            connection.close()
+            raise
+        self.connects += 1
+        return connection
+
+    @staticmethod
+    def _alive(connection):
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle < self.idle_timeout and (idle < CHECK_AFTER or self._alive(connection)):
+                return connection
+            self._close(connection)
+        return self._connect()
+
+    @contextmanager
+    def connection(self):
+        """An open connection, back in the pool afterwards unless it failed in a way that leaves it unusable"""
+        with self._slots:
+            connection = self._checkout()
+            try:
+                yield connection
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # the server answered, and smtplib reset the transaction; 421 means it is closing the connection
+                if getattr(e, "smtp_code", None) == 421:
+                    self._close(connection)
+                else:
+                    self._release(connection)
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            else:
+                self._release(connection)
+
+    def _release(self, connection):
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+
+    def send(self, message):
+        """Sends an email.message.EmailMessage, once more over a new connection when the server turns out to have
+        dropped the pooled one"""
+        try:
+            with self.connection() as connection:
+                connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection() as connection:
+                connection.send_message(message)
+
+    def close_idle(self, idle_for: float = 0):
+        """Closes the connections unused for idle_for seconds or more"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [connection for connection, last_used in self._idle if now - last_used >= idle_for]
+            self._idle = [(connection, last_used) for connection, last_used in self._idle
+                          if now - last_used < idle_for]
+        for connection in stale:
+            self._close(connection)
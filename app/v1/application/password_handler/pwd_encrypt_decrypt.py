@@ -1,11 +1,84 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.infrastructure.settings import settings
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
-def hash_pwd(password: str):
+# bcrypt is pure CPU work: it runs in a process pool so that hashing scales across cores and holds neither the
+# GIL nor the event loop. The semaphores bound how many hashes may queue up before callers wait.
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.password_hash_max_pending)
+_async_pending = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn instead of fork: the parent holds pool connections and threads that must not be copied
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers or os.cpu_count(),
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def _hash(password: str):
     return pwd_context.hash(password)
 
 
-def verify(plain_pwd, hashed_pwd):
+def _verify(plain_pwd, hashed_pwd):
     return pwd_context.verify(plain_pwd, hashed_pwd)
+
+
+def _run(func, *args):
+    if settings.password_hash_workers == 0:
+        return func(*args)
+    with _pending:
+        return _get_executor().submit(func, *args).result()
+
+
+async def _run_async(func, *args):
+    global _async_pending
+    if settings.password_hash_workers == 0:
+        # without a process pool the hash still must not block the event loop
+        return await run_in_threadpool(func, *args)
+    if _async_pending is None:
+        _async_pending = asyncio.Semaphore(settings.password_hash_max_pending)
+    async with _async_pending:
+        return await asyncio.wrap_future(_get_executor().submit(func, *args))
+
+
+def hash_pwd(password: str):
+    return _run(_hash, password)
+
+
+def verify(plain_pwd, hashed_pwd):
+    return _run(_verify, plain_pwd, hashed_pwd)
+
+
+async def hash_pwd_async(password: str):
+    return await _run_async(_hash, password)
+
+
+async def verify_async(plain_pwd, hashed_pwd):
+    return await _run_async(_verify, plain_pwd, hashed_pwd)
+
+
+def needs_rehash(hashed_pwd):
+    """True when the hash was made with a cost factor other than the configured one. Does no hashing itself"""
+    return pwd_context.needs_update(hashed_pwd)
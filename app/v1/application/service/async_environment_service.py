@@ -0,0 +1,46 @@
+"""Async environment diff and promotion, used when the app runs with MLINGO_DB_MODE=async"""
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.service.environment_service import CHANGES, WHOLE_CATALOG_PLANS, environment_scopes, \
+    environments_query, invalid_pair, diff_query, diff_counts_query, key_counts_query, diff_report, \
+    promotion_statements, key_pruning, promoted
+from app.v1.domain import schema
+
+
+async def fetch_environment_diff(project_id: int, pair: schema.EnvironmentPair, db, limit: int = 100):
+    try:
+        error = invalid_pair(pair, await db.scalar(environments_query(project_id, pair)))
+        if error is not None:
+            return error
+        source, target = environment_scopes(project_id, pair)
+        await db.execute(WHOLE_CATALOG_PLANS)
+        entries = (await db.execute(diff_query(source, target).order_by("key", "language").limit(limit))).all() \
+            if limit else []
+        report = diff_report((await db.execute(diff_counts_query(source, target))).all(),
+                             (await db.execute(key_counts_query(source, target))).one(), entries, limit)
+        return ResponseDTO(200, "Environments compared successfully", report)
+    except Exception as e:
+        return ResponseDTO(204, str(e), {})
+
+
+async def promote_environment(project_id: int, promotion: schema.Promotion, db, limit: int = 100):
+    try:
+        if promotion.dryRun:
+            return await fetch_environment_diff(project_id, promotion, db, limit)
+        error = invalid_pair(promotion, await db.scalar(environments_query(project_id, promotion)))
+        if error is not None:
+            return error
+        source, target = environment_scopes(project_id, promotion)
+        await db.execute(WHOLE_CATALOG_PLANS)
+        report = {"translations": dict.fromkeys(CHANGES, 0)}
+        report["translations"].update((await db.execute(diff_counts_query(source, target))).all())
+
+        for field, statement in promotion_statements(source, target, promotion.prune):
+            report[field] = (await db.execute(statement)).rowcount
+        pruned_keys = (await db.scalars(key_pruning(source, target))).all() if promotion.prune else []
+        report["keys_deleted"] = len(pruned_keys)
+        await db.commit()
+        promoted(target, pruned_keys)
+        return ResponseDTO(200, "Environment promoted successfully", report)
+    except Exception as e:
+        await db.rollback()
+        return ResponseDTO(204, str(e), {})
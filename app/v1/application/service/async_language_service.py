@@ -0,0 +1,315 @@
+"""Async service layer for languages, used when the app runs with MLINGO_DB_MODE=async"""
+
+import time
+from typing import List
+
+from sqlalchemy import select, update
+
+from app.infrastructure.async_database import AsyncSessionLocal
+from app.infrastructure.response_cache import response_cache
+from app.v1.application.dto.dto_classes import ResponseDTO, PageDTO
+from app.v1.application.service.bundle_service import bundle_store
+from app.v1.application.service.language_service import language_id_cache, key_id_cache, batched, \
+    languages_query, language_keys_query, translation_pivot_query, pivot_translations, stream_prefix, \
+    stream_suffix, encode_chunk, translation_upsert, translation_changes_query, key_upsert, language_upsert, \
+    cache_ids, next_cursor, language_page_query, language_key_item, fallback_update, fallback_chain_ids
+from app.v1.application.service.fallback_service import chain_query
+from app.v1.application.service.search_service import search_query, search_page
+from app.v1.domain import models, schema
+from app.v1.domain.models import KeyStatus
+
+
+async def add_language(languageName: str, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    language_id = language_id_cache.get((scope, languageName))
+    if language_id is not None:
+        return language_id
+
+    language_id = await db.scalar(select(models.Language.language_id).where(
+        models.Language.language == languageName, scope.filter(models.Language)))
+    if language_id is None:
+        new_language = models.Language(language=languageName, **scope.columns())
+
+        language_id_cache.invalidate((scope, languageName))
+        db.add(new_language)
+        await db.commit()
+        language_id = new_language.language_id
+
+    language_id_cache.set((scope, languageName), language_id)
+    return language_id
+
+
+async def add_key(addkey: str, status: KeyStatus, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    key_id = key_id_cache.get((scope, addkey))
+    if key_id is not None:
+        return key_id
+
+    key_id = await db.scalar(select(models.Key.key_id).where(models.Key.key == addkey, scope.filter(models.Key)))
+    if key_id is None:
+        new_key = models.Key(key=addkey, status=status, **scope.columns())
+
+        key_id_cache.invalidate((scope, addkey))
+        db.add(new_key)
+        await db.commit()
+        key_id = new_key.key_id
+
+    key_id_cache.set((scope, addkey), key_id)
+    return key_id
+
+
+async def add_translation(addTranslation: schema.Translate, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    try:
+        addTranslation.key_id = await add_key(addTranslation.key, addTranslation.status, db, scope)
+        changes = {}
+
+        for translation in addTranslation.translations:
+            translation.language_id = await add_language(translation.language, db, scope)
+
+            translation_id = await db.scalar(select(models.Translation.translation_id).where(
+                scope.filter(models.Translation),
+                models.Translation.key_id == addTranslation.key_id,
+                models.Translation.language_id == translation.language_id).limit(1))
+            if not translation_id:
+                db.add(models.Translation(key_id=addTranslation.key_id,
+                                          language_id=translation.language_id,
+                                          translation=translation.translation,
+                                          **scope.columns()))
+                changes.setdefault(translation.language_id, {})[addTranslation.key] = translation.translation
+
+        await db.commit()
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
+        return ResponseDTO(200, "Translation Added successfully", {})
+    except Exception as e:
+        await db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+async def update_translation(editTranslation: schema.Translate, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    try:
+        if not editTranslation.key_id:
+            editTranslation.key_id = await add_key(editTranslation.key, editTranslation.status, db, scope)
+        changes = {}
+
+        for translation in editTranslation.translations:
+            if not translation.language_id:
+                translation.language_id = await add_language(translation.language, db, scope)
+
+            updated = await db.execute(update(models.Translation).where(
+                scope.filter(models.Translation),
+                models.Translation.key_id == editTranslation.key_id,
+                models.Translation.language_id == translation.language_id).values(
+                translation=translation.translation))
+            if updated.rowcount:
+                changes.setdefault(translation.language_id, {})[editTranslation.key] = translation.translation
+
+        await db.commit()
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
+        return ResponseDTO(200, "Translation Edited successfully", {})
+    except Exception as e:
+        await db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+async def resolve_key_ids(key_statuses: dict, db, batch_size: int = 1000,
+                          scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Async counterpart of language_service.resolve_key_ids"""
+    key_ids = {}
+    uncached = {}
+    for key, status in key_statuses.items():
+        key_id = key_id_cache.get((scope, key))
+        if key_id is None:
+            uncached[key] = status
+        else:
+            key_ids[key] = key_id
+
+    for batch in batched(uncached.items(), batch_size):
+        key_id_cache.invalidate(*((scope, key) for key, _ in batch))
+        await db.execute(key_upsert(), [{"key": key, "status": status, **scope.columns()} for key, status in batch])
+        key_ids.update((await db.execute(select(models.Key.key, models.Key.key_id).where(
+            scope.filter(models.Key), models.Key.key.in_([key for key, _ in batch])))).all())
+    return key_ids
+
+
+async def resolve_language_ids(language_names, db, batch_size: int = 1000,
+                               scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Async counterpart of language_service.resolve_language_ids"""
+    language_ids = {}
+    uncached = []
+    for language in language_names:
+        language_id = language_id_cache.get((scope, language))
+        if language_id is None:
+            uncached.append(language)
+        else:
+            language_ids[language] = language_id
+
+    for batch in batched(uncached, batch_size):
+        language_id_cache.invalidate(*((scope, language) for language in batch))
+        await db.execute(language_upsert(), [{"language": language, **scope.columns()} for language in batch])
+        language_ids.update((await db.execute(select(models.Language.language, models.Language.language_id).where(
+            scope.filter(models.Language), models.Language.language.in_(batch)))).all())
+    return language_ids
+
+
+async def bulk_import_translations(translations: List[schema.Translate], db, batch_size: int = 1000,
+                                   scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Upserts many translations in batches inside a single transaction"""
+    try:
+        start = time.perf_counter()
+        key_ids = await resolve_key_ids({item.key: item.status for item in translations}, db, batch_size, scope)
+        language_ids = await resolve_language_ids(
+            {translation.language for item in translations for translation in item.translations}, db, batch_size,
+            scope)
+
+        values = {}
+        changes = {}
+        for item in translations:
+            for translation in item.translations:
+                language_id = language_ids[translation.language]
+                values[(key_ids[item.key], language_id)] = translation.translation
+                changes.setdefault(language_id, {})[item.key] = translation.translation
+
+        upsert = translation_upsert()
+        for batch in batched(values.items(), batch_size):
+            await db.execute(upsert, [{"key_id": key_id, "language_id": language_id, "translation": translation,
+                                       **scope.columns()} for (key_id, language_id), translation in batch])
+        await db.commit()
+        cache_ids(key_ids, language_ids, scope)
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
+
+        elapsed = time.perf_counter() - start
+        return ResponseDTO(200, "Translations imported successfully",
+                           {"keys": len(key_ids), "languages": len(language_ids), "rows": len(values),
+                            "seconds": round(elapsed, 3), "rows_per_second": round(len(values) / elapsed, 1)})
+    except Exception as e:
+        await db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+async def fetch_language_keys(languageId: int, db, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                              page: schema.KeyPage = schema.FIRST_PAGE, filters: schema.KeyFilter = schema.NO_FILTER):
+    rows = (await db.execute(language_keys_query(languageId, scope, page, filters))).all()
+    language_keys = [language_key_item(row) for row in rows]
+
+    return PageDTO(200, "Keys fetched successfully", language_keys, next_cursor([row[0] for row in rows], page))
+
+
+async def fetch_all_translation(db, scope: schema.Scope = schema.GLOBAL_SCOPE, page: schema.KeyPage = schema.FIRST_PAGE,
+                                filters: schema.KeyFilter = schema.NO_FILTER, languageIds: List[int] | None = None):
+    available_languages = (await db.execute(languages_query(scope, languageIds))).all()
+    rows = await db.execute(translation_pivot_query(scope, page, filters, languageIds))
+
+    formatted_translations_list = list(pivot_translations(rows, available_languages))
+    return PageDTO(200, "Translations fetched successfully", formatted_translations_list,
+                   next_cursor([item["id"] for item in formatted_translations_list], page))
+
+
+async def fetch_language_bundle(languageId: int, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    bundle = bundle_store.cached(languageId, scope)
+    if bundle is None:
+        bundle = await db.run_sync(lambda session: bundle_store.get(languageId, session, scope))
+    return bundle
+
+
+async def set_language_fallback(languageId: int, fallbackLanguageId: int | None, db,
+                                scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Async counterpart of language_service.set_language_fallback"""
+    try:
+        chain = await db.run_sync(lambda session: fallback_chain_ids(fallbackLanguageId, session, scope))
+        statement, error = fallback_update(languageId, fallbackLanguageId, chain, scope)
+        if error:
+            return ResponseDTO(400, error, {})
+        if not (await db.execute(statement)).rowcount:
+            return ResponseDTO(404, "Language not found", {})
+        await db.commit()
+        bundle_store.invalidate(languageId)
+        response_cache.invalidate(scope)
+        chain = (await db.scalars(chain_query(languageId, scope))).all()
+        return ResponseDTO(200, "Fallback language set successfully", {"language_id": languageId, "chain": chain})
+    except Exception as e:
+        await db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+async def fetch_language_coverage(db, scope: schema.Scope = schema.GLOBAL_SCOPE, languageIds: List[int] | None = None):
+    report = []
+    for language_id, language in (await db.execute(languages_query(scope, languageIds))).all():
+        bundle = await fetch_language_bundle(language_id, db, scope)
+        report.append({**bundle.coverage(), "language": language})
+    return ResponseDTO(200, "Coverage fetched successfully", report)
+
+
+async def fetch_translation_changes(since: int, languageId: int | None, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    high_water = await db.scalar(select(models.SAFE_REVISION))
+    changes = [row._asdict() for row in
+               await db.execute(translation_changes_query(since, high_water, scope, languageId))]
+
+    return ResponseDTO(200, "Changes fetched successfully", {"revision": high_water, "changes": changes})
+
+
+async def fetch_all_language(db, scope: schema.Scope = schema.GLOBAL_SCOPE, page: schema.KeyPage = schema.FIRST_PAGE):
+    languages = (await db.execute(language_page_query(scope, page))).all()
+    return PageDTO(200, "Languages fetched successfully", languages,
+                   next_cursor([language.language_id for language in languages], page))
+
+
+async def search_translations(search: schema.SearchQuery, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    return search_page(await db.execute(search_query(search, scope)), search)
+
+
+"""----------------------------------------------Streaming exports-------------------------------------------------------------------"""
+
+
+async def encode_async_stream(items, output_format: str, message: str, chunk_rows: int = 1000):
+    """Async counterpart of language_service.encode_stream"""
+    yield stream_prefix(output_format, message)
+    chunk, first = [], True
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_rows:
+            yield encode_chunk(chunk, output_format, first)
+            chunk, first = [], False
+    if chunk:
+        yield encode_chunk(chunk, output_format, first)
+    yield stream_suffix(output_format)
+
+
+async def stream_all_translation(output_format: str = "ndjson", chunk_rows: int = 1000,
+                                 scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Streams the translation catalog through a server-side cursor owned by the generator"""
+    async with AsyncSessionLocal() as db:
+        available_languages = (await db.execute(languages_query(scope))).all()
+        rows = await db.stream(translation_pivot_query(scope).execution_options(yield_per=chunk_rows))
+
+        async def formatted_translations():
+            # a key's rows may straddle two partitions, so the last key of each partition is held back
+            pending = []
+            async for partition in rows.partitions():
+                pending.extend(partition)
+                last_key_id = pending[-1][0]
+                complete = [row for row in pending if row[0] != last_key_id]
+                pending = pending[len(complete):]
+                for item in pivot_translations(complete, available_languages):
+                    yield item
+            for item in pivot_translations(pending, available_languages):
+                yield item
+
+        async for chunk in encode_async_stream(formatted_translations(), output_format,
+                                               "Translations fetched successfully", chunk_rows):
+            yield chunk
+
+
+async def stream_language_keys(languageId: int, output_format: str = "ndjson", chunk_rows: int = 1000,
+                               scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Streams the keys of a language and their values through a server-side cursor"""
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(language_keys_query(languageId, scope).execution_options(yield_per=chunk_rows))
+
+        async def language_keys():
+            async for row in rows:
+                yield language_key_item(row)
+
+        async for chunk in encode_async_stream(language_keys(), output_format, "Keys fetched successfully",
+                                               chunk_rows):
+            yield chunk
@@ -0,0 +1,73 @@
+"""Async service layer for projects, used when the app runs with MLINGO_DB_MODE=async"""
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.domain import models, schema
+
+
+async def add_branch_to_ucb(new_branch, user_id, project_id, db):
+    """Adds the branch to Users company branch table"""
+    try:
+        environment_id = (await db.execute(select(models.UserProjectEnv.environment_id).where(
+            models.UserProjectEnv.user_id == user_id).limit(1))).scalar_one()
+
+        if environment_id is None:
+            await db.execute(update(models.UserProjectEnv).where(models.UserProjectEnv.user_id == user_id).values(
+                environment_id=new_branch.environment_id))
+            await db.commit()
+        elif environment_id != new_branch.environment_id:
+            db.add(models.UserProjectEnv(user_id=user_id, project_id=project_id,
+                                         environment_id=new_branch.environment_id,
+                                         roles=[models.RolesEnum.ADMIN]))
+            await db.commit()
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
+
+
+async def add_env(environment: schema.AddEnvironment, user_id, project_id, db, is_init: bool):
+    """Creates a branch for a company"""
+    try:
+        project_exists = await db.scalar(select(models.Projects.project_id).where(
+            models.Projects.project_id == project_id))
+        if project_exists is None:
+            return ResponseDTO(404, "Project not found!", {})
+        new_env = models.Environments(environment_name=environment.environment_name, project_id=project_id,
+                                      activity_status="ACTIVE", modified_on=datetime.now(), modified_by=user_id,
+                                      is_main=environment.is_main)
+        db.add(new_env)
+        await db.flush()
+
+        await add_branch_to_ucb(new_env, user_id, project_id, db)
+        await db.commit()
+        created = {"environment_name": new_env.environment_name, "environment_id": new_env.environment_id}
+        if is_init:
+            return created
+        else:
+            return ResponseDTO(200, "Branch created successfully!", created)
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
+
+
+async def add_project(project: schema.AddProject, user_id, db):
+    """Creates a company and adds a branch to it"""
+    user_exists = await db.scalar(select(models.UsersAuth.user_id).where(models.UsersAuth.user_id == user_id))
+    if user_exists is None:
+        return ResponseDTO(404, "User does not exist!", {})
+
+    new_project = models.Projects(project_name=project.project_name, owner=user_id, modified_by=user_id,
+                                  activity_status=project.status, onboarding_date=datetime.now())
+    db.add(new_project)
+    await db.commit()
+
+    await db.execute(update(models.UserProjectEnv).where(models.UserProjectEnv.user_id == user_id).values(
+        project_id=new_project.project_id))
+    await db.commit()
+
+    environment = schema.AddEnvironment(environment_name=project.environment_name, is_main=project.is_main)
+    init_branch = await add_env(environment, user_id, new_project.project_id, db, True)
+
+    return ResponseDTO(200, "Company created successfully",
+                       {"project_name": new_project.project_name, "project_id": new_project.project_id,
+                        "environment": init_branch})
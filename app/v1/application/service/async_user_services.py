@@ -0,0 +1,126 @@
+"""Async service layer for users, used when the app runs with MLINGO_DB_MODE=async"""
+from sqlalchemy import select, update
+
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.password_handler.pwd_encrypt_decrypt import verify_async, hash_pwd_async, needs_rehash
+from app.v1.application.mail.outbox import outbox_sender
+from app.v1.application.service.user_services import user_projects_query, group_projects, \
+    create_password_reset_code, queue_reset_code_email
+from app.v1.domain import models, schema
+
+
+async def get_projects(user_id, db):
+    """Fetches the projects of a user together with their environments in a single query"""
+    try:
+        return group_projects(await db.execute(user_projects_query(user_id)))
+
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
+
+
+async def auth_function(credentials: schema.Credentials, db):
+    try:
+        is_user_present = await db.scalar(select(models.UsersAuth).where(
+            models.UsersAuth.user_email == credentials.email))
+
+        if is_user_present is None:
+            return ResponseDTO(404, "User is not registered, please register.", {})
+
+        if is_user_present.password is None:
+            return ResponseDTO(404, "Password is not set yet. Please set your password", {})
+
+        if not await verify_async(credentials.password, is_user_present.password):
+            return ResponseDTO(401, "Password Incorrect!", {})
+
+        if needs_rehash(is_user_present.password):
+            is_user_present.password = await hash_pwd_async(credentials.password)
+            await db.commit()
+
+        user_name = await db.scalar(select(models.UserDetails.user_name).where(
+            models.UserDetails.user_id == is_user_present.user_id))
+
+        projects = await get_projects(is_user_present.user_id, db)
+
+        return ResponseDTO(200, "Login successful",
+                           schema.LoginResponse(user_id=is_user_present.user_id, name=user_name, projects=projects))
+
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
+
+
+async def add_user(user: schema.AddUser, db):
+    """Adds a user into the database"""
+    user_email_exists = await db.scalar(select(models.UsersAuth.user_id).where(
+        models.UsersAuth.user_email == user.user_email))
+
+    if user_email_exists:
+        return ResponseDTO(403, "User with this email already exists", {})
+    user.password = await hash_pwd_async(user.password)
+    new_user = models.UsersAuth(user_email=user.user_email, password=user.password)
+    db.add(new_user)
+    await db.flush()
+
+    db.add(models.UserDetails(user_id=new_user.user_id, user_name=user.user_name, user_contact=user.user_contact))
+    db.add(models.UserProjectEnv(user_id=new_user.user_id))
+
+    await db.commit()
+
+    return ResponseDTO(200, "User created successfully",
+                       {"user_id": new_user.user_id, "name": user.user_name, "company": []})
+
+
+"""-------------------------------Update password code starts below this line-----------------------------"""
+
+
+async def check_token(obj, db):
+    """Verifies the reset token stored in DB, against the token entered by an individual"""
+    try:
+        user = await db.scalar(select(models.UsersAuth).where(models.UsersAuth.user_email == obj.email))
+        if user is None:
+            return ResponseDTO(404, "User not found!", {})
+        else:
+            if user.change_password_token != obj.token:
+                return ResponseDTO(204, "Reset token doesn't match", {})
+            else:
+                return await change_password(obj, db)
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
+
+
+async def change_password(obj, db):
+    """Updates the password and makes the change_password_token null in db"""
+    user = await db.scalar(select(models.UsersAuth).where(models.UsersAuth.user_email == obj.email))
+
+    if user is None:
+        return ResponseDTO(404, "User with this email does not exist!", {})
+
+    if user.change_password_token != obj.token:
+        return ResponseDTO(204, "Reset token doesn't match", {})
+
+    hashed_pwd = await hash_pwd_async(obj.password)
+    await db.execute(update(models.UsersAuth).where(models.UsersAuth.user_id == user.user_id).values(
+        change_password_token=None, password=hashed_pwd))
+    await db.commit()
+
+    return ResponseDTO(200, "Password updated successfully!", {})
+
+
+async def initiate_pwd_reset(email, db):
+    """Stores a reset code for the user and queues the email carrying it for the outbox sender"""
+    try:
+        fetched_email = await db.scalar(select(models.UsersAuth.user_email).where(
+            models.UsersAuth.user_email == email))
+        if fetched_email is None:
+            return ResponseDTO(404, "User not found", {})
+
+        reset_code = create_password_reset_code()
+        await db.execute(update(models.UsersAuth).where(models.UsersAuth.user_email == fetched_email).values(
+            change_password_token=reset_code))
+        queue_reset_code_email(fetched_email, reset_code, db)
+        await db.commit()
+        outbox_sender.wake()
+
+        return ResponseDTO(200, "Email queued successfully", {})
+
+    except Exception as exc:
+        return ResponseDTO(204, str(exc), {})
@@ -0,0 +1,179 @@
+"""Precompiled per-language translation bundles, served with strong ETags"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import Counter
+from itertools import chain, repeat
+
+import orjson
+from sqlalchemy import select
+
+from app.infrastructure.settings import settings
+from app.v1.application.service.fallback_service import chain_query, resolved_keys_query, coverage
+from app.v1.domain import models, schema
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, bundles are then offered as identity and gzip only
+    brotli = None
+
+
+class Bundle:
+    """The resolved key -> value map of one language with its serialized and pre-compressed bodies. `chain` is
+    the language's fallback chain, `sources` the language each value came from and `missing` the keys that no
+    language of the chain translates"""
+    __slots__ = ("language_id", "chain", "values", "sources", "missing", "bodies", "etags", "built_at")
+
+    def __init__(self, language_id: int, chain: list, values: dict, sources: dict, missing: set):
+        self.language_id = language_id
+        self.chain = chain
+        self.values = values
+        self.sources = sources
+        self.missing = missing
+        identity = orjson.dumps(values, option=orjson.OPT_SORT_KEYS)
+        digest = hashlib.sha256(identity).hexdigest()[:32]
+
+        self.bodies = {"identity": identity, "gzip": gzip.compress(identity, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(identity)
+        # each encoding is a distinct representation, so each gets its own strong validator
+        self.etags = {encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+                      for encoding in self.bodies}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_rows(cls, language_id: int, chain: list, rows):
+        """Builds a bundle from the (key_id, key, translation, resolved_language_id) rows of resolved_keys_query"""
+        values, sources, missing = {}, {}, set()
+        for _, key, translation, resolved_language_id in rows:
+            if resolved_language_id is None:
+                missing.add(key)
+            else:
+                values[key] = translation
+                sources[key] = resolved_language_id
+        return cls(language_id, chain, values, sources, missing)
+
+    def coverage(self):
+        return coverage(self.language_id, chain(self.sources.values(), repeat(None, len(self.missing))))
+
+    def patched(self, changes: dict):
+        """The bundle after {language_id: {key: value}} changes, or None when it has to be rebuilt because a value
+        it serves was blanked and the next language down the chain is not known here"""
+        rank = {language_id: depth for depth, language_id in enumerate(self.chain)}
+        values, sources, missing = self.values, self.sources, set()
+        for language_id, updates in changes.items():
+            for key, value in updates.items():
+                source = sources.get(key)
+                if source is None and key not in self.missing:
+                    missing.add(key)  # a key new to the catalog
+                if language_id not in rank:
+                    continue
+                if not value:
+                    if source == language_id:
+                        return None
+                elif source is None or rank[language_id] <= rank[source]:
+                    if values is self.values:
+                        values, sources = dict(values), dict(sources)
+                    values[key] = value
+                    sources[key] = language_id
+        missing = (self.missing | missing) - sources.keys()
+        if values is self.values:
+            self.missing = missing  # the bodies are unchanged, so the bundle is kept
+            return self
+        return Bundle(self.language_id, self.chain, values, sources, missing)
+
+    def negotiate(self, accept_encoding: str | None):
+        """Picks the smallest encoding the client accepts"""
+        accepted = {token.split(";")[0].strip() for token in (accept_encoding or "").split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.bodies:
+                return encoding
+        return "identity"
+
+    def matches(self, if_none_match: str | None):
+        if not if_none_match:
+            return False
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or not candidates.isdisjoint(self.etags.values())
+
+
+class BundleStore:
+    """Compiled bundles per (scope, language id). Writes patch the compiled bundles of their catalog; a bundle that
+    is older than bundle_ttl is rebuilt so that writes handled by other worker processes show up"""
+
+    def __init__(self, ttl: float | None = None):
+        self.ttl = ttl
+        self._bundles = {}
+        self._lock = threading.Lock()
+        # patches and invalidations so far, per scope and (under None) of the whole store; a bundle whose build
+        # overlapped one of them may predate the write, so it is served but not stored
+        self._writes = Counter()
+
+    def _write_count(self, scope: schema.Scope):
+        return self._writes[scope], self._writes[None]
+
+    def cached(self, language_id: int, scope: schema.Scope = schema.GLOBAL_SCOPE):
+        bundle = self._bundles.get((scope, language_id))
+        if bundle is not None and self.ttl and time.monotonic() - bundle.built_at > self.ttl:
+            return None
+        return bundle
+
+    def get(self, language_id: int, db, scope: schema.Scope = schema.GLOBAL_SCOPE):
+        """Returns the compiled bundle, resolving every key through the fallback chain in one query when it is
+        missing or stale"""
+        bundle = self.cached(language_id, scope)
+        if bundle is None:
+            with self._lock:
+                writes = self._write_count(scope)
+            keys = select(models.Key.key_id, models.Key.key).where(scope.filter(models.Key)).subquery()
+            bundle = Bundle.from_rows(language_id, db.scalars(chain_query(language_id, scope)).all(),
+                                      db.execute(resolved_keys_query(language_id, keys, scope)))
+            with self._lock:
+                if self._write_count(scope) == writes:
+                    self._bundles[(scope, language_id)] = bundle
+        return bundle
+
+    def apply(self, changes: dict, scope: schema.Scope = schema.GLOBAL_SCOPE):
+        """Patches the compiled bundles of a catalog with {language_id: {key: value}} changes that were just
+        committed, including the bundles of languages that fall back to a changed one. Bundles that were never
+        compiled are left to be built on their first request"""
+        with self._lock:
+            self._writes[scope] += 1
+            for cache_key, bundle in list(self._bundles.items()):
+                if cache_key[0] != scope:
+                    continue
+                patched = bundle.patched(changes)
+                if patched is None:
+                    del self._bundles[cache_key]
+                else:
+                    self._bundles[cache_key] = patched
+
+    def invalidate_catalog(self, scope: schema.Scope):
+        """Drops every bundle of a catalog"""
+        with self._lock:
+            self._writes[scope] += 1
+            for cache_key in [cache_key for cache_key in self._bundles if cache_key[0] == scope]:
+                del self._bundles[cache_key]
+
+    def invalidate(self, *language_ids):
+        """Drops the bundles whose fallback chain goes through one of the languages, or every bundle"""
+        with self._lock:
+            self._writes[None] += 1
+            for cache_key, bundle in list(self._bundles.items()):
+                if not language_ids or not set(language_ids).isdisjoint(bundle.chain):
+                    del self._bundles[cache_key]
+
+
+bundle_store = BundleStore(ttl=settings.bundle_ttl)
+
+
+def bundle_response_parts(bundle: Bundle, if_none_match: str | None, accept_encoding: str | None):
+    """Returns (status_code, body, headers) for serving a bundle, answering 304 when the client's copy is current"""
+    encoding = bundle.negotiate(accept_encoding)
+    headers = {"ETag": bundle.etags[encoding], "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if bundle.matches(if_none_match):
+        return 304, b"", headers
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return 200, bundle.bodies[encoding], headers
@@ -0,0 +1,232 @@
+"""Diff and promotion of a project's catalog from one of its environments to another. Keys and languages are
+matched by name, and each step is a single set-based statement, so the cost does not grow with round trips"""
+from sqlalchemy import select, func, case, literal, and_, update, delete, except_, text, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from app.infrastructure.response_cache import response_cache
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.application.service.bundle_service import bundle_store
+from app.v1.application.service.language_service import key_id_cache, translation_upsert
+from app.v1.domain import models, schema
+
+CHANGES = ("added", "changed", "removed")
+# Every statement here reads whole catalogs, and the target's keys and languages may have been written earlier
+# in the same transaction, where the planner has no statistics for them and takes them for a row or two. Hash
+# joins keep the cost linear whatever the estimates; a nested loop over a 20k key catalog took minutes
+WHOLE_CATALOG_PLANS = text("SET LOCAL enable_nestloop = off")
+
+
+def environment_scopes(project_id: int, pair: schema.EnvironmentPair):
+    return (schema.Scope(projectId=project_id, environmentId=pair.sourceEnvironmentId),
+            schema.Scope(projectId=project_id, environmentId=pair.targetEnvironmentId))
+
+
+def environments_query(project_id: int, pair: schema.EnvironmentPair):
+    """Number of the pair's environments that belong to the project"""
+    return select(func.count()).select_from(models.Environments).where(
+        models.Environments.project_id == project_id,
+        models.Environments.environment_id.in_({pair.sourceEnvironmentId, pair.targetEnvironmentId}))
+
+
+def invalid_pair(pair: schema.EnvironmentPair, found: int):
+    """The error response for a pair that cannot be compared, None when it can"""
+    if pair.sourceEnvironmentId == pair.targetEnvironmentId:
+        return ResponseDTO(400, "The source and target environments are the same", {})
+    if found != 2:
+        return ResponseDTO(404, "Environment not found in this project", {})
+    return None
+
+
+def catalog_values(scope: schema.Scope):
+    """(key, language, translation) of every translation of a catalog, named so that two catalogs compare"""
+    return select(models.Key.key, models.Language.language, models.Translation.translation) \
+        .join(models.Key, models.Key.key_id == models.Translation.key_id) \
+        .join(models.Language, models.Language.language_id == models.Translation.language_id) \
+        .where(scope.filter(models.Translation)).subquery()
+
+
+def diff_query(source: schema.Scope, target: schema.Scope):
+    """(key, language, change, source value, target value) of every translation the promotion would add, change
+    or (with prune) remove, from a single full join of the two catalogs"""
+    ours, theirs = catalog_values(source), catalog_values(target)
+    change = case((theirs.c.key.is_(None), "added"), (ours.c.key.is_(None), "removed"), else_="changed")
+    return select(func.coalesce(ours.c.key, theirs.c.key).label("key"),
+                  func.coalesce(ours.c.language, theirs.c.language).label("language"), change.label("change"),
+                  ours.c.translation.label("source"), theirs.c.translation.label("target")) \
+        .select_from(ours.join(theirs, and_(ours.c.key == theirs.c.key, ours.c.language == theirs.c.language),
+                               full=True)) \
+        .where(ours.c.key.is_(None) | theirs.c.key.is_(None) |
+               ours.c.translation.is_distinct_from(theirs.c.translation))
+
+
+def diff_counts_query(source: schema.Scope, target: schema.Scope):
+    diff = diff_query(source, target).subquery()
+    return select(diff.c.change, func.count()).group_by(diff.c.change)
+
+
+def key_counts_query(source: schema.Scope, target: schema.Scope):
+    """(keys only the source has, keys only the target has)"""
+    ours, theirs = aliased(models.Key), aliased(models.Key)
+    ours_keys = select(ours.key).where(source.filter(ours)).subquery()
+    theirs_keys = select(theirs.key).where(target.filter(theirs)).subquery()
+    joined = ours_keys.join(theirs_keys, ours_keys.c.key == theirs_keys.c.key, full=True)
+    return select(func.count().filter(theirs_keys.c.key.is_(None)), func.count().filter(ours_keys.c.key.is_(None))) \
+        .select_from(joined)
+
+
+def diff_report(counts, key_counts, entries, limit: int):
+    counts = dict(counts)
+    new_keys, removed_keys = key_counts
+    return {"translations": {change: counts.get(change, 0) for change in CHANGES},
+            "keys": {"added": new_keys, "removed": removed_keys},
+            "entries": [entry._asdict() for entry in entries],
+            "truncated": sum(counts.values()) > limit}
+
+
+def fetch_environment_diff(project_id: int, pair: schema.EnvironmentPair, db, limit: int = 100):
+    """What promoting the source environment's catalog would do to the target's: counts, plus the first `limit`
+    changes by key"""
+    try:
+        error = invalid_pair(pair, db.scalar(environments_query(project_id, pair)))
+        if error is not None:
+            return error
+        source, target = environment_scopes(project_id, pair)
+        db.execute(WHOLE_CATALOG_PLANS)
+        entries = db.execute(diff_query(source, target).order_by("key", "language").limit(limit)).all() \
+            if limit else []
+        report = diff_report(db.execute(diff_counts_query(source, target)).all(),
+                             db.execute(key_counts_query(source, target)).one(), entries, limit)
+        return ResponseDTO(200, "Environments compared successfully", report)
+    except Exception as e:
+        return ResponseDTO(204, str(e), {})
+
+
+"""----------------------------------------------Promotion-------------------------------------------------------------------"""
+
+
+def language_promotion(source: schema.Scope, target: schema.Scope):
+    """Creates the source's languages that the target lacks"""
+    return insert(models.Language).from_select(
+        ["project_id", "environment_id", "language"],
+        select(literal(target.projectId, Integer), literal(target.environmentId, Integer),
+               models.Language.language).where(source.filter(models.Language))) \
+        .on_conflict_do_nothing(index_elements=[models.Language.project_id, models.Language.environment_id,
+                                                models.Language.language])
+
+
+def fallback_promotion(source: schema.Scope, target: schema.Scope):
+    """Points each promoted language of the target at the target's copy of its source fallback"""
+    ours, ours_fallback, theirs_fallback = aliased(models.Language), aliased(models.Language), \
+        aliased(models.Language)
+    mapped = select(ours.language, theirs_fallback.language_id.label("fallback_language_id")) \
+        .outerjoin(ours_fallback, ours_fallback.language_id == ours.fallback_language_id) \
+        .outerjoin(theirs_fallback, and_(target.filter(theirs_fallback),
+                                         theirs_fallback.language == ours_fallback.language)) \
+        .where(source.filter(ours)).subquery()
+    return update(models.Language).where(
+        target.filter(models.Language), models.Language.language == mapped.c.language,
+        models.Language.fallback_language_id.is_distinct_from(mapped.c.fallback_language_id)) \
+        .values(fallback_language_id=mapped.c.fallback_language_id)
+
+
+def key_promotion(source: schema.Scope, target: schema.Scope):
+    """Creates the source's keys that the target lacks and copies the status of the others"""
+    upsert = insert(models.Key).from_select(
+        ["project_id", "environment_id", "key", "status"],
+        select(literal(target.projectId, Integer), literal(target.environmentId, Integer), models.Key.key,
+               models.Key.status).where(source.filter(models.Key)))
+    return upsert.on_conflict_do_update(
+        index_elements=[models.Key.project_id, models.Key.environment_id, models.Key.key],
+        set_={"status": upsert.excluded.status}, where=models.Key.status.is_distinct_from(upsert.excluded.status))
+
+
+def translation_promotion(source: schema.Scope, target: schema.Scope):
+    """INSERT ... SELECT ... ON CONFLICT of the source's translations onto the target's keys and languages;
+    unchanged rows are left alone, so their revision does not move"""
+    ours_key, ours_language = aliased(models.Key), aliased(models.Language)
+    theirs_key, theirs_language = aliased(models.Key), aliased(models.Language)
+    rows = select(literal(target.projectId, Integer), literal(target.environmentId, Integer), theirs_key.key_id,
+                  theirs_language.language_id, models.Translation.translation) \
+        .select_from(models.Translation) \
+        .join(ours_key, ours_key.key_id == models.Translation.key_id) \
+        .join(ours_language, ours_language.language_id == models.Translation.language_id) \
+        .join(theirs_key, and_(target.filter(theirs_key), theirs_key.key == ours_key.key)) \
+        .join(theirs_language, and_(target.filter(theirs_language),
+                                    theirs_language.language == ours_language.language)) \
+        .where(source.filter(models.Translation))
+    return translation_upsert(rows)
+
+
+def translation_names(scope: schema.Scope):
+    return select(models.Key.key, models.Language.language).select_from(models.Translation) \
+        .join(models.Key, models.Key.key_id == models.Translation.key_id) \
+        .join(models.Language, models.Language.language_id == models.Translation.language_id) \
+        .where(scope.filter(models.Translation))
+
+
+def translation_pruning(source: schema.Scope, target: schema.Scope):
+    """Deletes the target's translations of a key and language that the source does not translate. The pairs
+    come from an EXCEPT, which is hashed or sorted whatever the row estimates, where an anti join planned with
+    statistics from before a large promotion can end up as a nested loop"""
+    removed = except_(translation_names(target), translation_names(source)).subquery()
+    return delete(models.Translation).where(
+        target.filter(models.Translation),
+        models.Key.key_id == models.Translation.key_id, target.filter(models.Key), models.Key.key == removed.c.key,
+        models.Language.language_id == models.Translation.language_id, target.filter(models.Language),
+        models.Language.language == removed.c.language)
+
+
+def key_pruning(source: schema.Scope, target: schema.Scope):
+    """Deletes the target's keys that the source does not have, returning their names; their translations are
+    gone by then, as the source cannot translate a key it does not have. Each deleted key costs a foreign key
+    check on translations"""
+    ours = aliased(models.Key)
+    removed = except_(select(models.Key.key).where(target.filter(models.Key)),
+                      select(ours.key).where(source.filter(ours))).subquery()
+    return delete(models.Key).where(target.filter(models.Key), models.Key.key == removed.c.key) \
+        .returning(models.Key.key)
+
+
+def promotion_statements(source: schema.Scope, target: schema.Scope, prune: bool):
+    """(report field, statement) of each step of a promotion, in the order they run"""
+    statements = [("languages_added", language_promotion(source, target)),
+                  ("fallbacks_updated", fallback_promotion(source, target)),
+                  ("keys_written", key_promotion(source, target)),
+                  ("translations_written", translation_promotion(source, target))]
+    if prune:
+        statements.append(("translations_deleted", translation_pruning(source, target)))
+    return statements
+
+
+def promoted(target: schema.Scope, pruned_keys):
+    """Drops what the caches hold of the target catalog once a promotion is committed"""
+    key_id_cache.invalidate(*((target, key) for key in pruned_keys))
+    bundle_store.invalidate_catalog(target)
+    response_cache.invalidate(target)
+
+
+def promote_environment(project_id: int, promotion: schema.Promotion, db, limit: int = 100):
+    """Copies the source environment's languages, keys and translations onto the target in one transaction;
+    with dryRun only the diff is returned. Deletions made with prune do not show up in delta sync"""
+    try:
+        if promotion.dryRun:
+            return fetch_environment_diff(project_id, promotion, db, limit)
+        error = invalid_pair(promotion, db.scalar(environments_query(project_id, promotion)))
+        if error is not None:
+            return error
+        source, target = environment_scopes(project_id, promotion)
+        db.execute(WHOLE_CATALOG_PLANS)
+        report = {"translations": dict.fromkeys(CHANGES, 0)}
+        report["translations"].update(db.execute(diff_counts_query(source, target)).all())
+
+        for field, statement in promotion_statements(source, target, promotion.prune):
+            report[field] = db.execute(statement).rowcount
+        pruned_keys = db.scalars(key_pruning(source, target)).all() if promotion.prune else []
+        report["keys_deleted"] = len(pruned_keys)
+        db.commit()
+        promoted(target, pruned_keys)
+        return ResponseDTO(200, "Environment promoted successfully", report)
+    except Exception as e:
+        db.rollback()
+        return ResponseDTO(204, str(e), {})
@@ -0,0 +1,54 @@
+"""Locale fallback chains (e.g. pt-BR -> pt -> en): a missing translation resolves to the first language down the
+chain that has one. Chains are followed inside the query, so a whole bundle resolves in a single statement"""
+from sqlalchemy import select, true, cast, BIGINT, Integer
+
+from app.v1.domain import models, schema
+
+# guards the recursive walk; set_language_fallback refuses cycles, so real chains end well before this
+MAX_FALLBACK_DEPTH = 8
+
+
+def fallback_chain(language_id: int, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """CTE of (language_id, depth): the language itself at depth 0, then its fallback, that one's fallback..."""
+    chain = select(cast(language_id, BIGINT).label("language_id"), cast(0, Integer).label("depth")) \
+        .cte("fallback_chain", recursive=True)
+    return chain.union_all(
+        select(models.Language.fallback_language_id, chain.c.depth + 1)
+        .join(chain, chain.c.language_id == models.Language.language_id)
+        .where(scope.filter(models.Language), models.Language.fallback_language_id.is_not(None),
+               chain.c.depth < MAX_FALLBACK_DEPTH))
+
+
+def resolved_keys_query(language_id: int, keys, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """(key_id, key, translation, resolved_language_id) for every row of the `keys` subquery (key_id, key). The
+    value comes from the nearest language of the chain with a non-empty translation; both are NULL when no
+    language of the chain has one. Each key is one probe of the (scope, key_id, language_id) index"""
+    chain = fallback_chain(language_id, scope)
+    resolved = select(models.Translation.translation, models.Translation.language_id) \
+        .join(chain, chain.c.language_id == models.Translation.language_id) \
+        .where(scope.filter(models.Translation), models.Translation.key_id == keys.c.key_id,
+               models.Translation.translation != "") \
+        .order_by(chain.c.depth).limit(1).lateral("resolved")
+    return select(keys.c.key_id, keys.c.key, resolved.c.translation, resolved.c.language_id) \
+        .select_from(keys).outerjoin(resolved, true()).order_by(keys.c.key_id)
+
+
+def chain_query(language_id: int, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Language ids of the chain, nearest first"""
+    chain = fallback_chain(language_id, scope)
+    return select(chain.c.language_id).order_by(chain.c.depth)
+
+
+def coverage(language_id: int, resolved_language_ids):
+    """Counts of the keys of a language translated in the language itself, filled by a fallback, or missing from
+    the whole chain, given the language each key resolved to (None when missing)"""
+    keys = translated = fallback = 0
+    for resolved_language_id in resolved_language_ids:
+        keys += 1
+        if resolved_language_id == language_id:
+            translated += 1
+        elif resolved_language_id is not None:
+            fallback += 1
+    return {"language_id": language_id, "keys": keys, "translated": translated, "fallback": fallback,
+            "missing": keys - translated - fallback,
+            "coverage": round(100 * (translated + fallback) / keys, 2) if keys else 100.0}
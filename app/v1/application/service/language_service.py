@@ -1,125 +1,500 @@
 """Service layer for languages"""
 
-from fastapi import Depends
+import time
+from itertools import islice
+from typing import List
 
-from app.infrastructure.database import get_db
-from app.v1.application.dto.dto_classes import ResponseDTO
+import orjson
+from fastapi import Depends
+from sqlalchemy import select, func, exists, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infrastructure.database import get_db, SessionLocal
+from app.infrastructure.lru_cache import LRUCache
+from app.infrastructure.response_cache import response_cache
+from app.infrastructure.settings import settings
+from app.v1.application.dto.dto_classes import ResponseDTO, PageDTO
+from app.v1.application.service.bundle_service import bundle_store
+from app.v1.application.service.fallback_service import resolved_keys_query, chain_query, MAX_FALLBACK_DEPTH
 from app.v1.domain import models, schema
 from app.v1.domain.models import KeyStatus
 
 
-def add_language(languageName: str, db=Depends(get_db)):
-    language = db.query(models.Language).filter(models.Language.language == languageName).first()
+# (scope, name) -> id lookups for the write path; ids of existing names never change, so entries only expire by TTL
+language_id_cache = LRUCache(maxsize=settings.id_cache_size, ttl=settings.id_cache_ttl)
+key_id_cache = LRUCache(maxsize=settings.id_cache_size, ttl=settings.id_cache_ttl)
+
+
+def id_cache_stats():
+    return {"languages": language_id_cache.stats(), "keys": key_id_cache.stats()}
+
+
+def add_language(languageName: str, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
+    language_id = language_id_cache.get((scope, languageName))
+    if language_id is not None:
+        return language_id
+
+    language = db.query(models.Language).filter(models.Language.language == languageName,
+                                                scope.filter(models.Language)).first()
     if language:
+        language_id_cache.set((scope, languageName), language.language_id)
         return language.language_id
     else:
-        new_language = models.Language(language=languageName)
+        new_language = models.Language(language=languageName, **scope.columns())
 
+        language_id_cache.invalidate((scope, languageName))
         db.add(new_language)
         db.commit()
         db.refresh(new_language)
+        language_id_cache.set((scope, languageName), new_language.language_id)
 
         return new_language.language_id
 
 
-def add_key(addkey: str, status: KeyStatus, db=Depends(get_db)):
-    key = db.query(models.Key).filter(models.Key.key == addkey).first()
+def add_key(addkey: str, status: KeyStatus, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
+    key_id = key_id_cache.get((scope, addkey))
+    if key_id is not None:
+        return key_id
+
+    key = db.query(models.Key).filter(models.Key.key == addkey, scope.filter(models.Key)).first()
     if key:
+        key_id_cache.set((scope, addkey), key.key_id)
         return key.key_id
     else:
-        new_key = models.Key(key=addkey, status=status)
+        new_key = models.Key(key=addkey, status=status, **scope.columns())
 
+        key_id_cache.invalidate((scope, addkey))
         db.add(new_key)
         db.commit()
         db.refresh(new_key)
+        key_id_cache.set((scope, addkey), new_key.key_id)
 
         return new_key.key_id
 
 
-def add_translation(addTranslation: schema.Translate, db=Depends(get_db)):
+def add_translation(addTranslation: schema.Translate, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
     try:
-        addTranslation.key_id = add_key(addTranslation.key, addTranslation.status, db)
+        addTranslation.key_id = add_key(addTranslation.key, addTranslation.status, db, scope)
+        changes = {}
 
         for translation in addTranslation.translations:
-            translation.language_id = add_language(translation.language, db)
+            translation.language_id = add_language(translation.language, db, scope)
 
             translation_id = db.query(models.Translation).filter(
+                scope.filter(models.Translation),
                 models.Translation.key_id == addTranslation.key_id,
                 models.Translation.language_id == translation.language_id).first()
             if not translation_id:
                 new_translation = models.Translation(key_id=addTranslation.key_id,
                                                      language_id=translation.language_id,
-                                                     translation=translation.translation)
+                                                     translation=translation.translation,
+                                                     **scope.columns())
 
                 db.add(new_translation)
+                changes.setdefault(translation.language_id, {})[addTranslation.key] = translation.translation
 
         db.commit()
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
         return ResponseDTO(200, "Translation Added successfully", {})
     except Exception as e:
         db.rollback()
         return ResponseDTO(204, f"{str(e)}", {})
 
 
-def update_translation(editTranslation: schema.Translate, db=Depends(get_db)):
+def update_translation(editTranslation: schema.Translate, db=Depends(get_db),
+                       scope: schema.Scope = schema.GLOBAL_SCOPE):
     try:
         if not editTranslation.key_id:
-            editTranslation.key_id = add_key(editTranslation.key, editTranslation.status, db)
+            editTranslation.key_id = add_key(editTranslation.key, editTranslation.status, db, scope)
+        changes = {}
 
         for translation in editTranslation.translations:
             if not translation.language_id:
-                translation.language_id = add_language(translation.language, db)
+                translation.language_id = add_language(translation.language, db, scope)
 
             translated = db.query(models.Translation).filter(
+                scope.filter(models.Translation),
                 models.Translation.key_id == editTranslation.key_id,
                 models.Translation.language_id == translation.language_id)
             translation_exist = translated.first()
             if translation_exist:
                 translated.update({"translation": translation.translation})
+                changes.setdefault(translation.language_id, {})[editTranslation.key] = translation.translation
 
         db.commit()
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
         return ResponseDTO(200, "Translation Edited successfully", {})
     except Exception as e:
         db.rollback()
         return ResponseDTO(204, f"{str(e)}", {})
 
 
-def fetch_translation(keyId: int, languageId: int, db=Depends(get_db)):
-    fetched = db.query(models.Translation).filter(models.Translation.key_id == keyId).filter(
-        models.Translation.language_id == languageId).first()
-    if fetched:
+def batched(items, size: int):
+    """Splits an iterable into lists of at most `size` items without materialising it"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def key_upsert():
+    return insert(models.Key).on_conflict_do_nothing(
+        index_elements=[models.Key.project_id, models.Key.environment_id, models.Key.key])
+
+
+def language_upsert():
+    return insert(models.Language).on_conflict_do_nothing(
+        index_elements=[models.Language.project_id, models.Language.environment_id, models.Language.language])
+
+
+def resolve_key_ids(key_statuses: dict, db, batch_size: int = 1000, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Maps key names to ids, inserting the uncached missing keys with one statement per batch.
+    Inserted names are only cached once the caller commits, see bulk_import_translations"""
+    key_ids = {}
+    uncached = {}
+    for key, status in key_statuses.items():
+        key_id = key_id_cache.get((scope, key))
+        if key_id is None:
+            uncached[key] = status
+        else:
+            key_ids[key] = key_id
+
+    for batch in batched(uncached.items(), batch_size):
+        key_id_cache.invalidate(*((scope, key) for key, _ in batch))
+        db.execute(key_upsert(), [{"key": key, "status": status, **scope.columns()} for key, status in batch])
+        key_ids.update(db.execute(select(models.Key.key, models.Key.key_id).where(
+            scope.filter(models.Key), models.Key.key.in_([key for key, _ in batch]))).all())
+    return key_ids
+
+
+def resolve_language_ids(language_names, db, batch_size: int = 1000, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Maps language names to ids, inserting the uncached missing languages with one statement per batch"""
+    language_ids = {}
+    uncached = []
+    for language in language_names:
+        language_id = language_id_cache.get((scope, language))
+        if language_id is None:
+            uncached.append(language)
+        else:
+            language_ids[language] = language_id
+
+    for batch in batched(uncached, batch_size):
+        language_id_cache.invalidate(*((scope, language) for language in batch))
+        db.execute(language_upsert(), [{"language": language, **scope.columns()} for language in batch])
+        language_ids.update(db.execute(select(models.Language.language, models.Language.language_id).where(
+            scope.filter(models.Language), models.Language.language.in_(batch))).all())
+    return language_ids
+
+
+def cache_ids(key_ids: dict, language_ids: dict, scope: schema.Scope):
+    """Caches the ids resolved by a committed import"""
+    key_id_cache.update({(scope, key): key_id for key, key_id in key_ids.items()})
+    language_id_cache.update({(scope, language): language_id for language, language_id in language_ids.items()})
+
+
+def translation_upsert(rows=None):
+    """INSERT ... ON CONFLICT DO UPDATE for translations that leaves rows whose value is unchanged untouched,
+    so their revision does not move. Inserts the statement's parameters, or the (project_id, environment_id,
+    key_id, language_id, translation) rows of a SELECT"""
+    upsert = insert(models.Translation) if rows is None else insert(models.Translation).from_select(
+        ["project_id", "environment_id", "key_id", "language_id", "translation"], rows)
+    return upsert.on_conflict_do_update(
+        index_elements=[models.Translation.project_id, models.Translation.environment_id,
+                        models.Translation.key_id, models.Translation.language_id],
+        set_={"translation": upsert.excluded.translation, "revision": models.CURRENT_REVISION,
+              "modified_on": func.now()},
+        where=models.Translation.translation.is_distinct_from(upsert.excluded.translation))
+
+
+def bulk_import_translations(translations: List[schema.Translate], db, batch_size: int = 1000,
+                             scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Upserts many translations in batches inside a single transaction"""
+    try:
+        start = time.perf_counter()
+        key_ids = resolve_key_ids({item.key: item.status for item in translations}, db, batch_size, scope)
+        language_ids = resolve_language_ids(
+            {translation.language for item in translations for translation in item.translations}, db, batch_size,
+            scope)
+
+        # ON CONFLICT may touch a row only once per statement, so the last value of a pair wins
+        values = {}
+        changes = {}
+        for item in translations:
+            for translation in item.translations:
+                language_id = language_ids[translation.language]
+                values[(key_ids[item.key], language_id)] = translation.translation
+                changes.setdefault(language_id, {})[item.key] = translation.translation
+
+        upsert = translation_upsert()
+        for batch in batched(values.items(), batch_size):
+            db.execute(upsert, [{"key_id": key_id, "language_id": language_id, "translation": translation,
+                                 **scope.columns()} for (key_id, language_id), translation in batch])
+        db.commit()
+        cache_ids(key_ids, language_ids, scope)
+        bundle_store.apply(changes, scope)
+        response_cache.invalidate(scope)
+
+        elapsed = time.perf_counter() - start
+        return ResponseDTO(200, "Translations imported successfully",
+                           {"keys": len(key_ids), "languages": len(language_ids), "rows": len(values),
+                            "seconds": round(elapsed, 3), "rows_per_second": round(len(values) / elapsed, 1)})
+    except Exception as e:
+        db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+def fetch_translation(keyId: int, languageId: int, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Value of a key in a language, taken down the language's fallback chain when it has none of its own"""
+    key = select(models.Key.key_id, models.Key.key).where(models.Key.key_id == keyId).subquery()
+    fetched = db.execute(resolved_keys_query(languageId, key, scope)).first()
+    if fetched and fetched.translation is not None:
         return fetched.translation
     else:
         return ""
 
 
-def fetch_language_keys(languageId: int, db=Depends(get_db)):
-    keys = db.query(models.Key).all()
-    language_keys = []
-    for key in keys:
-        language_keys.append({
-            "key": key.key,
-            "value": fetch_translation(key.key_id, languageId, db)})
+def key_page_query(scope: schema.Scope = schema.GLOBAL_SCOPE, page: schema.KeyPage = schema.FIRST_PAGE,
+                   filters: schema.KeyFilter = schema.NO_FILTER):
+    """(key_id, key) of the catalog's keys that pass the filters, in key_id order from the page cursor on"""
+    query = select(models.Key.key_id, models.Key.key).where(scope.filter(models.Key))
+    if filters.prefix:
+        query = query.where(models.Key.key.startswith(filters.prefix, autoescape=True))
+    if filters.status is not None:
+        query = query.where(models.Key.status == filters.status)
+    if filters.missingIn is not None:
+        query = query.where(~exists().where(
+            scope.filter(models.Translation), models.Translation.key_id == models.Key.key_id,
+            models.Translation.language_id == filters.missingIn, models.Translation.translation != ""))
+    if page.cursor is not None:
+        query = query.where(models.Key.key_id > page.cursor)
+    query = query.order_by(models.Key.key_id)
+    if page.limit:
+        query = query.limit(page.limit)
+    return query
+
+
+def next_cursor(ids: list, page: schema.KeyPage):
+    """Cursor of the page following one holding `ids`, None when it was the last page"""
+    return ids[-1] if page.limit and len(ids) == page.limit else None
+
+
+def language_keys_query(languageId: int, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                        page: schema.KeyPage = schema.FIRST_PAGE, filters: schema.KeyFilter = schema.NO_FILTER):
+    """(key_id, key, translation, resolved_language_id) of a page of keys with their value in the given language
+    or down its fallback chain, NULL when no language of the chain has one"""
+    return resolved_keys_query(languageId, key_page_query(scope, page, filters).subquery(), scope)
+
+
+def language_key_item(row):
+    _, key, value, resolved_language_id = row
+    return {"key": key, "value": value if value is not None else "", "resolved_language_id": resolved_language_id}
+
+
+def fetch_language_keys(languageId: int, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE,
+                        page: schema.KeyPage = schema.FIRST_PAGE, filters: schema.KeyFilter = schema.NO_FILTER):
+    rows = db.execute(language_keys_query(languageId, scope, page, filters)).all()
+    language_keys = [language_key_item(row) for row in rows]
+
+    return PageDTO(200, "Keys fetched successfully", language_keys, next_cursor([row[0] for row in rows], page))
+
+
+def fetch_language_bundle(languageId: int, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Compiled key -> value bundle of a language; only builds it from the database on a cache miss"""
+    return bundle_store.get(languageId, db, scope)
+
+
+def fallback_update(languageId: int, fallbackLanguageId: int | None, chain: list, scope: schema.Scope):
+    """The UPDATE setting a language's fallback, or the error message when it is not allowed. `chain` is the
+    fallback chain of fallbackLanguageId"""
+    if fallbackLanguageId is not None:
+        if not chain:
+            return None, "Fallback language not found"
+        if languageId in chain:
+            return None, "Fallback would create a cycle"
+        if len(chain) >= MAX_FALLBACK_DEPTH:
+            return None, f"Fallback chains are limited to {MAX_FALLBACK_DEPTH} languages"
+    return update(models.Language).where(models.Language.language_id == languageId,
+                                         scope.filter(models.Language)).values(
+        fallback_language_id=fallbackLanguageId), None
+
+
+def fallback_chain_ids(language_id: int | None, db, scope: schema.Scope):
+    """Ids of the chain of a language of the catalog, empty when there is no such language"""
+    if language_id is None or db.scalar(select(models.Language.language_id).where(
+            models.Language.language_id == language_id, scope.filter(models.Language))) is None:
+        return []
+    return db.scalars(chain_query(language_id, scope)).all()
+
+
+def set_language_fallback(languageId: int, fallbackLanguageId: int | None, db=Depends(get_db),
+                          scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Makes missing translations of a language resolve to fallbackLanguageId (and on down its chain); None
+    removes the fallback"""
+    try:
+        statement, error = fallback_update(languageId, fallbackLanguageId,
+                                           fallback_chain_ids(fallbackLanguageId, db, scope), scope)
+        if error:
+            return ResponseDTO(400, error, {})
+        if not db.execute(statement).rowcount:
+            return ResponseDTO(404, "Language not found", {})
+        db.commit()
+        bundle_store.invalidate(languageId)
+        response_cache.invalidate(scope)
+        return ResponseDTO(200, "Fallback language set successfully",
+                           {"language_id": languageId, "chain": db.scalars(chain_query(languageId, scope)).all()})
+    except Exception as e:
+        db.rollback()
+        return ResponseDTO(204, f"{str(e)}", {})
+
+
+def fetch_language_coverage(db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE,
+                            languageIds: List[int] | None = None):
+    """Share of keys each language translates itself, gets from a fallback, or misses. Counted while resolving
+    the language's bundle, so bundles that are already compiled cost nothing"""
+    report = []
+    for language_id, language in db.execute(languages_query(scope, languageIds)).all():
+        report.append({**bundle_store.get(language_id, db, scope).coverage(), "language": language})
+    return ResponseDTO(200, "Coverage fetched successfully", report)
+
+
+def translation_changes_query(since: int, high_water: int, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                              languageId: int | None = None):
+    """Translations of the catalog written by transactions in [since, high_water), oldest first"""
+    query = select(models.Translation.key_id, models.Key.key, models.Translation.language_id,
+                   models.Language.language, models.Translation.translation, models.Translation.revision) \
+        .join(models.Key, models.Key.key_id == models.Translation.key_id) \
+        .join(models.Language, models.Language.language_id == models.Translation.language_id) \
+        .where(scope.filter(models.Translation), models.Translation.revision >= since,
+               models.Translation.revision < high_water) \
+        .order_by(models.Translation.revision, models.Translation.translation_id)
+    if languageId is not None:
+        query = query.where(models.Translation.language_id == languageId)
+    return query
+
+
+def fetch_translation_changes(since: int, languageId: int | None = None, db=Depends(get_db),
+                              scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Rows changed since a revision, plus the revision the client passes as `since` on its next sync"""
+    high_water = db.scalar(select(models.SAFE_REVISION))
+    changes = [row._asdict() for row in db.execute(translation_changes_query(since, high_water, scope, languageId))]
+
+    return ResponseDTO(200, "Changes fetched successfully", {"revision": high_water, "changes": changes})
+
+
+def translation_pivot_query(scope: schema.Scope = schema.GLOBAL_SCOPE, page: schema.KeyPage = schema.FIRST_PAGE,
+                            filters: schema.KeyFilter = schema.NO_FILTER, languageIds: List[int] | None = None):
+    """A page of keys left-joined to their translations (in languageIds only, when given), ordered so that the
+    rows of a key are contiguous"""
+    keys = key_page_query(scope, page, filters).subquery()
+    joined = (models.Translation.key_id == keys.c.key_id) & scope.filter(models.Translation)
+    if languageIds:
+        joined &= models.Translation.language_id.in_(languageIds)
+    return select(keys.c.key_id, keys.c.key, models.Translation.language_id,
+                  models.Translation.translation).select_from(keys).outerjoin(
+        models.Translation, joined).order_by(keys.c.key_id)
+
+
+def pivot_translations(rows, languages):
+    """Folds (key_id, key, language_id, translation) rows into one {id, key, <language>: value} dict per key"""
+    language_names = {language_id: language for language_id, language in languages}
+    blank = dict.fromkeys(language_names.values(), "")
+
+    current = None
+    for key_id, key, language_id, translation in rows:
+        if current is None or current["id"] != key_id:
+            if current is not None:
+                yield current
+            current = {"id": key_id, "key": key, **blank}
+        if language_id in language_names:
+            current[language_names[language_id]] = translation
+
+    if current is not None:
+        yield current
+
+
+def languages_query(scope: schema.Scope = schema.GLOBAL_SCOPE, languageIds: List[int] | None = None):
+    query = select(models.Language.language_id, models.Language.language).where(
+        scope.filter(models.Language)).order_by(models.Language.language_id)
+    if languageIds:
+        query = query.where(models.Language.language_id.in_(languageIds))
+    return query
+
+
+def fetch_all_translation(db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE,
+                          page: schema.KeyPage = schema.FIRST_PAGE, filters: schema.KeyFilter = schema.NO_FILTER,
+                          languageIds: List[int] | None = None):
+    available_languages = db.execute(languages_query(scope, languageIds)).all()
+    rows = db.execute(translation_pivot_query(scope, page, filters, languageIds))
+
+    formatted_translations_list = list(pivot_translations(rows, available_languages))
+    return PageDTO(200, "Translations fetched successfully", formatted_translations_list,
+                   next_cursor([item["id"] for item in formatted_translations_list], page))
+
+
+def language_page_query(scope: schema.Scope = schema.GLOBAL_SCOPE, page: schema.KeyPage = schema.FIRST_PAGE):
+    """Rows of the language columns rather than Language instances, which the response encodes as they are"""
+    query = select(*models.Language.__table__.columns).where(scope.filter(models.Language)).order_by(models.Language.language_id)
+    if page.cursor is not None:
+        query = query.where(models.Language.language_id > page.cursor)
+    if page.limit:
+        query = query.limit(page.limit)
+    return query
+
+
+def fetch_all_language(db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE,
+                       page: schema.KeyPage = schema.FIRST_PAGE):
+    languages = db.execute(language_page_query(scope, page)).all()
+    return PageDTO(200, "Languages fetched successfully", languages,
+                   next_cursor([language.language_id for language in languages], page))
+
+
+"""----------------------------------------------Streaming exports-------------------------------------------------------------------"""
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def stream_prefix(output_format: str, message: str):
+    return b'{"status":200,"message":' + orjson.dumps(message) + b',"data":[' if output_format == "json" else b""
+
+
+def stream_suffix(output_format: str):
+    return b"]}" if output_format == "json" else b""
+
+
+def encode_chunk(chunk, output_format: str, first: bool):
+    """Encodes one chunk of items as NDJSON lines or as comma separated JSON array elements"""
+    if output_format == "json":
+        return (b"" if first else b",") + b",".join(orjson.dumps(item) for item in chunk)
+    return b"".join(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE) for item in chunk)
+
 
-    return ResponseDTO(200, "Keys fetched successfully", language_keys)
+def encode_stream(items, output_format: str, message: str, chunk_rows: int = 1000):
+    """Encodes items as NDJSON lines or as an incrementally written ResponseDTO-shaped JSON document,
+    yielding one bytes chunk per `chunk_rows` items"""
+    yield stream_prefix(output_format, message)
+    for index, chunk in enumerate(batched(items, chunk_rows)):
+        yield encode_chunk(chunk, output_format, index == 0)
+    yield stream_suffix(output_format)
 
 
-def fetch_all_translation(db=Depends(get_db)):
-    available_languages = db.query(models.Language).all()
-    available_keys = db.query(models.Key).all()
+def stream_all_translation(output_format: str = "ndjson", chunk_rows: int = 1000,
+                           scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Streams the translation catalog through a server-side cursor. The session is owned by the generator
+    because FastAPI closes yield-dependencies before a StreamingResponse body is sent"""
+    with SessionLocal() as db:
+        available_languages = db.execute(languages_query(scope)).all()
+        rows = db.execute(translation_pivot_query(scope).execution_options(yield_per=chunk_rows))
 
-    formatted_translations = {}
+        yield from encode_stream(pivot_translations(rows, available_languages), output_format,
+                                 "Translations fetched successfully", chunk_rows)
 
-    for key in available_keys:
-        key_id = key.key_id
-        if key_id not in formatted_translations:
-            formatted_translations[key_id] = {
-                "id": key_id,
-                "key": key.key}
 
-        for available_language in available_languages:
-            formatted_translations[key_id][available_language.language] = fetch_translation(key_id,
-                                                                                            available_language.language_id,
-                                                                                            db)
+def stream_language_keys(languageId: int, output_format: str = "ndjson", chunk_rows: int = 1000,
+                         scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Streams the keys of a language and their values through a server-side cursor"""
+    with SessionLocal() as db:
+        rows = db.execute(language_keys_query(languageId, scope).execution_options(yield_per=chunk_rows))
+        language_keys = (language_key_item(row) for row in rows)
 
-    formatted_translations_list = list(formatted_translations.values())
-    return ResponseDTO(200, "Translations fetched successfully", formatted_translations_list)
+        yield from encode_stream(language_keys, output_format, "Keys fetched successfully", chunk_rows)
@@ -24,7 +24,8 @@ def add_branch_to_ucb(new_branch, user_id, project_id, db):
             db.commit()
         elif env.environment_id != new_branch.environment_id:
             new_branch_in_ucb = models.UserProjectEnv(user_id=user_id, project_id=project_id,
-                                                      environment_id=new_branch.environment_id, role=["OWNER"])
+                                                      environment_id=new_branch.environment_id,
+                                                      roles=[models.RolesEnum.ADMIN])
             db.add(new_branch_in_ucb)
             db.commit()
     except Exception as exc:
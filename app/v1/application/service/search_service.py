@@ -0,0 +1,57 @@
+"""Service layer for searchTranslations: substring, fuzzy (pg_trgm) and full-text matches, ranked"""
+from fastapi import Depends
+from sqlalchemy import select, func, or_, union, literal_column
+
+from app.infrastructure.database import get_db
+from app.v1.application.dto.dto_classes import PageDTO
+from app.v1.domain import models, schema
+
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def like_pattern(text: str):
+    """'%text%' with LIKE wildcards in text escaped"""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_query(search: schema.SearchQuery, scope: schema.Scope = schema.GLOBAL_SCOPE):
+    """Translations whose key or value contains the search text, is similar to it or shares words with it,
+    best matches first. Each branch of the union is answered from one of the trigram or full-text indexes"""
+    pattern = like_pattern(search.q)
+    document = models.search_vector(models.Translation.translation)
+    terms = func.plainto_tsquery(SEARCH_CONFIG, search.q)
+
+    key_hits = select(models.Translation.translation_id).join(
+        models.Key, models.Key.key_id == models.Translation.key_id).where(
+        scope.filter(models.Key), scope.filter(models.Translation),
+        or_(models.Key.key.ilike(pattern, escape="\\"), models.Key.key.op("%>")(search.q)))
+    value_hits = select(models.Translation.translation_id).where(
+        scope.filter(models.Translation),
+        or_(models.Translation.translation.ilike(pattern, escape="\\"),
+            models.Translation.translation.op("%>")(search.q), document.op("@@")(terms)))
+    if search.languageId is not None:
+        key_hits = key_hits.where(models.Translation.language_id == search.languageId)
+        value_hits = value_hits.where(models.Translation.language_id == search.languageId)
+    hits = union(key_hits, value_hits).subquery()
+
+    score = (func.greatest(func.similarity(models.Key.key, search.q),
+                           func.word_similarity(search.q, models.Translation.translation))
+             + func.ts_rank(document, terms)).label("score")
+    return select(models.Translation.key_id, models.Key.key, models.Translation.language_id,
+                  models.Language.language, models.Translation.translation, score) \
+        .join(hits, hits.c.translation_id == models.Translation.translation_id) \
+        .join(models.Key, models.Key.key_id == models.Translation.key_id) \
+        .join(models.Language, models.Language.language_id == models.Translation.language_id) \
+        .where(scope.filter(models.Translation)) \
+        .order_by(score.desc(), models.Translation.translation_id) \
+        .offset(search.cursor).limit(search.limit)
+
+
+def search_page(rows, search: schema.SearchQuery):
+    matches = [row._asdict() for row in rows]
+    next_cursor = search.cursor + len(matches) if len(matches) == search.limit else None
+    return PageDTO(200, "Search results fetched successfully", matches, next_cursor)
+
+
+def search_translations(search: schema.SearchQuery, db=Depends(get_db), scope: schema.Scope = schema.GLOBAL_SCOPE):
+    return search_page(db.execute(search_query(search, scope)), search)
@@ -1,80 +1,100 @@
 import random
-import smtplib
 import string
 
-from fastapi import Depends
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 
-from app.infrastructure.database import get_db
 from app.v1.application.dto.dto_classes import ResponseDTO
-from app.v1.application.password_handler.pwd_encrypt_decrypt import verify, hash_pwd
+from app.v1.application.mail.outbox import queue_email, outbox_sender
+from app.v1.application.password_handler.pwd_encrypt_decrypt import needs_rehash, verify_async, hash_pwd_async
 from app.v1.domain import models, schema
 
 
-def get_projects(ucb, db):
+def user_projects_query(user_id):
+    """Projects a user belongs to, outer-joined to their environments"""
+    user_project_ids = select(models.UserProjectEnv.project_id).where(models.UserProjectEnv.user_id == user_id)
+    return select(models.Projects.project_id, models.Projects.project_name, models.Projects.project_logo,
+                  models.Environments.environment_id, models.Environments.environment_name) \
+        .outerjoin(models.Environments, models.Environments.project_id == models.Projects.project_id) \
+        .where(models.Projects.project_id.in_(user_project_ids)) \
+        .order_by(models.Projects.project_id, models.Environments.environment_id)
+
+
+def group_projects(rows):
+    """Nests the environment rows of user_projects_query under their project"""
+    projects = {}
+    for project_id, project_name, project_logo, environment_id, environment_name in rows:
+        project = projects.setdefault(project_id, {"project_id": project_id,
+                                                   "project_name": project_name,
+                                                   "project_logo": project_logo,
+                                                   "env": []})
+        if environment_id is not None:
+            project["env"].append({"environment_id": environment_id,
+                                   "environment_name": environment_name})
+    return list(projects.values())
+
+
+def get_projects(user_id, db):
+    """Fetches the projects of a user together with their environments in a single query"""
     try:
-        projects = []
-        for user_project in ucb:
-            proj = db.query(models.Projects).filter(models.Projects.project_id == user_project.project_id).all()
-            if proj:
-                for project in proj:
-                    env = db.query(models.Environments).filter(
-                        models.Environments.project_id == project.project_id).all()
-                    projects.append({"project_id": project.project_id,
-                                     "project_name": project.project_name,
-                                     "project_logo": project.project_logo,
-                                     "env": get_environments(project.project_id, db)})
-
-            return projects
+        return group_projects(db.execute(user_projects_query(user_id)))
 
     except Exception as exc:
         return ResponseDTO(204, str(exc), {})
 
 
-def get_environments(project_id, db):
-    environments = []
-    env = db.query(models.Environments).filter(
-        models.Environments.project_id == project_id).all()
-    if env:
-        for environment in env:
-            environments.append({"environment_id": environment.environment_id,
-                                 "environment_name": environment.environment_name})
-    return environments
+# The routes that hash passwords are async functions: their queries run in the threadpool and bcrypt is awaited,
+# so that a burst of logins holds neither threadpool threads nor pooled connections while the hashes are computed.
 
 
-def auth_function(credentials: schema.Credentials, db=Depends(get_db)):
-    try:
-        email = credentials.email
-        pwd = credentials.password
+def find_credentials(email, db):
+    """(user_id, password, change_password_token) of a user, None when there is none. Ends the transaction, so
+    that the session gives its connection back to the pool before the password is hashed"""
+    row = db.execute(select(models.UsersAuth.user_id, models.UsersAuth.password,
+                            models.UsersAuth.change_password_token)
+                     .where(models.UsersAuth.user_email == email)).first()
+    db.rollback()
+    return row
+
+
+def update_user(user_id, db, **values):
+    db.query(models.UsersAuth).filter(models.UsersAuth.user_id == user_id).update(values)
+    db.commit()
+
 
-        is_user_present = db.query(models.UsersAuth).filter(models.UsersAuth.user_email == email).first()
+async def auth_function_async(credentials: schema.Credentials, db):
+    try:
+        user = await run_in_threadpool(find_credentials, credentials.email, db)
 
-        if is_user_present is None:
+        if user is None:
             return ResponseDTO(404, "User is not registered, please register.", {})
 
-        if is_user_present.password is None:
+        if user.password is None:
             return ResponseDTO(404, "Password is not set yet. Please set your password", {})
 
-        if not verify(pwd, is_user_present.password):
+        if not await verify_async(credentials.password, user.password):
             return ResponseDTO(401, "Password Incorrect!", {})
 
-        user_details = db.query(models.UserDetails).filter(
-            models.UserDetails.user_id == is_user_present.user_id).first()
-
-        user_projects = db.query(models.UserProjectEnv).filter(
-            models.UserProjectEnv.user_id == is_user_present.user_id).all()
-        if user_projects:
-            projects = get_projects(user_projects, db)
-        else:
-            projects = []
+        if needs_rehash(user.password):
+            await run_in_threadpool(update_user, user.user_id, db,
+                                    password=await hash_pwd_async(credentials.password))
 
-        return ResponseDTO(200, "Login successful",
-                           schema.LoginResponse(user_id=is_user_present.user_id,
-                                                name=user_details.user_name, projects=projects))
+        return await run_in_threadpool(login_response, user.user_id, db)
 
     except Exception as exc:
         return ResponseDTO(204, str(exc), {})
 
 
+def login_response(user_id, db):
+    """Loads the details and projects of a user whose password was checked"""
+    user_details = db.query(models.UserDetails).filter(models.UserDetails.user_id == user_id).first()
+
+    projects = get_projects(user_id, db)
+
+    return ResponseDTO(200, "Login successful",
+                       schema.LoginResponse(user_id=user_id, name=user_details.user_name, projects=projects))
+
+
 def add_owner_to_ucb(new_user, db):
     """Adds the data mapped to a user into db"""
     try:
@@ -93,16 +113,16 @@ def add_user_details(user: schema.AddUser, user_id, db):
         return ResponseDTO(204, str(exc), {})
 
 
-def add_user(user: schema.AddUser, db):
+async def add_user_async(user: schema.AddUser, db):
     """Adds a user into the database"""
-    # try:
-    user_email_exists = db.query(models.UsersAuth).filter(
-        models.UsersAuth.user_email == user.user_email).first()
-
-    if user_email_exists:
+    if await run_in_threadpool(find_credentials, user.user_email, db):
         return ResponseDTO(403, "User with this email already exists", {})
-    hashed_pwd = hash_pwd(user.password)
-    user.password = hashed_pwd
+    user.password = await hash_pwd_async(user.password)
+    return await run_in_threadpool(store_user, user, db)
+
+
+def store_user(user: schema.AddUser, db):
+    """Adds a user whose password is already hashed into the database"""
     new_user = models.UsersAuth(user_email=user.user_email, password=user.password)
     db.add(new_user)
     db.flush()
@@ -117,42 +137,34 @@ def add_user(user: schema.AddUser, db):
                        {"user_id": new_user.user_id, "name": user.user_name, "company": []})
 
 
-# except Exception as exc:
-#     return ResponseDTO(204, str(exc), {})
-
-
 """-------------------------------Update password code starts below this line-----------------------------"""
 
 
-def check_token(obj, db):
+async def check_token_async(obj, db):
     """Verifies the reset token stored in DB, against the token entered by an individual"""
     try:
-        user = db.query(models.UsersAuth).filter(models.UsersAuth.user_email == obj.email).first()
+        user = await run_in_threadpool(find_credentials, obj.email, db)
         if user is None:
             return ResponseDTO(404, "User not found!", {})
-        else:
-            if user.change_password_token != obj.token:
-                return ResponseDTO(204, "Reset token doesn't match", {})
-            else:
-                return change_password(obj, db)
+        if user.change_password_token != obj.token:
+            return ResponseDTO(204, "Reset token doesn't match", {})
+        return await change_password_async(obj, db)
     except Exception as exc:
         return ResponseDTO(204, str(exc), {})
 
 
-def change_password(obj, db):
+async def change_password_async(obj, db):
     """Updates the password and makes the change_password_token null in db"""
-    user_query = db.query(models.UsersAuth).filter(models.UsersAuth.user_email == obj.model_dump()["email"])
-    user = user_query.first()
+    user = await run_in_threadpool(find_credentials, obj.email, db)
 
     if user is None:
         return ResponseDTO(404, "User with this email does not exist!", {})
 
-    if user.change_password_token != obj.model_dump()["token"]:
+    if user.change_password_token != obj.token:
         return ResponseDTO(204, "Reset token doesn't match", {})
 
-    hashed_pwd = hash_pwd(obj.model_dump()["password"])
-    user_query.update({"change_password_token": None, "password": hashed_pwd})
-    db.commit()
+    await run_in_threadpool(update_user, user.user_id, db, change_password_token=None,
+                            password=await hash_pwd_async(obj.password))
 
     return ResponseDTO(200, "Password updated successfully!", {})
 
@@ -160,60 +172,33 @@ def change_password(obj, db):
 """-------------------------------Code below this line sends the change_password_token to an individual-----------------------------"""
 
 
-def create_smtp_session(fetched_email, msg):
-    """Creates a smtp session and sends an email. The exception handling is done by the library itself"""
-    try:
-        s = smtplib.SMTP('smtp.gmail.com', 587)
-        s.starttls()
-
-        # Authentication
-        s.login("aditi.diwan005@gmail.com", "odxfrxoyfcgzwsks")
-
-        s.sendmail("aditi.diwan005@gmail.com", fetched_email, msg)
-
-        s.quit()
-
-    except Exception as exc:
-        return ResponseDTO(204, str(exc), {})
-
-
-def temporarily_add_token(reset_code, fetched_email, db):
-    """Temporarily stores the reset code in DB"""
-    try:
-        user_query = db.query(models.UsersAuth).filter(models.UsersAuth.user_email == fetched_email)
-
-        user_query.update({"change_password_token": reset_code})
-        db.commit()
-        create_smtp_session(fetched_email, reset_code)
-
-    except Exception as exc:
-        return ResponseDTO(204, str(exc), {})
-
-
-def create_password_reset_code(fetched_email, db):
+def create_password_reset_code():
     """Creates a 6 digit reset code"""
-    try:
-        code_length = 6
-        reset_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=code_length))
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
-        temporarily_add_token(reset_code, fetched_email, db)
-        return reset_code
 
-    except Exception as exc:
-        return ResponseDTO(204, str(exc), {})
+def queue_reset_code_email(fetched_email, reset_code, db):
+    """Queues the email carrying the reset code in the caller's transaction"""
+    queue_email(db, fetched_email, "Your mlingo password reset code",
+                f"Your password reset code is {reset_code}.\n\nIf you did not ask to reset your password, "
+                f"you can ignore this email.")
 
 
 def initiate_pwd_reset(email, db):
-    """Fetches the user who has requested for password reset and calls a method to create a smtp session"""
+    """Stores a reset code for the user who has requested a password reset and queues the email carrying it;
+    the outbox sender delivers it in the background"""
     try:
         fetched_user = db.query(models.UsersAuth).filter(models.UsersAuth.user_email == email).first()
-        if fetched_user:
-            fetched_email = fetched_user.user_email
-            create_password_reset_code(fetched_email, db)
-        else:
+        if fetched_user is None:
             return ResponseDTO(404, "User not found", {})
 
-        return ResponseDTO(200, "Email sent successfully", {})
+        reset_code = create_password_reset_code()
+        fetched_user.change_password_token = reset_code
+        queue_reset_code_email(fetched_user.user_email, reset_code, db)
+        db.commit()
+        outbox_sender.wake()
+
+        return ResponseDTO(200, "Email queued successfully", {})
 
     except Exception as exc:
         return ResponseDTO(204, str(exc), {})
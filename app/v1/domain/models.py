@@ -2,7 +2,7 @@
 
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, String, BIGINT, Integer, Enum, ForeignKey
+from sqlalchemy import Column, String, BIGINT, Integer, Enum, ForeignKey, Index, cast, func, literal_column
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import TIMESTAMP, ARRAY, Boolean
 
@@ -42,7 +42,7 @@ class Environments(Base):
     __tablename__ = 'environments'
 
     environment_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=False, index=True)
     environment_name = Column(String, nullable=False)
     is_main = Column(Boolean, nullable=True)
     activity_status = Column(Enum(ActivityStatus), nullable=False)
@@ -71,7 +71,7 @@ class UserProjectEnv(Base):
     __tablename__ = 'user_project_env'
 
     upe_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    user_id = Column(Integer, ForeignKey("users_auth.user_id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users_auth.user_id"), nullable=False, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=True)
     environment_id = Column(Integer, ForeignKey("environments.environment_id"), nullable=True)
     roles = Column(ARRAY(Enum(RolesEnum)), nullable=True)
@@ -99,29 +99,103 @@ class KeyStatus(PyEnum):
 
 class Language(Base):
     __tablename__ = 'languages'
+    # names are unique per project and environment; NULLS NOT DISTINCT keeps them unique in the global catalog
+    __table_args__ = (Index("ux_languages_scope_language", "project_id", "environment_id", "language", unique=True,
+                            postgresql_nulls_not_distinct=True),
+                      Index("ix_languages_scope_language_id", "project_id", "environment_id", "language_id"))
 
     language_id = Column(BIGINT, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=True)
     environment_id = Column(Integer, ForeignKey("environments.environment_id"), nullable=True)
-    language = Column(String, unique=True, index=True)
+    language = Column(String)
+    # next language to try when a key has no translation in this one; see fallback_service
+    fallback_language_id = Column(BIGINT, ForeignKey("languages.language_id"), nullable=True)
 
 
 class Key(Base):
     __tablename__ = "keys"
+    __table_args__ = (Index("ux_keys_scope_key", "project_id", "environment_id", "key", unique=True,
+                            postgresql_nulls_not_distinct=True),
+                      # keyset pagination walks a catalog in key_id order
+                      Index("ix_keys_scope_key_id", "project_id", "environment_id", "key_id"),
+                      # prefix filters (LIKE 'prefix%') can only use an index built with text_pattern_ops
+                      Index("ix_keys_scope_key_pattern", "project_id", "environment_id", "key",
+                            postgresql_ops={"key": "text_pattern_ops"}),
+                      # substring and fuzzy search (pg_trgm)
+                      Index("ix_keys_key_trgm", "key", postgresql_using="gin", postgresql_ops={"key": "gin_trgm_ops"}))
 
     key_id = Column(BIGINT, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=True)
     environment_id = Column(Integer, ForeignKey("environments.environment_id"), nullable=True)
-    key = Column(String, nullable=False, unique=True)
+    key = Column(String, nullable=False)
     status = Column(Enum(KeyStatus), nullable=False)
 
 
+# Revision of a translation row: the id of the transaction that last wrote it. Every transaction id below
+# pg_snapshot_xmin(pg_current_snapshot()) belongs to a finished transaction, which makes that value a safe
+# high-water mark for delta sync: no row with a smaller revision can become visible later.
+CURRENT_REVISION = cast(cast(func.pg_current_xact_id(), String), BIGINT)
+SAFE_REVISION = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), String), BIGINT)
+
+
 class Translation(Base):
     __tablename__ = 'translations'
-
-    translation_id = Column(BIGINT, primary_key=True, index=True)
+    __table_args__ = (
+        # NULLS NOT DISTINCT (PostgreSQL 15+) so that rows outside any project or environment still collide
+        Index("ux_translations_scope_key_language", "project_id", "environment_id", "key_id", "language_id",
+              unique=True, postgresql_nulls_not_distinct=True, postgresql_include=["translation"]),
+        # covering indexes: the catalog join and the per-language listings are answered from the index alone
+        Index("ix_translations_scope_language_key", "project_id", "environment_id", "language_id", "key_id",
+              postgresql_include=["translation"]),
+        Index("ix_translations_scope_revision", "project_id", "environment_id", "revision"),
+        Index("ix_translations_translation_id", "translation_id"),
+        Index("ix_translations_translation_trgm", "translation", postgresql_using="gin",
+              postgresql_ops={"translation": "gin_trgm_ops"}),
+        # one partition per slice of projects, so that a project's queries only touch its own partition
+        {"postgresql_partition_by": "HASH (project_id)"},
+    )
+
+    # the primary key of the mapping only: a partitioned table cannot have a primary key without project_id,
+    # which is nullable; rows are unique on ux_translations_scope_key_language instead
+    translation_id = Column(BIGINT, primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=True)
     environment_id = Column(Integer, ForeignKey("environments.environment_id"), nullable=True)
-    key_id = Column(BIGINT, ForeignKey('keys.key_id'), index=True)
-    language_id = Column(BIGINT, ForeignKey('languages.language_id'), index=True)
+    key_id = Column(BIGINT, ForeignKey('keys.key_id'))
+    language_id = Column(BIGINT, ForeignKey('languages.language_id'))
     translation = Column(String)
+    revision = Column(BIGINT, nullable=False, server_default=text("pg_current_xact_id()::text::bigint"),
+                      onupdate=CURRENT_REVISION)
+    modified_on = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=func.now())
+
+
+def search_vector(column):
+    """Full-text document of a column. The 'simple' configuration only lowercases and splits words, as a catalog
+    mixes languages; the expression is spelled out with literals so that it matches the index in every driver"""
+    return func.to_tsvector(literal_column("'simple'::regconfig"), func.coalesce(column, literal_column("''")))
+
+
+Index("ix_translations_translation_fts", search_vector(Translation.translation), postgresql_using="gin")
+
+
+class OutboxStatus(PyEnum):
+    """States of a queued email"""
+    PENDING = 0
+    SENT = 1
+    FAILED = 2
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    # the sender's queue: pending messages in the order they are due
+    __table_args__ = (Index("ix_email_outbox_due", "next_attempt_at", postgresql_where=text("status = 'PENDING'")),)
+
+    email_id = Column(BIGINT, primary_key=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    status = Column(Enum(OutboxStatus), nullable=False, server_default=OutboxStatus.PENDING.name)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    last_error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    sent_at = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -1,8 +1,9 @@
 """Schemas for different models are written here"""
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Annotated, Literal, Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+from sqlalchemy import and_
 
 from app.v1.domain.models import KeyStatus, ActivityStatus
 
@@ -87,6 +88,95 @@ class GetProject(BaseModel):
     activity_status: Optional[ActivityStatus] = None
 
 
+class Scope(BaseModel):
+    """Project and environment a translation catalog belongs to; leaving both unset selects the global catalog"""
+    model_config = ConfigDict(frozen=True)
+
+    projectId: Optional[int] = None
+    environmentId: Optional[int] = None
+
+    def filter(self, model):
+        """WHERE clause restricting a scoped model (Key, Language or Translation) to this catalog"""
+        return and_(*(column.is_(None) if value is None else column == value
+                      for column, value in ((model.project_id, self.projectId),
+                                            (model.environment_id, self.environmentId))))
+
+    def columns(self):
+        return {"project_id": self.projectId, "environment_id": self.environmentId}
+
+
+GLOBAL_SCOPE = Scope()
+
+
+class KeyPage(BaseModel):
+    """Keyset page of a listing: at most `limit` rows with an id greater than `cursor`. Without a limit the
+    whole listing is returned"""
+    limit: Optional[int] = Field(None, ge=1, le=5000)
+    cursor: Optional[int] = None
+
+
+def parse_key_status(value):
+    """Query strings arrive as text: accepts a status by value ("1") or by name ("PUBLISHED")"""
+    if isinstance(value, str):
+        return int(value) if value.isdigit() else KeyStatus.__members__.get(value.upper(), value)
+    return value
+
+
+KeyStatusParam = Annotated[KeyStatus, BeforeValidator(parse_key_status)]
+
+
+class KeyFilter(BaseModel):
+    """Optional filters on the keys of a listing"""
+    prefix: Optional[str] = None
+    status: Optional[KeyStatusParam] = None
+    # language id; keeps only keys without a non-empty translation in that language
+    missingIn: Optional[int] = None
+
+
+class SearchQuery(BaseModel):
+    """Ranked search over key names and translation values. Results are paged by rank: `cursor` is the number
+    of results already returned, as handed out in next_cursor"""
+    q: str = Field(min_length=2, max_length=200)
+    languageId: Optional[int] = None
+    limit: int = Field(20, ge=1, le=100)
+    cursor: int = Field(0, ge=0, le=1000)
+
+
+# catalog file formats of the export and import pipelines
+ExportFormat = Literal["json", "po", "mo", "xliff", "android", "ios", "arb"]
+
+
+class EnvironmentPair(BaseModel):
+    """Two environments of a project: the one whose catalog is promoted and the one it is promoted to"""
+    sourceEnvironmentId: int
+    targetEnvironmentId: int
+
+
+class Promotion(EnvironmentPair):
+    # only report the diff
+    dryRun: bool = False
+    # also delete the translations and keys of the target that the source does not have
+    prune: bool = False
+
+
+ImportFormat = Literal["json", "po", "xliff", "arb"]
+
+
+class ImportOptions(BaseModel):
+    """How a catalog file is imported. The format is taken from the file extension and the language from the
+    file itself (PO header, XLIFF target language, ARB @@locale) when they are not given"""
+    format: Optional[ImportFormat] = None
+    language: Optional[str] = None
+    # status of the keys the import creates
+    status: KeyStatusParam = KeyStatus.PUBLISHED
+    # only report what would change
+    dryRun: bool = False
+
+
+FIRST_PAGE = KeyPage()
+NO_FILTER = KeyFilter()
+
+
 class Language(BaseModel):
     language_id: Optional[int] | None = None
     language: str
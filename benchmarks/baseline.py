@@ -0,0 +1,83 @@
+"""Stored benchmark results, so that a run can be compared with an earlier one on the same machine.
+
+A result is a dict of scenario -> metrics. `--save-baseline` writes it to benchmarks/baselines/<name>.json and
+`--compare` reports every metric that got worse than the stored one by more than the tolerance, exiting with
+status 1 when there is one."""
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+from app.infrastructure.settings import settings
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+# metrics where a larger value is an improvement; the others (latencies, queries) are better lower
+HIGHER_IS_BETTER = {"rps"}
+# latency differences below this many milliseconds are scheduling noise, whatever the ratio
+NOISE_MS = 5.0
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare this run with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="fraction by which a metric may be worse than the baseline, default 0.5")
+
+
+def machine():
+    """What the numbers depend on besides the code; a baseline is only meaningful on a matching machine"""
+    return {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform(),
+            "bcrypt_rounds": settings.bcrypt_rounds}
+
+
+def save_baseline(name: str, parameters: dict, results: dict):
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    path.write_text(json.dumps({"machine": machine(), "parameters": parameters, "results": results}, indent=2,
+                               sort_keys=True) + "\n")
+    return path
+
+
+def load_baseline(name: str):
+    path = BASELINE_DIR / f"{name}.json"
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def regressions(results: dict, baseline: dict, tolerance: float):
+    """(scenario, metric, baseline value, value) of every metric worse than its baseline by more than
+    tolerance, and for latencies by more than NOISE_MS too. Metrics at zero in the baseline, like the errors,
+    may not grow at all"""
+    worse = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(scenario, {}).get(metric)
+            if before is None or value is None:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                regressed = value < before * (1 - tolerance)
+            elif metric.endswith("_ms"):
+                regressed = value > before * (1 + tolerance) and value - before > NOISE_MS
+            else:
+                regressed = value > before * (1 + tolerance) if before else value > 0
+            if regressed:
+                worse.append((scenario, metric, before, value))
+    return worse
+
+
+def finish(name: str, parameters: dict, results: dict, args):
+    """Saves or compares the results as the command line asked"""
+    if args.save_baseline:
+        print(f"baseline saved to {save_baseline(name, parameters, results)}")
+    if not args.compare:
+        return
+    baseline = load_baseline(name)
+    if baseline is None:
+        sys.exit(f"no baseline stored for {name}, run with --save-baseline first")
+    if baseline["parameters"] != parameters or baseline["machine"] != machine():
+        print(f"warning: the baseline was taken with {baseline['parameters']} on {baseline['machine']}")
+    worse = regressions(results, baseline["results"], args.tolerance)
+    for scenario, metric, before, value in worse:
+        print(f"REGRESSION {scenario} {metric}: {before:.2f} -> {value:.2f}")
+    print(f"{len(worse)} regressions against the baseline (tolerance {args.tolerance:.0%})")
+    sys.exit(1 if worse else 0)
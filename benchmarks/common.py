@@ -0,0 +1,120 @@
+"""Helpers shared by the benchmark scripts"""
+import os
+import time
+from contextlib import contextmanager
+
+from alembic import command
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.instrumentation import instrument_engine
+from app.infrastructure.migrate import alembic_config
+from app.v1.application.password_handler.pwd_encrypt_decrypt import hash_pwd
+from app.v1.application.service.language_service import key_id_cache, language_id_cache
+from app.v1.domain import models, schema
+
+BENCH_DATABASE_URL = os.environ.get("MLINGO_BENCH_DATABASE_URL", "postgresql://postgres@localhost/mlingo_bench")
+
+
+def bench_session_factory():
+    """Migrates the benchmark database to the latest revision and returns a session factory bound to it. The
+    engine counts its statements towards instrumentation.request_stats, like the app's"""
+    engine = create_engine(BENCH_DATABASE_URL)
+    instrument_engine(engine)
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def reset_catalog(db):
+    """Removes every translation, key and language from the benchmark database"""
+    # TRUNCATE skips the per-row foreign key checks, which have no index leading with key_id or language_id
+    # to use since translations are indexed by project first
+    db.execute(text("TRUNCATE translations, keys, languages"))
+    db.commit()
+    key_id_cache.invalidate()
+    language_id_cache.invalidate()
+
+
+def vacuum_analyze(db):
+    """Gathers planner statistics for the catalog tables, as autovacuum would some time after a bulk load; a
+    freshly loaded catalog is otherwise planned as if it had a row or two"""
+    with db.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE keys, languages, translations"))
+
+
+def seed_catalog(db, key_count, language_count, fill_ratio=1.0, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                 reset=True):
+    """Seeds key_count keys and language_count languages into the catalog of scope, translating fill_ratio of
+    the grid. Returns the number of translation rows written"""
+    if reset:
+        reset_catalog(db)
+    columns = scope.columns()
+    language_ids = db.scalars(insert(models.Language).returning(models.Language.language_id),
+                              [{"language": f"lang_{index}", **columns} for index in range(language_count)]).all() \
+        if language_count else []
+    key_ids = db.scalars(insert(models.Key).returning(models.Key.key_id),
+                         [{"key": f"key_{index}", "status": models.KeyStatus.PUBLISHED, **columns}
+                          for index in range(key_count)]).all() if key_count else []
+
+    translated_languages = language_ids[:max(0, round(language_count * fill_ratio))]
+    rows = [{"key_id": key_id, "language_id": language_id, "translation": f"value {key_id}/{language_id}", **columns}
+            for key_id in key_ids for language_id in translated_languages]
+    if rows:
+        db.execute(insert(models.Translation), rows)
+    db.commit()
+    return len(rows)
+
+
+def explain(db, statement):
+    """EXPLAIN output of a statement, with its parameters inlined"""
+    compiled = statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+    return "\n".join(line for line, in db.execute(text(f"EXPLAIN {compiled}")))
+
+
+def create_projects(db, count, owner_email="bench@example.com"):
+    """Creates `count` projects owned by a benchmark user and returns their ids"""
+    owner = db.scalar(select(models.UsersAuth.user_id).where(models.UsersAuth.user_email == owner_email)) or \
+        db.scalar(insert(models.UsersAuth).values(user_email=owner_email).returning(models.UsersAuth.user_id))
+    project_ids = db.scalars(insert(models.Projects).returning(models.Projects.project_id),
+                             [{"project_name": f"bench_{index}", "owner": owner,
+                               "activity_status": models.ActivityStatus.ACTIVE} for index in range(count)]).all()
+    db.commit()
+    return project_ids
+
+
+def create_user(db, email, password, name="Bench User"):
+    """Gives the user with this email (created if missing) a password and a name, so that it can log in, and
+    returns its id"""
+    user = db.scalar(select(models.UsersAuth).where(models.UsersAuth.user_email == email))
+    if user is None:
+        user = models.UsersAuth(user_email=email)
+        db.add(user)
+        db.flush()
+    user.password = hash_pwd(password)
+    if db.scalar(select(models.UserDetails.details_id).where(models.UserDetails.user_id == user.user_id)) is None:
+        db.add(models.UserDetails(user_id=user.user_id, user_name=name))
+    db.commit()
+    return user.user_id
+
+
+@contextmanager
+def timed(result: dict, name: str = "seconds"):
+    """Stores the wall-clock duration of the block in result[name]"""
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result[name] = time.perf_counter() - start
+
+
+def best_of(func, repeat=3):
+    """Returns the fastest of `repeat` timed calls of func"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,117 @@
+"""Synthetic translation catalogs for the benchmarks: dotted key names and per-language sentences.
+
+Load one into the benchmark database with `python -m benchmarks.datasets --keys 30000 --languages 10`, or one
+per environment of several projects with `--projects 4 --environments 2`."""
+import argparse
+import random
+
+from sqlalchemy import insert, select
+
+from benchmarks.common import bench_session_factory, reset_catalog, create_projects, vacuum_analyze
+from app.v1.application.service.language_service import batched
+from app.v1.domain import models, schema
+
+SECTIONS = ["account", "auth", "billing", "checkout", "dashboard", "errors", "home", "inbox", "onboarding",
+            "orders", "profile", "search", "settings", "support"]
+ELEMENTS = ["title", "subtitle", "button", "label", "hint", "placeholder", "tooltip", "message", "empty_state",
+            "confirm", "cancel", "description"]
+ENGLISH = ["account", "address", "again", "all", "amount", "apply", "back", "balance", "cancel", "card", "change",
+           "check", "close", "code", "confirm", "continue", "create", "delete", "details", "done", "download",
+           "edit", "email", "enter", "error", "failed", "file", "find", "forgot", "help", "history", "invalid",
+           "invoice", "items", "language", "later", "loading", "login", "logout", "message", "missing", "name",
+           "new", "next", "notification", "number", "open", "order", "password", "payment", "phone", "please",
+           "previous", "profile", "receipt", "remove", "reset", "retry", "save", "search", "select", "send",
+           "settings", "share", "sign", "something", "start", "success", "support", "try", "update", "upload",
+           "user", "verify", "welcome", "went", "wrong", "your"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vi", "zo", "an", "el", "is", "or", "un", "ba", "de", "fi",
+             "go", "hu", "ja", "ke", "li", "mo", "nu", "pa", "qi", "re", "si", "tu", "wa"]
+
+
+def language_vocabulary(rng: random.Random, size: int = 2_000):
+    """Pseudo-words built from syllables, standing in for a non-English language"""
+    return ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+def key_names(rng: random.Random, count: int):
+    return [f"{rng.choice(SECTIONS)}.{rng.choice(SECTIONS)}.{rng.choice(ELEMENTS)}_{index}" for index in range(count)]
+
+
+def sentence(rng: random.Random, vocabulary):
+    return " ".join(rng.choices(vocabulary, k=rng.randint(2, 12))).capitalize()
+
+
+def load_catalog(db, key_count: int, language_count: int, scope: schema.Scope = schema.GLOBAL_SCOPE,
+                 fill_ratio: float = 1.0, seed: int = 0, batch_size: int = 5_000):
+    """Inserts key_count keys and language_count languages ("en" first) into the catalog of scope and
+    translates fill_ratio of the grid. The catalog is the same for the same arguments. Returns the rows written"""
+    rng = random.Random(seed)
+    columns = scope.columns()
+    names = ["en"] + [f"lang_{index}" for index in range(1, language_count)]
+    language_ids = db.scalars(insert(models.Language).returning(models.Language.language_id),
+                              [{"language": name, **columns} for name in names[:language_count]]).all()
+    vocabularies = [ENGLISH] + [language_vocabulary(rng) for _ in language_ids[1:]]
+
+    rows = 0
+    for batch in batched(key_names(rng, key_count), batch_size):
+        key_ids = db.scalars(insert(models.Key).returning(models.Key.key_id),
+                             [{"key": key, "status": models.KeyStatus.PUBLISHED, **columns} for key in batch]).all()
+        translations = [{"key_id": key_id, "language_id": language_id, "translation": sentence(rng, vocabulary),
+                         **columns}
+                        for key_id in key_ids for language_id, vocabulary in zip(language_ids, vocabularies)
+                        if rng.random() < fill_ratio]
+        if translations:
+            db.execute(insert(models.Translation), translations)
+        rows += len(translations)
+    db.commit()
+    return rows
+
+
+def seed_tenants(db, project_count: int, environment_count: int, key_count: int, language_count: int,
+                 fill_ratio: float = 1.0, seed: int = 0, owner_email: str = "bench@example.com"):
+    """Creates project_count projects of environment_count environments each and loads a catalog into every
+    environment, each from its own seed. The owner is made a member of the projects, so that they come with the
+    owner's login, and the tables analyzed. Returns the scopes of the catalogs and the translation rows written"""
+    scopes = []
+    project_ids = create_projects(db, project_count, owner_email)
+    owner = db.scalar(select(models.UsersAuth.user_id).where(models.UsersAuth.user_email == owner_email))
+    db.execute(insert(models.UserProjectEnv), [{"user_id": owner, "project_id": project_id}
+                                               for project_id in project_ids])
+    for project_id in project_ids:
+        environment_ids = db.scalars(insert(models.Environments).returning(models.Environments.environment_id), [
+            {"project_id": project_id, "environment_name": f"env_{index}",
+             "activity_status": models.ActivityStatus.ACTIVE} for index in range(environment_count)]).all()
+        scopes += [schema.Scope(projectId=project_id, environmentId=environment_id)
+                   for environment_id in environment_ids]
+    db.commit()
+    rows = sum(load_catalog(db, key_count, language_count, scope, fill_ratio, seed + index)
+               for index, scope in enumerate(scopes))
+    vacuum_analyze(db)
+    return scopes, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=30_000)
+    parser.add_argument("--languages", type=int, default=10)
+    parser.add_argument("--fill-ratio", type=float, default=1.0)
+    parser.add_argument("--project-id", type=int, default=None)
+    parser.add_argument("--projects", type=int, default=0, help="create this many projects, one catalog per "
+                                                                  "environment, instead of loading one catalog")
+    parser.add_argument("--environments", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        reset_catalog(db)
+        if args.projects:
+            scopes, rows = seed_tenants(db, args.projects, args.environments, args.keys, args.languages,
+                                        args.fill_ratio, args.seed)
+        else:
+            scopes = [schema.Scope(projectId=args.project_id)]
+            rows = load_catalog(db, args.keys, args.languages, scopes[0], args.fill_ratio, args.seed)
+    print(f"loaded {len(scopes)} catalogs of {args.keys} keys and {args.languages} languages, {rows} translations")
+
+
+if __name__ == "__main__":
+    main()
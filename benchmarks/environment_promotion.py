@@ -0,0 +1,67 @@
+"""Times diffing and promoting a 100k string catalog between two environments of a project: the first promotion
+into an empty environment, a re-promotion after 1% of the strings changed, a no-op one, and one with pruning.
+
+Run with `python -m benchmarks.environment_promotion` against a database named by MLINGO_BENCH_DATABASE_URL."""
+import time
+
+from sqlalchemy import insert, update, delete, select
+
+from benchmarks.common import bench_session_factory, create_projects, reset_catalog
+from benchmarks.datasets import load_catalog
+from app.v1.application.service.environment_service import fetch_environment_diff, promote_environment
+from app.v1.domain import models, schema
+
+KEYS = 20_000
+LANGUAGES = 5
+
+
+def timed_call(func, *args):
+    start = time.perf_counter()
+    response = func(*args)
+    assert response.status == 200, response.message
+    return time.perf_counter() - start, response.data
+
+
+def main():
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        reset_catalog(db)
+        project_id = create_projects(db, 1)[0]
+        source_id, target_id = db.scalars(insert(models.Environments).returning(models.Environments.environment_id), [
+            {"project_id": project_id, "environment_name": name, "activity_status": models.ActivityStatus.ACTIVE}
+            for name in ("staging", "production")]).all()
+        db.commit()
+        source = schema.Scope(projectId=project_id, environmentId=source_id)
+        rows = load_catalog(db, KEYS, LANGUAGES, source)
+        promotion = schema.Promotion(sourceEnvironmentId=source_id, targetEnvironmentId=target_id)
+        print(f"{rows} translations in the source environment")
+        print(f"{'step':<28} {'seconds':>8}  result")
+
+        def step(name, func, *args):
+            seconds, data = timed_call(func, *args)
+            data.pop("entries", None)
+            print(f"{name:<28} {seconds:>8.2f}  {data}")
+
+        step("diff (empty target)", fetch_environment_diff, project_id, promotion, db)
+        step("promote", promote_environment, project_id, promotion, db)
+
+        changed = select(models.Translation.translation_id).where(source.filter(models.Translation)) \
+            .limit(rows // 100).scalar_subquery()
+        db.execute(update(models.Translation).where(models.Translation.translation_id.in_(changed))
+                   .values(translation=models.Translation.translation + " (edited)"))
+        db.commit()
+        step("diff (1% changed)", fetch_environment_diff, project_id, promotion, db)
+        step("promote (1% changed)", promote_environment, project_id, promotion, db)
+        step("promote (unchanged)", promote_environment, project_id, promotion, db)
+
+        removed = db.scalars(select(models.Key.key_id).where(source.filter(models.Key)).limit(KEYS // 100)).all()
+        db.execute(delete(models.Translation).where(source.filter(models.Translation),
+                                                    models.Translation.key_id.in_(removed)))
+        db.execute(delete(models.Key).where(models.Key.key_id.in_(removed)))
+        db.commit()
+        step("promote with prune", promote_environment, project_id,
+             promotion.model_copy(update={"prune": True}), db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Closed-loop HTTP load generator reporting requests/s and latency percentiles.
+
+Start the API twice, once per mode, and point the script at each:
+
+    MLINGO_DB_MODE=sync  uvicorn app.main:app --port 8001
+    MLINGO_DB_MODE=async uvicorn app.main:app --port 8002
+    python -m benchmarks.http_load http://localhost:8001 http://localhost:8002 --concurrency 64"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/v1/getAllLanguage", "/v1/getLanguageKeys?languageId=1", "/v1/getAllTranslations"]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_scenario(base_url: str, path: str, concurrency: int, duration: float):
+    """Keeps `concurrency` requests in flight against one path for `duration` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"requests": len(latencies), "errors": errors, "rps": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_urls", nargs="+")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+
+    print(f"{'target':<28} {'path':<36} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path in args.paths or DEFAULT_PATHS:
+        for base_url in args.base_urls:
+            result = await run_scenario(base_url, path, args.concurrency, args.duration)
+            print(f"{base_url:<28} {path:<36} {result['rps']:>9.1f} {result['p50_ms'] or 0:>9.1f} "
+                  f"{result['p99_ms'] or 0:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
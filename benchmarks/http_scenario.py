@@ -0,0 +1,159 @@
+"""Mixed HTTP load over the main routes (catalog reads, writes and logins) reporting throughput, p50/p99 latency
+and SQL statements per request by route, with stored baselines to catch regressions.
+
+The catalogs are generated in the database named by MLINGO_BENCH_DATABASE_URL. By default the app is served
+in process, so MLINGO_DATABASE_URL must name the same database; with --url the load goes to a running server
+instead, which has to use that database too and run a single worker, as the statement counts come from its
+/metrics:
+
+    python -m benchmarks.http_scenario --duration 20 --compare
+    MLINGO_DB_MODE=async uvicorn app.main:app --port 8002
+    python -m benchmarks.http_scenario --url http://localhost:8002"""
+import argparse
+import asyncio
+import itertools
+import random
+import re
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import delete, select
+
+from benchmarks.baseline import add_baseline_arguments, finish
+from benchmarks.common import BENCH_DATABASE_URL, bench_session_factory, reset_catalog, create_user
+from benchmarks.datasets import seed_tenants
+from benchmarks.http_load import percentile
+from app.v1.domain import models
+
+OWNER = "http-scenario@example.com"
+PASSWORD = "correct horse battery staple"
+# route -> share of the requests
+MIX = {"/v1/getAllTranslations": 40, "/v1/getLanguageKeys": 40, "/v1/addTranslation": 15,
+       "/v1/authenticateUser": 5}
+NEW_KEYS = (f"load.added.key_{index}" for index in itertools.count())
+QUERY_SAMPLE = re.compile(r'^mlingo_http_request_queries_(sum|count)\{method="\w+",route="([^"]+)"} (\S+)$', re.M)
+
+
+def seed(args):
+    """Generates the catalogs and returns (scope, language ids) of each"""
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        reset_catalog(db)
+        user_id = create_user(db, OWNER, PASSWORD)
+        db.execute(delete(models.UserProjectEnv).where(models.UserProjectEnv.user_id == user_id))
+        scopes, rows = seed_tenants(db, args.projects, args.environments, args.keys, args.languages,
+                                    owner_email=OWNER)
+        catalogs = [(scope, db.scalars(select(models.Language.language_id)
+                                       .where(scope.filter(models.Language))).all()) for scope in scopes]
+    print(f"{len(scopes)} catalogs, {rows} translations")
+    return catalogs
+
+
+def request(client, route: str, rng: random.Random, catalogs):
+    scope, language_ids = rng.choice(catalogs)
+    params = {"projectId": scope.projectId, "environmentId": scope.environmentId}
+    if route == "/v1/getAllTranslations":
+        return client.get(route, params={**params, "limit": 100})
+    if route == "/v1/getLanguageKeys":
+        return client.get(route, params={**params, "languageId": rng.choice(language_ids), "limit": 100})
+    if route == "/v1/addTranslation":
+        return client.post(route, params=params, json={"key": next(NEW_KEYS), "translations": [
+            {"language": "en", "translation": "Added by the load test"}]})
+    return client.post(route, json={"email": OWNER, "password": PASSWORD})
+
+
+async def query_totals(client):
+    """route -> [statements, requests] so far, from the app's /metrics"""
+    totals = {}
+    for kind, route, value in QUERY_SAMPLE.findall((await client.get("/metrics")).text):
+        totals.setdefault(route, [0.0, 0.0])[kind == "count"] += float(value)
+    return totals
+
+
+async def run(client, catalogs, concurrency: int, duration: float, seed_value: int):
+    latencies = {route: [] for route in MIX}
+    errors = dict.fromkeys(MIX, 0)
+    routes, weights = list(MIX), list(MIX.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker(rng):
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await request(client, route, rng, catalogs)
+                # errors are reported in the ResponseDTO status, mostly with HTTP 200
+                ok = response.status_code == 200 and response.json()["status"] == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[route].append(time.perf_counter() - start)
+            else:
+                errors[route] += 1
+
+    before = await query_totals(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed_value + index)) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await query_totals(client)
+
+    results = {}
+    for route, samples in latencies.items():
+        statements, requests = (after.get(route, [0, 0])[index] - before.get(route, [0, 0])[index]
+                                for index in (0, 1))
+        results[route] = {"rps": len(samples) / elapsed,
+                          "p50_ms": statistics.median(samples) * 1000 if samples else None,
+                          "p99_ms": percentile(samples, 0.99) * 1000 if samples else None,
+                          "queries": statements / requests if requests else None,
+                          "errors": errors[route]}
+    everything = [sample for samples in latencies.values() for sample in samples]
+    results["total"] = {"rps": len(everything) / elapsed, "p50_ms": statistics.median(everything) * 1000,
+                        "p99_ms": percentile(everything, 0.99) * 1000, "errors": sum(errors.values())}
+    return results
+
+
+def client_for(url: str | None, concurrency: int):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=concurrency))
+    from app.infrastructure.settings import settings
+    if settings.database_url != BENCH_DATABASE_URL:
+        sys.exit("serving the app in process needs MLINGO_DATABASE_URL to name the benchmark database")
+    import app.main
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app.main.app), base_url="http://bench", timeout=60)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server, instead of the app in process")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load before the measured run, to "
+                                                                "open the pool's connections and fill the caches")
+    parser.add_argument("--projects", type=int, default=2)
+    parser.add_argument("--environments", type=int, default=2)
+    parser.add_argument("--keys", type=int, default=2_000)
+    parser.add_argument("--languages", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    parameters = {"projects": args.projects, "environments": args.environments, "keys": args.keys,
+                  "languages": args.languages, "concurrency": args.concurrency, "duration": args.duration,
+                  "target": "url" if args.url else "in process"}
+
+    catalogs = seed(args)
+    async with client_for(args.url, args.concurrency) as client:
+        if args.warmup:
+            await run(client, catalogs, args.concurrency, args.warmup, args.seed + args.concurrency)
+        results = await run(client, catalogs, args.concurrency, args.duration, args.seed)
+
+    print(f"{'route':<26} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}")
+    for route, result in results.items():
+        print(f"{route:<26} {result['rps']:>8.1f} {result['p50_ms'] or 0:>8.1f} {result['p99_ms'] or 0:>8.1f} "
+              f"{result.get('queries') if result.get('queries') is not None else '-':>8.4} {result['errors']:>7}")
+    finish("http_scenario", parameters, results, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""Checks the email outbox against a local SMTP server (aiosmtpd, `pip install aiosmtpd`): forgotPassword returns
+without waiting for SMTP, a burst of reset emails is delivered over the pooled connections with the codes that
+were stored, a message the server turns away for now is retried with backoff, and one it refuses for good fails
+without retries. Runs the app in process against the database named by MLINGO_BENCH_DATABASE_URL, which
+MLINGO_DATABASE_URL must name too:
+
+    python -m benchmarks.mail_outbox --requests 50"""
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import delete, insert, select
+
+from benchmarks.common import BENCH_DATABASE_URL, bench_session_factory
+from benchmarks.http_load import percentile
+from app.infrastructure.settings import settings
+from app.v1.domain import models
+
+USERS = [f"outbox-check-{index}@example.com" for index in range(10)]
+RETRIED = "outbox-check-retry@example.com"
+BOUNCED = "outbox-check-bounce@example.com"
+
+
+class Mailbox:
+    """aiosmtpd handler keeping the delivered messages, which turns away the next `defer` messages with a 451
+    and refuses BOUNCED with a 550"""
+
+    def __init__(self):
+        self.messages = []
+        self.defer = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == BOUNCED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.defer:
+            self.defer -= 1
+            return "451 4.3.0 Try again later"
+        self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return "250 Message accepted"
+
+
+def latest_email(SessionLocal, recipient):
+    with SessionLocal() as db:
+        return db.scalars(select(models.EmailOutbox).where(models.EmailOutbox.recipient == recipient)
+                          .order_by(models.EmailOutbox.email_id.desc()).limit(1)).first()
+
+
+async def wait_for(condition, timeout: float):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50, help="forgotPassword calls in the burst")
+    args = parser.parse_args()
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("the check needs a local SMTP server: pip install aiosmtpd")
+    if settings.database_url != BENCH_DATABASE_URL:
+        sys.exit("serving the app in process needs MLINGO_DATABASE_URL to name the benchmark database")
+
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        db.execute(delete(models.EmailOutbox))
+        for email in [*USERS, RETRIED, BOUNCED]:
+            if db.scalar(select(models.UsersAuth.user_id).where(models.UsersAuth.user_email == email)) is None:
+                db.execute(insert(models.UsersAuth).values(user_email=email))
+        db.commit()
+
+    mailbox = Mailbox()
+    with socket.create_server(("127.0.0.1", 0)) as probe:  # a free port; aiosmtpd cannot take port 0
+        port = probe.getsockname()[1]
+    controller = Controller(mailbox, hostname="127.0.0.1", port=port)
+    controller.start()
+    settings.auto_migrate = False
+    import app.main
+    from app.v1.application.mail.outbox import outbox_sender
+    pool = outbox_sender.smtp_pool
+    pool.host, pool.port, pool.starttls, pool.username = "127.0.0.1", port, False, None
+    outbox_sender.retry_delay = 0.2
+
+    failures = 0
+
+    def check(label, ok, detail=""):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {label:<52} {detail}")
+
+    async def forgot(client, email):
+        start = time.perf_counter()
+        response = await client.post("/v1/forgotPassword", json={"email": email})
+        return response.json()["status"], time.perf_counter() - start
+
+    transport = httpx.ASGITransport(app=app.main.app)
+    try:
+        async with app.main.lifespan(app.main.app), \
+                httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(forgot(client, USERS[index % len(USERS)])
+                                             for index in range(args.requests)))
+            queued = time.perf_counter() - started
+            timings = [seconds for _, seconds in results]
+            check("forgotPassword answers 200", all(status == 200 for status, _ in results))
+            print(f"      {args.requests} calls queued in {queued * 1000:.0f} ms, p50 "
+                  f"{statistics.median(timings) * 1000:.1f} ms, p99 {percentile(timings, 0.99) * 1000:.1f} ms")
+            delivered = await wait_for(lambda: len(mailbox.messages) >= args.requests, 30)
+            check("every email delivered", delivered, f"{len(mailbox.messages)}/{args.requests}")
+            timings = [(await forgot(client, email))[1] for email in USERS]
+            await wait_for(lambda: len(mailbox.messages) >= args.requests + len(USERS), 30)
+            print(f"      one at a time: p50 {statistics.median(timings) * 1000:.1f} ms")
+            check(f"over at most {settings.smtp_pool_size} SMTP connections",
+                  pool.connects <= settings.smtp_pool_size, f"{pool.connects} connections")
+            with SessionLocal() as db:
+                tokens = dict(db.execute(select(models.UsersAuth.user_email, models.UsersAuth.change_password_token)
+                                         .where(models.UsersAuth.user_email.in_(USERS))).all())
+            # calls for one user race, so the stored code is that of whichever committed last
+            check("each user was mailed its stored code", all(tokens[email] and any(
+                recipient == email and tokens[email] in content for recipient, content in mailbox.messages)
+                for email in USERS))
+
+            mailbox.defer = 2
+            await forgot(client, RETRIED)
+            await wait_for(lambda: latest_email(SessionLocal, RETRIED).status != models.OutboxStatus.PENDING, 30)
+            row = latest_email(SessionLocal, RETRIED)
+            check("deferred email sent on its third attempt", row.status == models.OutboxStatus.SENT and
+                  row.attempts == 3, f"{row.status.name}, {row.attempts} attempts")
+
+            await forgot(client, BOUNCED)
+            await wait_for(lambda: latest_email(SessionLocal, BOUNCED).status != models.OutboxStatus.PENDING, 30)
+            row = latest_email(SessionLocal, BOUNCED)
+            check("refused email failed without retries", row.status == models.OutboxStatus.FAILED and
+                  row.attempts == 1, f"{row.status.name}, {row.attempts} attempts: {row.last_error}")
+    finally:
+        controller.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""Measures bcrypt verifications per second (the CPU cost of a login) for growing hashing pool sizes.
+
+Run with `python -m benchmarks.password_hashing`; MLINGO_BCRYPT_ROUNDS selects the cost factor."""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.infrastructure.settings import settings
+from app.v1.application.password_handler import pwd_encrypt_decrypt
+
+LOGINS = 64
+
+
+def logins_per_second(workers: int):
+    settings.password_hash_workers = workers
+    pwd_encrypt_decrypt.shutdown_executor()
+    hashed = pwd_encrypt_decrypt.hash_pwd("correct horse battery staple")
+
+    # request threads, as in the sync routes, fan the verifications out to the pool
+    with ThreadPoolExecutor(max_workers=max(workers, 1) * 2) as requests:
+        start = time.perf_counter()
+        results = list(requests.map(lambda _: pwd_encrypt_decrypt.verify("correct horse battery staple", hashed),
+                                    range(LOGINS)))
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return LOGINS / elapsed
+
+
+def main():
+    print(f"bcrypt rounds: {settings.bcrypt_rounds}")
+    print(f"{'workers':>8} {'logins/s':>10} {'per core':>10}")
+    inline = logins_per_second(0)
+    print(f"{'inline':>8} {inline:>10.1f} {inline:>10.1f}")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        rate = logins_per_second(workers)
+        print(f"{workers:>8} {rate:>10.1f} {rate / workers:>10.1f}")
+        workers *= 2
+    pwd_encrypt_decrypt.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Shows that fetch_all_translation scales with the number of translation rows, not keys x languages.
+
+Run with `python -m benchmarks.pivot_scaling` against an empty database named by MLINGO_BENCH_DATABASE_URL."""
+from benchmarks.common import bench_session_factory, seed_catalog, best_of
+from app.v1.application.service.language_service import fetch_all_translation
+
+SCENARIOS = [
+    # (keys, languages, fill ratio)
+    (2_500, 40, 0.25),
+    (2_500, 40, 0.5),
+    (2_500, 40, 1.0),
+    (5_000, 40, 1.0),
+    (10_000, 40, 1.0),
+    (20_000, 40, 1.0),
+]
+
+
+def main():
+    SessionLocal = bench_session_factory()
+    print(f"{'keys':>7} {'langs':>6} {'rows':>9} {'seconds':>9} {'us/row':>8}")
+    with SessionLocal() as db:
+        for key_count, language_count, fill_ratio in SCENARIOS:
+            rows = seed_catalog(db, key_count, language_count, fill_ratio)
+            seconds = best_of(lambda: fetch_all_translation(db))
+            print(f"{key_count:>7} {language_count:>6} {rows:>9} {seconds:>9.3f} {seconds / max(rows, 1) * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
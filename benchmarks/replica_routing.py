@@ -0,0 +1,88 @@
+"""Checks read routing against a primary and a streaming replica: reads go to the replica, a client's reads right
+after its own write and reads of a just written catalog go to the primary, and so do all reads while the
+replica lags. Two local instances will do:
+
+    pg_basebackup -h localhost -U postgres -D /tmp/replica -R -X stream -c fast
+    pg_ctl -D /tmp/replica -o "-p 5433" start
+    MLINGO_DATABASE_URL=postgresql://postgres@localhost/mlingo \\
+    MLINGO_REPLICA_URLS='["postgresql://postgres@localhost:5433/mlingo"]' MLINGO_AUTO_MIGRATE=false \\
+        python -m benchmarks.replica_routing
+
+The lag check pauses replay on the replica, which needs a superuser there."""
+import asyncio
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from app.infrastructure import database
+from app.infrastructure.database import PoolMetrics, replica_set
+from app.infrastructure.settings import settings
+
+# short enough for the checks to wait out
+settings.replica_max_lag = replica_set.max_lag = 1
+replica_set.check_interval = 0.25
+
+
+def engines():
+    if settings.db_mode == "async":
+        from app.infrastructure import async_database
+        return async_database.async_engine.sync_engine, async_database.async_replica_engines[0].sync_engine
+    return database.engine, database.replica_engines[0]
+
+
+async def main():
+    if not replica_set:
+        sys.exit("set MLINGO_REPLICA_URLS to the replica's URL")
+    import app.main
+    primary, replica = (PoolMetrics(engine) for engine in engines())
+    failures = 0
+
+    async def expect(label, client, target, path="/v1/getAllLanguage", **params):
+        nonlocal failures
+        before = primary.checkouts, replica.checkouts
+        response = await client.get(path, params={"limit": 10, **params})
+        served = "primary" if primary.checkouts > before[0] else "replica" if replica.checkouts > before[1] else "cache"
+        ok = served == target and response.json()["status"] == 200
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {label:<44} {served}")
+
+    def write(client):
+        return client.post("/v1/addTranslation", json={"key": f"replica.check.{uuid.uuid4().hex}",
+                                                       "translations": [{"language": "en", "translation": "x"}]})
+
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as writer, \
+            httpx.AsyncClient(transport=transport, base_url="http://check") as reader:
+        replica_set.start()
+        time.sleep(1)
+        await expect("read", reader, "replica", cursor=1)
+        await expect("second read", reader, "replica", cursor=2)
+        await write(writer)
+        await expect("writer's read right after its write", writer, "primary", cursor=5)
+        await expect("other client, catalog just written", reader, "primary", cursor=3)
+        time.sleep(settings.replica_max_lag + 0.2)
+        writer.cookies.clear()  # expired, as a browser would drop it
+        await expect("writer's read once the window passed", writer, "replica", cursor=4)
+
+        admin = create_engine(replica_set.replicas[0].probe.url, isolation_level="AUTOCOMMIT")
+        try:
+            with admin.connect() as connection:
+                connection.execute(text("SELECT pg_wal_replay_pause()"))
+        except Exception as e:
+            print(f"skipping the lag check, cannot pause replay: {e}")
+        else:
+            try:
+                await write(writer)
+                time.sleep(settings.replica_max_lag * 3)
+                await expect("read while the replica lags", reader, "primary", path="/v2.0/getProjects")
+            finally:
+                with admin.connect() as connection:
+                    connection.execute(text("SELECT pg_wal_replay_resume()"))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Measures searchTranslations latency on a generated catalog of a few hundred thousand strings and checks
+that every query is answered from the trigram and full-text indexes.
+
+Run with `python -m benchmarks.search_latency` against an empty database named by MLINGO_BENCH_DATABASE_URL."""
+import statistics
+import sys
+import time
+
+from sqlalchemy import select, text
+
+from benchmarks.common import bench_session_factory, reset_catalog, explain
+from benchmarks.datasets import load_catalog
+from app.v1.application.service.search_service import search_translations, search_query
+from app.v1.domain import models, schema
+
+KEYS = 30_000
+LANGUAGES = 10
+REPEAT = 20
+
+QUERIES = [
+    # (label, search text, restrict to the first language)
+    ("substring", "password", False),
+    ("misspelt", "pasword", False),
+    ("key name", "settings.profile", False),
+    ("words", "reset your password", False),
+    ("words, one language", "reset your password", True),
+    ("second page", "password", False),
+]
+
+
+def main():
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        reset_catalog(db)
+        rows = load_catalog(db, KEYS, LANGUAGES)
+        with db.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM ANALYZE keys, translations"))
+        english = db.scalar(select(models.Language.language_id).where(models.Language.language == "en"))
+        print(f"{rows} translations\n{'query':<22} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+
+        failures = 0
+        for label, q, one_language in QUERIES:
+            search = schema.SearchQuery(q=q, languageId=english if one_language else None,
+                                        cursor=20 if label == "second page" else 0)
+            timings = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                response = search_translations(search, db)
+                timings.append((time.perf_counter() - start) * 1e3)
+            timings.sort()
+            print(f"{label:<22} {len(response.data):>5} {statistics.median(timings):>8.1f} "
+                  f"{timings[int(len(timings) * 0.95) - 1]:>8.1f}")
+
+            plan = explain(db, search_query(search))
+            if "Seq Scan on translations" in plan or "Seq Scan on keys" in plan:
+                failures += 1
+                print(f"FAIL {label}: sequential scan\n{plan}\n")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
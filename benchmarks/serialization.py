@@ -0,0 +1,53 @@
+"""Time to encode list responses per 10k rows: jsonable_encoder plus json, as FastAPI encoded the old plain object
+DTOs, against ResponseDTO rendering itself with orjson.
+
+Run with `python -m benchmarks.serialization` against an empty database named by MLINGO_BENCH_DATABASE_URL."""
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from benchmarks.common import bench_session_factory, seed_catalog, best_of
+from app.v1.application.dto.dto_classes import PageDTO
+from app.v1.application.service.language_service import fetch_all_translation, fetch_language_keys, \
+    language_page_query
+from app.v1.domain import models
+
+ROWS = 10_000
+
+
+def legacy_encode(data):
+    """The encoding path of a plain object DTO: jsonable_encoder over its __dict__, then json.dumps"""
+    dto = SimpleNamespace(status=200, message="", data=data, next_cursor=None)
+    return JSONResponse(jsonable_encoder(dto)).body
+
+
+def report(name, legacy, data):
+    legacy_seconds = best_of(lambda: legacy_encode(legacy))
+    seconds = best_of(lambda: PageDTO(200, "", data).body)
+    per_10k = ROWS / max(len(data), 1) * 1e3
+    print(f"{name:<22} {len(data):>7} {legacy_seconds * per_10k:>12.1f} {seconds * per_10k:>12.1f} "
+          f"{legacy_seconds / seconds:>8.1f}x")
+
+
+def main():
+    SessionLocal = bench_session_factory()
+    print(f"{'payload':<22} {'rows':>7} {'legacy ms/10k':>12} {'orjson ms/10k':>12} {'speedup':>9}")
+    with SessionLocal() as db:
+        seed_catalog(db, 0, ROWS)
+        # getAllLanguage used to return Language instances, it now returns rows
+        instances = db.scalars(select(models.Language).order_by(models.Language.language_id)).all()
+        rows = db.execute(language_page_query()).all()
+        report("languages", instances, rows)
+
+        seed_catalog(db, ROWS, 4)
+        translations = fetch_all_translation(db).data
+        report("translations (pivot)", translations, translations)
+        language_id = db.scalar(select(models.Language.language_id))
+        keys = fetch_language_keys(language_id, db).data
+        report("language keys", keys, keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Microbenchmarks of the service functions behind the busiest routes: p50/p99 latency and SQL statements per
+call, on a generated catalog, with stored baselines to catch regressions.
+
+Run with `python -m benchmarks.service_latency [--save-baseline | --compare]` against a database named by
+MLINGO_BENCH_DATABASE_URL; MLINGO_BCRYPT_ROUNDS sets the cost of the login benchmark."""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+from sqlalchemy import delete
+
+from benchmarks.baseline import add_baseline_arguments, finish
+from benchmarks.common import bench_session_factory, reset_catalog, create_user
+from benchmarks.datasets import seed_tenants
+from benchmarks.http_load import percentile
+from app.infrastructure.instrumentation import RequestStats, request_stats
+from app.v1.application.service.language_service import fetch_all_translation, fetch_language_keys, \
+    fetch_all_language, add_translation
+from app.v1.application.service.user_services import auth_function_async, get_projects
+from app.v1.domain import models, schema
+
+OWNER = "service-latency@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def measure(call, repeat: int, warmup: int = 3):
+    """Latency percentiles and statements per call of `repeat` calls, after `warmup` untimed ones"""
+    for _ in range(warmup):
+        call()
+    timings, queries = [], []
+    for _ in range(repeat):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        response = call()
+        timings.append(time.perf_counter() - start)
+        request_stats.reset(token)
+        # get_projects returns its rows, the other services a ResponseDTO
+        assert getattr(response, "status", 200) == 200, response.message
+        queries.append(stats.queries)
+    return {"p50_ms": statistics.median(timings) * 1000, "p99_ms": percentile(timings, 0.99) * 1000,
+            "queries": statistics.mean(queries)}
+
+
+def scenarios(db, scope: schema.Scope, user_id: int):
+    """(name, call, repeat) of each benchmark"""
+    language_id = fetch_all_language(db, scope).data[0].language_id
+    first_page = schema.KeyPage(limit=100)
+    new_keys = (f"bench.added.key_{index}" for index in itertools.count())
+    return [
+        ("fetch_all_language", lambda: fetch_all_language(db, scope), 200),
+        ("fetch_all_translation page", lambda: fetch_all_translation(db, scope, first_page), 200),
+        ("fetch_all_translation all", lambda: fetch_all_translation(db, scope), 10),
+        ("fetch_language_keys page", lambda: fetch_language_keys(language_id, db, scope, first_page), 200),
+        ("fetch_language_keys all", lambda: fetch_language_keys(language_id, db, scope), 20),
+        ("add_translation", lambda: add_translation(schema.Translate(key=next(new_keys), translations=[
+            schema.LanguageTranslation(language="en", translation="Added by the benchmark")]), db, scope), 200),
+        ("get_projects", lambda: get_projects(user_id, db), 200),
+        ("auth_function_async", lambda: asyncio.run(auth_function_async(
+            schema.Credentials(email=OWNER, password=PASSWORD), db)), 10),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--environments", type=int, default=2)
+    parser.add_argument("--keys", type=int, default=5_000)
+    parser.add_argument("--languages", type=int, default=10)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    parameters = {"projects": args.projects, "environments": args.environments, "keys": args.keys,
+                  "languages": args.languages}
+
+    SessionLocal = bench_session_factory()
+    with SessionLocal() as db:
+        reset_catalog(db)
+        user_id = create_user(db, OWNER, PASSWORD)
+        # projects of earlier runs stay in the database, but not in the user's login
+        db.execute(delete(models.UserProjectEnv).where(models.UserProjectEnv.user_id == user_id))
+        scopes, rows = seed_tenants(db, args.projects, args.environments, args.keys, args.languages,
+                                    owner_email=OWNER)
+        print(f"{len(scopes)} catalogs, {rows} translations; timing the catalog of {scopes[0]}")
+        print(f"{'benchmark':<30} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8}")
+        results = {}
+        for name, call, repeat in scenarios(db, scopes[0], user_id):
+            results[name] = result = measure(call, repeat)
+            print(f"{name:<30} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['queries']:>8.1f}")
+    finish("service_latency", parameters, results, args)
+
+
+if __name__ == "__main__":
+    main()
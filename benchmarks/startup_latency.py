@@ -0,0 +1,80 @@
+"""Startup latency of a fresh worker: importing the app, its lifespan startup (migration check, pool warmup),
+its first request, and a burst of concurrent requests right after, in each DB mode with and without a warm pool.
+Every run is a new interpreter. Run with `python -m benchmarks.startup_latency [--save-baseline | --compare]`
+against the database named by MLINGO_BENCH_DATABASE_URL."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.baseline import add_baseline_arguments, finish
+from benchmarks.common import BENCH_DATABASE_URL, bench_session_factory
+
+# what a worker does from the moment it is spawned; `python -c` rather than a module of this package, whose
+# imports would otherwise be paid before the clock starts
+WORKER = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import httpx
+import app.main
+imported = time.perf_counter()
+
+async def main():
+    concurrency = int(sys.argv[1])
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with app.main.lifespan(app.main.app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            # distinct cursors keep the response cache out of the way
+            response = await client.get("/v1/getAllLanguage", params={"limit": 10, "cursor": 1})
+            assert response.json()["status"] == 200, response.text
+            first = time.perf_counter()
+            responses = await asyncio.gather(*(client.get("/v1/getAllLanguage", params={"limit": 10, "cursor": 2 + n})
+                                               for n in range(concurrency)))
+            assert all(response.json()["status"] == 200 for response in responses)
+            burst = time.perf_counter()
+    print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+                      "first_request_ms": (first - ready) * 1000, "burst_ms": (burst - first) * 1000,
+                      "ready_ms": (first - started) * 1000}))
+
+asyncio.run(main())
+"""
+
+
+def run_worker(mode: str, warmup: int, concurrency: int, migrate: bool):
+    env = {**os.environ, "MLINGO_DB_MODE": mode, "MLINGO_DATABASE_URL": BENCH_DATABASE_URL,
+           "MLINGO_POOL_WARMUP": str(warmup), "MLINGO_AUTO_MIGRATE": str(migrate).lower(), "MLINGO_REPLICA_URLS": "[]"}
+    finished = subprocess.run([sys.executable, "-c", WORKER, str(concurrency)], env=env, capture_output=True, text=True)
+    if finished.returncode:
+        sys.exit(finished.stderr)
+    return json.loads(finished.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="workers started per configuration")
+    parser.add_argument("--concurrency", type=int, default=5, help="requests in the burst after the first one")
+    parser.add_argument("--warmup", type=int, default=5, help="pool_warmup of the warm configurations")
+    parser.add_argument("--no-migrate", action="store_true", help="start without the migration check")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    parameters = {"repeat": args.repeat, "concurrency": args.concurrency, "warmup": args.warmup,
+                  "migrate": not args.no_migrate}
+
+    bench_session_factory()  # migrated up front, so that the workers only check
+    results = {}
+    print(f"{'configuration':<18} {'import':>8} {'startup':>8} {'first':>8} {'burst':>8} {'ready':>8}  (ms, median)")
+    for mode in ("sync", "async"):
+        for warmup in (0, args.warmup):
+            runs = [run_worker(mode, warmup, args.concurrency, not args.no_migrate) for _ in range(args.repeat)]
+            name = f"{mode} warmup={warmup}"
+            results[name] = result = {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+            print(f"{name:<18} {result['import_ms']:>8.1f} {result['startup_ms']:>8.1f} "
+                  f"{result['first_request_ms']:>8.1f} {result['burst_ms']:>8.1f} {result['ready_ms']:>8.1f}")
+    finish("startup_latency", parameters, results, args)
+
+
+if __name__ == "__main__":
+    main()
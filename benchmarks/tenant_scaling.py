@@ -0,0 +1,51 @@
+"""Shows that reads scoped to one project stay flat as the number of projects in the database grows,
+because the translations partitions of other projects are pruned from the plan.
+
+Run with `python -m benchmarks.tenant_scaling` against an empty database named by MLINGO_BENCH_DATABASE_URL."""
+import re
+
+from sqlalchemy import func, select, text
+
+from benchmarks.common import bench_session_factory, reset_catalog, seed_catalog, best_of, create_projects
+from app.v1.application.service.language_service import fetch_all_translation, fetch_language_keys, \
+    translation_pivot_query
+from app.v1.domain import models, schema
+
+TENANT_COUNTS = [1, 4, 16, 64]
+KEYS_PER_TENANT = 1_000
+LANGUAGES_PER_TENANT = 5
+
+
+def partitions_scanned(db, scope):
+    compiled = translation_pivot_query(scope).compile(db.bind, compile_kwargs={"literal_binds": True})
+    plan = "\n".join(line for line, in db.execute(text(f"EXPLAIN {compiled}")))
+    return len(set(re.findall(r"on translations_p\d+", plan)))
+
+
+def main():
+    SessionLocal = bench_session_factory()
+    print(f"{'tenants':>8} {'rows':>9} {'partitions':>11} {'catalog ms':>11} {'keys ms':>8}")
+    with SessionLocal() as db:
+        reset_catalog(db)
+        project_ids = create_projects(db, max(TENANT_COUNTS))
+
+        seeded = 0
+        for tenant_count in TENANT_COUNTS:
+            for project_id in project_ids[seeded:tenant_count]:
+                seed_catalog(db, KEYS_PER_TENANT, LANGUAGES_PER_TENANT, scope=schema.Scope(projectId=project_id),
+                             reset=False)
+            seeded = tenant_count
+            db.execute(text("ANALYZE translations"))
+            db.commit()
+
+            scope = schema.Scope(projectId=project_ids[0])
+            language_id = db.scalar(select(models.Language.language_id).where(scope.filter(models.Language)))
+            rows = db.scalar(select(func.count()).select_from(models.Translation))
+            catalog = best_of(lambda: fetch_all_translation(db, scope), repeat=5)
+            keys = best_of(lambda: fetch_language_keys(language_id, db, scope), repeat=5)
+            print(f"{tenant_count:>8} {rows:>9} {partitions_scanned(db, scope):>11} {catalog * 1e3:>11.1f} "
+                  f"{keys * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
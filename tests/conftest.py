@@ -0,0 +1,58 @@
+"""Fixtures of the tests that need PostgreSQL. They run against the database named by MLINGO_TEST_DATABASE_URL,
+migrated to the latest revision, and are skipped when it is not set:
+
+    MLINGO_TEST_DATABASE_URL=postgresql://postgres@localhost/mlingo_test python -m pytest tests
+
+The app reads its settings when it is imported, so they are pointed at that database here, before any test
+imports it."""
+import os
+
+import pytest
+from sqlalchemy import event
+
+TEST_DATABASE_URL = os.environ.get("MLINGO_TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    os.environ.update(MLINGO_DATABASE_URL=TEST_DATABASE_URL, MLINGO_DB_MODE="sync", MLINGO_AUTO_MIGRATE="false",
+                      MLINGO_REPLICA_URLS="[]", MLINGO_OUTBOX_SENDER="false")
+    # cheap hashes, made in the calling thread
+    os.environ.setdefault("MLINGO_BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("MLINGO_PASSWORD_HASH_WORKERS", "0")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """app.infrastructure.database, on the migrated test database"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("MLINGO_TEST_DATABASE_URL is not set")
+    from app.infrastructure import database
+    from app.infrastructure.migrate import upgrade_database
+    upgrade_database()
+    return database
+
+
+@pytest.fixture
+def db(database):
+    with database.SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+    import app.main
+    with TestClient(app.main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def statements(database):
+    """The SQL statements the app's engine executes during the test, in order"""
+    executed = []
+
+    def on_execute(connection, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", on_execute)
+    yield executed
+    event.remove(database.engine, "before_cursor_execute", on_execute)
@@ -0,0 +1,61 @@
+"""A bundle built while a write to its catalog is applied is served, but not kept: it may predate the write"""
+from app.v1.application.service.bundle_service import BundleStore
+from app.v1.domain import schema
+
+LANGUAGE_ID = 1
+SCOPE = schema.Scope(projectId=1)
+
+
+class FakeSession:
+    """Answers the chain and resolved keys queries of BundleStore.get, running `during_build` between them the
+    way a concurrent request would"""
+
+    def __init__(self, value, during_build=None):
+        self.value = value
+        self.during_build = during_build
+
+    def scalars(self, statement):
+        return self
+
+    def all(self):
+        return [LANGUAGE_ID]
+
+    def execute(self, statement):
+        if self.during_build:
+            self.during_build()
+        return [(1, "greeting", self.value, LANGUAGE_ID)]
+
+
+def test_build_is_stored():
+    store = BundleStore()
+    bundle = store.get(LANGUAGE_ID, FakeSession("Hello"), SCOPE)
+
+    assert bundle.values == {"greeting": "Hello"}
+    assert store.cached(LANGUAGE_ID, SCOPE) is bundle
+
+
+def test_build_overlapping_apply_is_not_stored():
+    store = BundleStore()
+
+    def write():
+        store.apply({LANGUAGE_ID: {"greeting": "Hi"}}, SCOPE)
+
+    assert store.get(LANGUAGE_ID, FakeSession("Hello", write), SCOPE).values == {"greeting": "Hello"}
+    assert store.cached(LANGUAGE_ID, SCOPE) is None
+    assert store.get(LANGUAGE_ID, FakeSession("Hi"), SCOPE).values == {"greeting": "Hi"}
+    assert store.cached(LANGUAGE_ID, SCOPE).values == {"greeting": "Hi"}
+
+
+def test_build_overlapping_invalidate_is_not_stored():
+    store = BundleStore()
+    store.get(LANGUAGE_ID, FakeSession("Hello", lambda: store.invalidate(LANGUAGE_ID)), SCOPE)
+
+    assert store.cached(LANGUAGE_ID, SCOPE) is None
+
+
+def test_write_to_another_catalog_does_not_discard_the_build():
+    store = BundleStore()
+    other = schema.Scope(projectId=2)
+    bundle = store.get(LANGUAGE_ID, FakeSession("Hello", lambda: store.invalidate_catalog(other)), SCOPE)
+
+    assert store.cached(LANGUAGE_ID, SCOPE) is bundle
@@ -0,0 +1,44 @@
+"""Exports rewrite the files of a language when its translations change, including when some are deleted, and
+refuse keys that would share an Android or ARB name"""
+import io
+
+import orjson
+import pytest
+from sqlalchemy import delete, select
+
+from benchmarks.common import seed_catalog, create_projects
+from app.v1.application.export.pipeline import export_catalog, scope_path
+from app.v1.application.export.storage import LocalStorage
+from app.v1.application.export.writers import AndroidWriter, ArbWriter, IdentifierCollisionError
+from app.v1.domain import models, schema
+
+
+def test_deleted_translation_is_re_exported(db, tmp_path):
+    scope = schema.Scope(projectId=create_projects(db, 1)[0])
+    seed_catalog(db, 5, 2, scope=scope, reset=False)
+    storage = LocalStorage(str(tmp_path))
+
+    assert sorted(export_catalog(db, scope, storage, ["json", "po"])["exported"]) == ["lang_0", "lang_1"]
+    assert export_catalog(db, scope, storage, ["json", "po"])["exported"] == {}
+
+    language_id = db.scalar(select(models.Language.language_id).where(scope.filter(models.Language),
+                                                                      models.Language.language == "lang_0"))
+    key_id = db.scalar(select(models.Key.key_id).where(scope.filter(models.Key), models.Key.key == "key_0"))
+    db.execute(delete(models.Translation).where(scope.filter(models.Translation),
+                                                models.Translation.language_id == language_id,
+                                                models.Translation.key_id == key_id))
+    db.commit()
+
+    assert export_catalog(db, scope, storage, ["json", "po"])["exported"] == {"lang_0": ["json", "po"]}
+    exported = orjson.loads(storage.read(f"{scope_path(scope)}/lang_0/lang_0.json"))
+    assert "key_0" not in exported and len(exported) == 4
+
+
+@pytest.mark.parametrize("writer", [AndroidWriter, ArbWriter])
+def test_keys_sharing_an_identifier_fail_the_export(writer):
+    catalog = writer(io.BytesIO(), "en")
+    catalog.begin()
+    catalog.entry("a.b", "first", None)
+
+    with pytest.raises(IdentifierCollisionError, match="'a.b' and 'a_b'"):
+        catalog.entry("a_b", "second", None)
@@ -0,0 +1,23 @@
+"""Importing the app stays cheap in both DB modes: within the budget of benchmarks.import_time, without Alembic
+and without connecting to the database. Runs without a database: the URLs point at a socket that never answers"""
+import socket
+
+import pytest
+
+from benchmarks.import_time import BUDGET_MS, LATE_MODULES, fastest, connection_attempted
+
+TIMEOUT = 30
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_import_stays_cheap(mode):
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        listener.setblocking(False)
+        profiled = fastest(mode, listener.getsockname()[1], TIMEOUT, repeat=3)
+        connected = connection_attempted(listener)
+
+    assert profiled is not None, f"the import did not finish in {TIMEOUT} s, waiting on the database"
+    total, self_times = profiled
+    assert not connected, "the import connected to the database"
+    assert total * 1000 <= BUDGET_MS, sorted(self_times.items(), key=lambda item: -item[1])[:10]
+    assert not LATE_MODULES & set(self_times), f"the import loads {LATE_MODULES & set(self_times)}"
@@ -0,0 +1,56 @@
+"""Login and /v2.0/getProjects run a fixed number of statements, however many projects and environments the user
+has: user, details and projects for the login, one for the project listing"""
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from app.v1.application.password_handler.pwd_encrypt_decrypt import hash_pwd
+from app.v1.domain import models
+
+PASSWORD = "correct horse battery staple"
+
+
+def seed_user(db, project_count: int, environment_count: int):
+    """A user with a password and details, member of project_count projects of environment_count environments
+    each; returns (email, user id)"""
+    email = f"query-count-{uuid.uuid4().hex}@example.com"
+    user_id = db.scalar(insert(models.UsersAuth).values(user_email=email, password=hash_pwd(PASSWORD))
+                        .returning(models.UsersAuth.user_id))
+    db.execute(insert(models.UserDetails).values(user_id=user_id, user_name="Query Count"))
+    for index in range(project_count):
+        project_id = db.scalar(insert(models.Projects).values(
+            project_name=f"project {index}", owner=user_id, activity_status=models.ActivityStatus.ACTIVE)
+            .returning(models.Projects.project_id))
+        db.execute(insert(models.UserProjectEnv).values(user_id=user_id, project_id=project_id))
+        for environment in range(environment_count):
+            db.execute(insert(models.Environments).values(project_id=project_id,
+                                                          environment_name=f"environment {environment}",
+                                                          activity_status=models.ActivityStatus.ACTIVE))
+    db.commit()
+    return email, user_id
+
+
+@pytest.mark.parametrize("project_count, environment_count", [(1, 1), (5, 3)])
+def test_login_runs_three_statements(client, db, statements, project_count, environment_count):
+    email, _ = seed_user(db, project_count, environment_count)
+    statements.clear()
+
+    response = client.post("/v1/authenticateUser", json={"email": email, "password": PASSWORD}).json()
+
+    assert response["status"] == 200, response["message"]
+    assert len(response["data"]["projects"]) == project_count
+    assert all(len(project["env"]) == environment_count for project in response["data"]["projects"])
+    assert len(statements) == 3, statements
+
+
+@pytest.mark.parametrize("project_count, environment_count", [(1, 1), (5, 3)])
+def test_get_projects_runs_one_statement(client, db, statements, project_count, environment_count):
+    _, user_id = seed_user(db, project_count, environment_count)
+    statements.clear()
+
+    response = client.get("/v2.0/getProjects", headers={"user_id": str(user_id)}).json()
+
+    assert response["status"] == 200, response["message"]
+    assert len(response["data"]) == project_count
+    assert len(statements) == 1, statements
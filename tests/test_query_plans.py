@@ -0,0 +1,65 @@
+"""The translation lookup and listing queries of a project are planned as index scans, touching a single
+translations partition. Seeds the test database's catalog, replacing its keys, languages and translations"""
+import re
+
+import pytest
+from sqlalchemy import select, text
+
+from benchmarks.common import seed_catalog, create_projects, explain
+from app.v1.application.service.language_service import language_keys_query, translation_pivot_query, \
+    translation_changes_query
+from app.v1.domain import models, schema
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+
+def lookup_queries(scope, key_id, language_id):
+    """name -> (statement, whether it must be answered from indexes). Reading a whole catalog may scan its
+    partition, all other queries may not"""
+    return {
+        "point lookup": (select(models.Translation.translation_id).where(
+            scope.filter(models.Translation), models.Translation.key_id == key_id,
+            models.Translation.language_id == language_id), True),
+        "language listing": (select(models.Translation.key_id, models.Translation.translation).where(
+            scope.filter(models.Translation), models.Translation.language_id == language_id), True),
+        "language keys": (language_keys_query(language_id, scope), True),
+        "catalog pivot": (translation_pivot_query(scope), False),
+        "delta sync": (translation_changes_query(2 ** 40, 2 ** 41, scope), True),
+        "catalog page": (translation_pivot_query(scope, schema.KeyPage(limit=50, cursor=key_id)), True),
+        "prefix page": (translation_pivot_query(scope, schema.KeyPage(limit=50), schema.KeyFilter(prefix="key_12")),
+                        True),
+        "missing in language": (translation_pivot_query(scope, schema.KeyPage(limit=50),
+                                                        schema.KeyFilter(missingIn=language_id), [language_id]),
+                                True),
+        "language keys page": (language_keys_query(language_id, scope, schema.KeyPage(limit=50, cursor=key_id)),
+                               True),
+    }
+
+
+@pytest.fixture(scope="module")
+def catalog(database):
+    """(scope, key id, language id) of a project's catalog, next to a larger global one"""
+    with database.SessionLocal() as db:
+        seed_catalog(db, 10_000, 40)
+        scope = schema.Scope(projectId=create_projects(db, 1)[0])
+        seed_catalog(db, 2_000, 20, scope=scope, reset=False)
+        db.execute(text("ANALYZE keys"))
+        # VACUUM sets the visibility map, without which index only scans are costed as heap fetches
+        with db.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM ANALYZE translations"))
+
+        key_id = db.scalar(select(models.Translation.key_id).where(scope.filter(models.Translation)).limit(1))
+        language_id = db.scalar(select(models.Translation.language_id).where(scope.filter(models.Translation))
+                                .limit(1))
+    return scope, key_id, language_id
+
+
+@pytest.mark.parametrize("name", list(lookup_queries(schema.GLOBAL_SCOPE, 0, 0)))
+def test_query_plan(db, catalog, name):
+    statement, indexed = lookup_queries(*catalog)[name]
+    plan = explain(db, statement)
+
+    assert len(set(re.findall(r"on (translations_p\d+)", plan))) == 1, plan
+    if indexed:
+        assert "Seq Scan on translations" not in plan and "Seq Scan on keys" not in plan, plan
+        assert any(scan in plan for scan in INDEX_SCANS), plan
@@ -0,0 +1,104 @@
+"""The response cache on its Redis backend, against an in-memory client with the get/set(ex=) methods it uses:
+repeated reads are served from the cache, current ETags get a 304, a write to the catalog makes its entries
+unreachable and error responses are never stored"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.infrastructure.response_cache import RedisBackend, ResponseCache, ResponseCacheMiddleware
+from app.v1.application.dto.dto_classes import ResponseDTO
+from app.v1.domain import schema
+
+PATH = "/v1/getLanguageKeys"
+
+
+class FakeRedis:
+    """The subset of redis.Redis the backend calls; values come back as bytes, as from a real server"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode() if isinstance(value, str) else value
+        self.expiry[key] = ex
+
+
+class Catalog:
+    """Route behind the cache, counting the requests that reach it"""
+
+    def __init__(self):
+        self.calls = 0
+        self.value = "Hello"
+        self.status = 200
+
+    def __call__(self):
+        self.calls += 1
+        return ResponseDTO(self.status, "Keys fetched successfully", [{"key": "greeting", "value": self.value}])
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(redis_client):
+    return ResponseCache(RedisBackend(redis_client, ttl=60))
+
+
+@pytest.fixture
+def catalog():
+    return Catalog()
+
+
+@pytest.fixture
+def client(cache, catalog):
+    app = FastAPI()
+    app.add_api_route(PATH, catalog)
+    app.add_middleware(ResponseCacheMiddleware, paths=[PATH], cache=cache)
+    return TestClient(app)
+
+
+def test_repeated_read_is_served_from_redis(client, catalog, redis_client):
+    first = client.get(PATH, params={"projectId": 1})
+    second = client.get(PATH, params={"projectId": 1})
+
+    assert catalog.calls == 1
+    assert second.json() == first.json() and second.headers["etag"] == first.headers["etag"]
+    entries = [key for key in redis_client.values if PATH in key]
+    assert len(entries) == 1 and redis_client.expiry[entries[0]] == 60
+
+
+def test_current_etag_gets_304(client, catalog):
+    etag = client.get(PATH, params={"projectId": 1}).headers["etag"]
+
+    response = client.get(PATH, params={"projectId": 1}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304 and response.content == b""
+    assert catalog.calls == 1
+
+
+def test_write_makes_the_catalog_entries_unreachable(client, cache, catalog):
+    client.get(PATH, params={"projectId": 1})
+    client.get(PATH, params={"projectId": 2})
+    catalog.value = "Hi"
+
+    cache.invalidate(schema.Scope(projectId=1))
+
+    assert client.get(PATH, params={"projectId": 1}).json()["data"][0]["value"] == "Hi"
+    assert client.get(PATH, params={"projectId": 2}).json()["data"][0]["value"] == "Hello"
+    assert catalog.calls == 3
+
+
+def test_errors_are_not_cached(client, catalog, redis_client):
+    catalog.status = 204
+
+    client.get(PATH, params={"projectId": 1})
+    client.get(PATH, params={"projectId": 1})
+
+    assert catalog.calls == 2
+    assert not [key for key in redis_client.values if PATH in key]